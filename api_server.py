@@ -4,12 +4,19 @@ FastAPI REST API for Sprinkler Controller
 Provides endpoints to manage zones and schedules.
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, conint, constr, model_validator
+from typing import List, Optional, Union
+from datetime import date, timedelta
+import os
 import uvicorn
-from sprinkler_controller import SprinklerController, SprinklerSchedule, Zone
+from sprinkler_controller import (SprinklerSchedule, Zone, Program, ProgramStep, PinError,
+                                  SCHEDULE_WEEKLY, SCHEDULE_INTERVAL)
+from async_controller import AsyncSprinklerController
+from gpio_backend import create_backend, BACKEND_RPI
+from run_manager import RUN_QUEUED, RUN_DONE, PRIORITY_MANUAL, PRIORITY_NAMES
+from cron import CronExpression
 import logging
 
 logging.basicConfig(
@@ -34,48 +41,304 @@ app.add_middleware(
 )
 
 # Global controller instance
-controller: Optional[SprinklerController] = None
+controller: Optional[AsyncSprinklerController] = None
 
 
 class ScheduleModel(BaseModel):
-    """Schedule data model."""
-    days: List[int] = Field(..., description="List of weekdays (0=Monday, 6=Sunday)", min_items=1, max_items=7)
-    start_time: str = Field(..., description="Start time in HH:MM format (24-hour)", pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$")
-    duration_minutes: int = Field(..., description="Duration in minutes", gt=0, le=180)
+    """Schedule data model: a day rule + start_time, or a cron expression."""
+    type: str = Field(default=SCHEDULE_WEEKLY, description="Day rule: weekly, interval, odd or even", pattern="^(weekly|interval|odd|even)$")
+    days: Optional[List[conint(ge=0, le=6)]] = Field(default=None, description="List of weekdays (0=Monday, 6=Sunday), for weekly schedules", min_items=1, max_items=7)
+    interval_days: Optional[int] = Field(default=None, description="Days between runs, for interval schedules", ge=1, le=365)
+    epoch: Optional[date] = Field(default=None, description="Date an interval schedule counts from (default 1970-01-01)")
+    start_time: Optional[str] = Field(default=None, description="Start time in HH:MM or HH:MM:SS format (24-hour)", pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9](:[0-5][0-9])?$")
+    cron: Optional[str] = Field(default=None, description="Cron expression 'min hour day-of-month month day-of-week', e.g. '0 6 */3 4-10 *'")
+    duration_minutes: Optional[int] = Field(default=None, description="Duration in minutes", gt=0, le=180)
+    duration_seconds: Optional[int] = Field(default=None, description="Duration in seconds, instead of duration_minutes", gt=0, le=180 * 60)
     enabled: bool = Field(default=True, description="Whether the schedule is enabled")
+    
+    @model_validator(mode="after")
+    def check_duration(self):
+        if (self.duration_minutes is None) == (self.duration_seconds is None):
+            raise ValueError("Provide exactly one of 'duration_minutes' or 'duration_seconds'")
+        return self
+    
+    @model_validator(mode="after")
+    def check_form(self):
+        if self.cron is not None:
+            if self.days is not None or self.start_time is not None or self.type != SCHEDULE_WEEKLY:
+                raise ValueError("Use either 'cron' or 'days' + 'start_time', not both")
+            CronExpression(self.cron)
+        elif self.start_time is None:
+            raise ValueError("'start_time' is required unless 'cron' is given")
+        elif self.type == SCHEDULE_WEEKLY and self.days is None:
+            raise ValueError("'days' is required for weekly schedules")
+        elif self.type != SCHEDULE_WEEKLY and self.days is not None:
+            raise ValueError(f"'days' does not apply to {self.type} schedules")
+        elif self.type == SCHEDULE_INTERVAL and self.interval_days is None:
+            raise ValueError("'interval_days' is required for interval schedules")
+        return self
+
+
+class ZoneSchedulesModel(BaseModel):
+    """Base model for zone payloads carrying one schedule or a list of schedules."""
+    schedule: Optional[ScheduleModel] = Field(default=None, description="Single schedule")
+    schedules: Optional[List[ScheduleModel]] = Field(default=None, description="Several schedules (e.g. multiple waterings a day)", min_length=1)
+    
+    @model_validator(mode="after")
+    def check_schedules(self):
+        if (self.schedule is None) == (self.schedules is None):
+            raise ValueError("Provide exactly one of 'schedule' or 'schedules'")
+        return self
+    
+    def to_schedules(self) -> List[SprinklerSchedule]:
+        """Convert the payload to controller schedules."""
+        models = self.schedules if self.schedules is not None else [self.schedule]
+        return [SprinklerSchedule.from_dict(model.model_dump()) for model in models]
+
+
+class PinAddressModel(BaseModel):
+    """A pin of an I/O expander chip."""
+    chip: int = Field(..., description="Chip number along the bus or chain, from 0", ge=0)
+    pin: int = Field(..., description="Pin on the chip (0-15 on MCP23017, 0-7 on 74HC595)", ge=0)
+
+
+# A pin number, or an expander pin as {"chip": c, "pin": p} or "c.p"
+PinField = Union[conint(ge=0), PinAddressModel, constr(pattern=r"^\d+\.\d+$")]
 
 
-class ZoneModel(BaseModel):
+class ZoneModel(ZoneSchedulesModel):
     """Zone data model."""
     name: str = Field(..., description="Zone name", min_length=1, max_length=50)
-    gpio_pin: int = Field(..., description="GPIO pin number (BCM)", ge=0, le=27)
-    schedule: ScheduleModel
+    gpio_pin: PinField = Field(..., description="GPIO pin number (BCM, or chip * 16 + pin on MCP23017 / chip * 8 + pin on 74HC595 expanders), or an expander pin as {\"chip\": c, \"pin\": p} or \"c.p\"")
+    flow_rate: float = Field(default=0.0, description="Flow while open (e.g. GPM), checked against max_total_flow", ge=0)
+    cycle_minutes: Optional[float] = Field(default=None, description="Longest cycle before soaking (null = run in one go)", gt=0, le=180)
+    soak_minutes: float = Field(default=0.0, description="Rest between cycles in minutes", ge=0, le=240)
 
 
-class ZoneUpdateModel(BaseModel):
-    """Model for updating zone schedule."""
-    schedule: ScheduleModel
+class ZoneUpdateModel(ZoneSchedulesModel):
+    """Model for updating zone schedules."""
 
 
-class ManualRunModel(BaseModel):
+class CycleSoakModel(BaseModel):
+    """Model for a zone's cycle-and-soak settings."""
+    cycle_minutes: Optional[float] = Field(default=None, description="Longest cycle before soaking (null = run in one go)", gt=0, le=180)
+    soak_minutes: float = Field(default=0.0, description="Rest between cycles in minutes", ge=0, le=240)
+
+
+class PriorityModel(BaseModel):
+    """Base model for manual runs, which may ask for a priority."""
+    priority: str = Field(default=PRIORITY_NAMES[PRIORITY_MANUAL], description="Run priority: test, manual or frost (frost preempts everything else)", pattern="^(test|manual|frost)$")
+    
+    def priority_level(self) -> int:
+        """Get the run manager priority for the requested priority name."""
+        return next(level for level, name in PRIORITY_NAMES.items() if name == self.priority)
+
+
+class ManualRunModel(PriorityModel):
     """Model for manually running a zone."""
-    duration_minutes: int = Field(..., description="Duration in minutes", gt=0, le=180)
+    duration_minutes: Optional[int] = Field(default=None, description="Duration in minutes", gt=0, le=180)
+    duration_seconds: Optional[int] = Field(default=None, description="Duration in seconds, instead of duration_minutes", gt=0, le=180 * 60)
+    wait: bool = Field(default=False, description="Respond only once the run has finished")
+    
+    @model_validator(mode="after")
+    def check_duration(self):
+        if (self.duration_minutes is None) == (self.duration_seconds is None):
+            raise ValueError("Provide exactly one of 'duration_minutes' or 'duration_seconds'")
+        return self
+    
+    def minutes(self) -> float:
+        """Get the requested duration in minutes."""
+        if self.duration_seconds is not None:
+            return self.duration_seconds / 60
+        return self.duration_minutes
+
+
+class ExtendModel(BaseModel):
+    """Model for adding time to a zone's current run."""
+    minutes: Optional[float] = Field(default=None, description="Watering time to add in minutes", gt=0, le=180)
+    seconds: Optional[int] = Field(default=None, description="Watering time to add in seconds, instead of minutes", gt=0, le=180 * 60)
+    
+    @model_validator(mode="after")
+    def check_duration(self):
+        if (self.minutes is None) == (self.seconds is None):
+            raise ValueError("Provide exactly one of 'minutes' or 'seconds'")
+        return self
+    
+    def to_minutes(self) -> float:
+        """Get the requested extension in minutes."""
+        if self.seconds is not None:
+            return self.seconds / 60
+        return self.minutes
+
+
+class ProgramRunModel(PriorityModel):
+    """Model for manually running a program."""
+
+
+class ProgramScheduleModel(ScheduleModel):
+    """Program start times: a schedule without a duration (the steps set it)."""
+    
+    @model_validator(mode="after")
+    def check_duration(self):
+        if self.duration_minutes is not None or self.duration_seconds is not None:
+            raise ValueError("Program schedules take their duration from the steps")
+        return self
+
+
+class ProgramStepModel(BaseModel):
+    """One zone of a program."""
+    zone: str = Field(..., description="Zone name")
+    duration_minutes: Optional[int] = Field(default=None, description="Duration in minutes", gt=0, le=180)
+    duration_seconds: Optional[int] = Field(default=None, description="Duration in seconds, instead of duration_minutes", gt=0, le=180 * 60)
+    
+    @model_validator(mode="after")
+    def check_duration(self):
+        if (self.duration_minutes is None) == (self.duration_seconds is None):
+            raise ValueError("Provide exactly one of 'duration_minutes' or 'duration_seconds'")
+        return self
+
+
+class ProgramUpdateModel(BaseModel):
+    """Model for replacing a program's steps and start times."""
+    steps: List[ProgramStepModel] = Field(..., description="Zones to water back to back, in order", min_length=1)
+    schedules: List[ProgramScheduleModel] = Field(default=[], description="Start times of the whole program (empty = manual runs only)")
+    
+    def to_steps(self) -> List[ProgramStep]:
+        """Convert the payload to controller program steps."""
+        return [ProgramStep.from_dict(model.model_dump()) for model in self.steps]
+    
+    def to_schedules(self) -> List[SprinklerSchedule]:
+        """Convert the payload to controller schedules, lasting as long as the steps."""
+        duration_seconds = sum(step.duration_seconds for step in self.to_steps())
+        return [
+            SprinklerSchedule.from_dict({**model.model_dump(), 'duration_seconds': duration_seconds})
+            for model in self.schedules
+        ]
+
+
+class ProgramModel(ProgramUpdateModel):
+    """Program data model."""
+    name: str = Field(..., description="Program name (distinct from every zone name)", min_length=1, max_length=50)
+
+
+class DispatchLimitsModel(BaseModel):
+    """Model for hydraulic dispatch limits."""
+    max_concurrent_zones: Optional[int] = Field(default=None, description="Maximum zones open at once (null = no limit)", gt=0)
+    max_total_flow: Optional[float] = Field(default=None, description="Maximum summed flow of open zones (null = no limit)", gt=0)
+
+
+class MasterValveModel(BaseModel):
+    """Model for a master valve or pump-start relay."""
+    gpio_pin: PinField = Field(..., description="GPIO pin number of the relay, or an expander pin (see ZoneModel)")
+    lead_seconds: float = Field(default=0.0, description="Seconds it is on before the first zone opens", ge=0, le=300)
+    lag_seconds: float = Field(default=0.0, description="Seconds it stays on after the last zone closes", ge=0, le=3600)
+
+
+class TimezoneModel(BaseModel):
+    """Model for the schedule timezone and DST policies."""
+    timezone: Optional[str] = Field(default=None, description="IANA timezone, e.g. 'America/Chicago' (null = system local time)")
+    nonexistent_policy: Optional[str] = Field(default=None, description="Start times skipped by spring-forward: shift or skip", pattern="^(shift|skip)$")
+    ambiguous_policy: Optional[str] = Field(default=None, description="Start times repeated by fall-back: first or second", pattern="^(first|second)$")
+
+
+class RainDelayModel(BaseModel):
+    """Model for a rain delay."""
+    hours: float = Field(..., description="Suspend scheduled runs for this many hours from now", gt=0, le=24 * 30)
+
+
+class BlackoutModel(BaseModel):
+    """Model for a recurring blackout window."""
+    start_time: str = Field(..., description="Local time the window opens, HH:MM", pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$")
+    end_time: str = Field(..., description="Local time the window closes, HH:MM (earlier than start_time = next day)", pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$")
+    days: Optional[List[conint(ge=0, le=6)]] = Field(default=None, description="Weekdays the window opens on (0=Monday, null = every day)", min_length=1, max_length=7)
+    expires_in_hours: Optional[float] = Field(default=None, description="Remove the window after this many hours (null = keep)", gt=0)
 
 
 class ZoneStatusModel(BaseModel):
     """Zone status response model."""
     name: str
     gpio_pin: int
+    flow_rate: float
+    cycle_minutes: Optional[float]
+    soak_minutes: float
     active: bool
-    schedule: dict
+    schedule: Optional[dict]
+    schedules: List[dict]
+
+
+def zone_status(zone: Zone) -> dict:
+    """Build the status response for a zone."""
+    return {
+        "name": zone.name,
+        "gpio_pin": zone.gpio_pin,
+        "flow_rate": zone.flow_rate,
+        "cycle_minutes": zone.cycle_minutes,
+        "soak_minutes": zone.soak_minutes,
+        "active": zone.active,
+        "schedule": zone.schedule.to_dict() if zone.schedule else None,
+        "schedules": [schedule.to_dict() for schedule in zone.schedules]
+    }
+
+
+def program_status(program: Program) -> dict:
+    """Build the status response for a program."""
+    return {
+        **program.to_dict(),
+        "duration_seconds": program.duration_seconds,
+        "running": any(item["program"] == program.name for item in controller.run_manager.active_sequences())
+    }
+
+
+def find_program(name: str) -> Program:
+    """Get a program by name or raise a 404."""
+    program = controller.find_program(name)
+    if program is None:
+        raise HTTPException(status_code=404, detail=f"Program '{name}' not found")
+    return program
+
+
+def find_zone(zone_name: str) -> Zone:
+    """Get a zone by name or raise a 404."""
+    for zone in controller.zones:
+        if zone.name == zone_name:
+            return zone
+    raise HTTPException(status_code=404, detail=f"Zone '{zone_name}' not found")
+
+
+def find_owner(name: str):
+    """Get a zone or program by name or raise a 404."""
+    for item in controller.zones + controller.programs:
+        if item.name == name:
+            return item
+    raise HTTPException(status_code=404, detail=f"Zone or program '{name}' not found")
+
+
+def resolve_pin(gpio_pin) -> int:
+    """Get the pin number of a request's pin, or raise a 400 if the GPIO backend has no such pin."""
+    if isinstance(gpio_pin, PinAddressModel):
+        gpio_pin = gpio_pin.model_dump()
+    try:
+        pin = controller.resolve_pin(gpio_pin)
+        controller.check_pin(pin)
+    except PinError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return pin
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize the sprinkler controller on startup."""
+    """Initialize the sprinkler controller and start its scheduler on startup."""
     global controller
     try:
-        controller = SprinklerController()
+        # SPRINKLER_GPIO=simulated runs the API off the Pi with in-memory pins; expander
+        # backends also read the chip count and bus (SPRINKLER_GPIO_BUS=simulated for an in-memory bus)
+        gpio = create_backend(
+            os.environ.get("SPRINKLER_GPIO", BACKEND_RPI),
+            chips=int(os.environ.get("SPRINKLER_GPIO_CHIPS", 1)),
+            bus=os.environ.get("SPRINKLER_GPIO_BUS")
+        )
+        controller = AsyncSprinklerController(gpio=gpio)
+        await controller.start()
         logger.info("Sprinkler controller initialized")
     except Exception as e:
         logger.error(f"Failed to initialize controller: {e}")
@@ -87,7 +350,7 @@ async def shutdown_event():
     """Clean up on shutdown."""
     global controller
     if controller:
-        controller.cleanup()
+        await controller.stop()
         logger.info("Controller cleaned up")
 
 
@@ -107,16 +370,7 @@ async def get_zones():
     if not controller:
         raise HTTPException(status_code=500, detail="Controller not initialized")
     
-    zones_data = []
-    for zone in controller.zones:
-        zones_data.append({
-            "name": zone.name,
-            "gpio_pin": zone.gpio_pin,
-            "active": zone.active,
-            "schedule": zone.schedule.to_dict()
-        })
-    
-    return zones_data
+    return [zone_status(zone) for zone in controller.zones]
 
 
 @app.get("/zones/{zone_name}", response_model=ZoneStatusModel, tags=["Zones"])
@@ -125,16 +379,7 @@ async def get_zone(zone_name: str):
     if not controller:
         raise HTTPException(status_code=500, detail="Controller not initialized")
     
-    for zone in controller.zones:
-        if zone.name == zone_name:
-            return {
-                "name": zone.name,
-                "gpio_pin": zone.gpio_pin,
-                "active": zone.active,
-                "schedule": zone.schedule.to_dict()
-            }
-    
-    raise HTTPException(status_code=404, detail=f"Zone '{zone_name}' not found")
+    return zone_status(find_zone(zone_name))
 
 
 @app.post("/zones", status_code=201, tags=["Zones"])
@@ -143,51 +388,93 @@ async def create_zone(zone: ZoneModel):
     if not controller:
         raise HTTPException(status_code=500, detail="Controller not initialized")
     
+    gpio_pin = resolve_pin(zone.gpio_pin)
     # Check if zone already exists
     for existing_zone in controller.zones:
         if existing_zone.name == zone.name:
             raise HTTPException(status_code=409, detail=f"Zone '{zone.name}' already exists")
-        if existing_zone.gpio_pin == zone.gpio_pin:
-            raise HTTPException(status_code=409, detail=f"GPIO pin {zone.gpio_pin} already in use")
+        if existing_zone.gpio_pin == gpio_pin:
+            raise HTTPException(status_code=409, detail=f"GPIO pin {gpio_pin} already in use")
+    if controller.master_valve is not None and controller.master_valve.gpio_pin == gpio_pin:
+        raise HTTPException(status_code=409, detail=f"GPIO pin {gpio_pin} is used by the master valve")
+    if controller.find_program(zone.name) is not None:
+        raise HTTPException(status_code=409, detail=f"Program '{zone.name}' already exists")
     
     try:
-        controller.add_zone(
+        warnings = controller.add_zone(
             name=zone.name,
-            gpio_pin=zone.gpio_pin,
-            days=zone.schedule.days,
-            start_time=zone.schedule.start_time,
-            duration_minutes=zone.schedule.duration_minutes,
-            enabled=zone.schedule.enabled
+            gpio_pin=gpio_pin,
+            schedules=zone.to_schedules(),
+            flow_rate=zone.flow_rate,
+            cycle_minutes=zone.cycle_minutes,
+            soak_minutes=zone.soak_minutes
         )
-        return {"message": f"Zone '{zone.name}' created successfully"}
+        return {"message": f"Zone '{zone.name}' created successfully", "warnings": warnings}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.put("/zones/{zone_name}/schedule", tags=["Zones"])
 async def update_zone_schedule(zone_name: str, zone_update: ZoneUpdateModel):
-    """Update a zone's schedule."""
+    """Replace a zone's schedules."""
     if not controller:
         raise HTTPException(status_code=500, detail="Controller not initialized")
     
     # Check if zone exists
-    zone_exists = any(zone.name == zone_name for zone in controller.zones)
-    if not zone_exists:
-        raise HTTPException(status_code=404, detail=f"Zone '{zone_name}' not found")
+    find_zone(zone_name)
     
     try:
-        controller.update_zone_schedule(
+        warnings = controller.set_zone_schedules(zone_name, zone_update.to_schedules())
+        return {"message": f"Schedule for zone '{zone_name}' updated successfully", "warnings": warnings}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/zones/{zone_name}/schedules", status_code=201, tags=["Zones"])
+async def add_zone_schedule(zone_name: str, schedule: ScheduleModel):
+    """Add another schedule to a zone."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    zone = find_zone(zone_name)
+    
+    try:
+        controller.add_zone_schedule(
             zone_name=zone_name,
-            days=zone_update.schedule.days,
-            start_time=zone_update.schedule.start_time,
-            duration_minutes=zone_update.schedule.duration_minutes,
-            enabled=zone_update.schedule.enabled
+            days=schedule.days,
+            start_time=schedule.start_time,
+            duration_minutes=schedule.duration_minutes,
+            enabled=schedule.enabled,
+            cron=schedule.cron,
+            schedule_type=schedule.type,
+            interval_days=schedule.interval_days,
+            epoch=schedule.epoch,
+            duration_seconds=schedule.duration_seconds
         )
-        return {"message": f"Schedule for zone '{zone_name}' updated successfully"}
+        return {
+            "message": f"Schedule added to zone '{zone_name}'",
+            "index": len(zone.schedules) - 1,
+            "warnings": controller.find_schedule_conflicts(zone_name)
+        }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.delete("/zones/{zone_name}/schedules/{index}", tags=["Zones"])
+async def delete_zone_schedule(zone_name: str, index: int):
+    """Remove one schedule from a zone."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    zone = find_zone(zone_name)
+    
+    if len(zone.schedules) == 1 and index == 0:
+        raise HTTPException(status_code=400, detail=f"Zone '{zone_name}' has only one schedule; disable or replace it instead")
+    if not controller.remove_zone_schedule(zone_name, index):
+        raise HTTPException(status_code=404, detail=f"Zone '{zone_name}' has no schedule {index}")
+    return {"message": f"Schedule {index} removed from zone '{zone_name}'"}
+
+
 @app.delete("/zones/{zone_name}", tags=["Zones"])
 async def delete_zone(zone_name: str):
     """Delete a zone."""
@@ -205,7 +492,7 @@ async def delete_zone(zone_name: str):
 
 
 @app.post("/zones/{zone_name}/run", tags=["Manual Control"])
-async def run_zone_manually(zone_name: str, run_params: ManualRunModel, background_tasks: BackgroundTasks):
+async def run_zone_manually(zone_name: str, run_params: ManualRunModel):
     """Manually run a zone for a specified duration."""
     if not controller:
         raise HTTPException(status_code=500, detail="Controller not initialized")
@@ -220,15 +507,27 @@ async def run_zone_manually(zone_name: str, run_params: ManualRunModel, backgrou
     if not target_zone:
         raise HTTPException(status_code=404, detail=f"Zone '{zone_name}' not found")
     
-    if target_zone.active:
-        raise HTTPException(status_code=409, detail=f"Zone '{zone_name}' is already running")
-    
-    # Run zone in background
-    background_tasks.add_task(controller.run_zone, target_zone, run_params.duration_minutes)
+    # The controller's run manager times the run; waiting only suspends this request
+    if run_params.wait:
+        run = await controller.run_zone(target_zone, run_params.minutes(), run_params.priority_level())
+    else:
+        run = controller.start_run(target_zone, run_params.minutes(), run_params.priority_level())
+    if run is None:
+        raise HTTPException(status_code=409, detail=f"Zone '{zone_name}' is already running at equal or higher priority")
     
+    if run.state == RUN_DONE:
+        message = f"Zone '{zone_name}' finished"
+    elif run.state == RUN_QUEUED:
+        message = f"Zone '{zone_name}' queued"
+    else:
+        message = f"Zone '{zone_name}' started"
     return {
-        "message": f"Zone '{zone_name}' started",
-        "duration_minutes": run_params.duration_minutes
+        "message": message,
+        "state": run.state,
+        "priority": run_params.priority,
+        "duration_minutes": run_params.minutes(),
+        "duration_seconds": run.duration_seconds,
+        "cycles": run.cycle_timeline(controller.clock.monotonic())
     }
 
 
@@ -248,15 +547,217 @@ async def stop_zone_manually(zone_name: str):
     if not target_zone:
         raise HTTPException(status_code=404, detail=f"Zone '{zone_name}' not found")
     
-    if not target_zone.active:
+    # Stop the zone (or drop it from the dispatch queue)
+    if not controller.stop_run(zone_name):
         raise HTTPException(status_code=409, detail=f"Zone '{zone_name}' is not running")
     
-    # Stop the zone
-    controller.stop_events[zone_name].set()
-    
     return {"message": f"Zone '{zone_name}' stopped"}
 
 
+@app.post("/zones/{zone_name}/pause", tags=["Manual Control"])
+async def pause_zone(zone_name: str):
+    """Pause a zone's run; the valve closes and the remaining time is kept."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    find_zone(zone_name)
+    if not controller.pause_run(zone_name):
+        raise HTTPException(status_code=409, detail=f"Zone '{zone_name}' has no run to pause")
+    return {"message": f"Zone '{zone_name}' paused", "run": controller.run_manager.get_run(zone_name)}
+
+
+@app.post("/zones/{zone_name}/resume", tags=["Manual Control"])
+async def resume_zone(zone_name: str):
+    """Resume a paused zone with the time it had left."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    find_zone(zone_name)
+    if not controller.resume_run(zone_name):
+        raise HTTPException(status_code=409, detail=f"Zone '{zone_name}' is not paused")
+    return {"message": f"Zone '{zone_name}' resumed", "run": controller.run_manager.get_run(zone_name)}
+
+
+@app.post("/zones/{zone_name}/extend", tags=["Manual Control"])
+async def extend_zone(zone_name: str, extension: ExtendModel):
+    """Add watering time to a zone's current run (running, soaking, queued or paused)."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    find_zone(zone_name)
+    if not controller.extend_run(zone_name, extension.to_minutes()):
+        raise HTTPException(status_code=409, detail=f"Zone '{zone_name}' is not running")
+    return {"message": f"Run for zone '{zone_name}' extended", "run": controller.run_manager.get_run(zone_name)}
+
+
+@app.put("/zones/{zone_name}/cycle-soak", tags=["Zones"])
+async def set_zone_cycle_soak(zone_name: str, settings: CycleSoakModel):
+    """Split the zone's runs into cycles separated by soak breaks."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    if not controller.set_zone_cycle_soak(zone_name, settings.cycle_minutes, settings.soak_minutes):
+        raise HTTPException(status_code=404, detail=f"Zone '{zone_name}' not found")
+    
+    return {"message": f"Cycle/soak updated for zone '{zone_name}'", **settings.model_dump()}
+
+
+@app.get("/queue", tags=["Manual Control"])
+async def get_run_queue():
+    """
+    Get running zones, zones soaking between cycles, runs waiting for the
+    dispatch limits, runs set aside for a higher-priority run of the same
+    zone, paused runs, running programs, and the limits. Each run lists its
+    cycle timeline.
+    """
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    return {
+        "max_concurrent_zones": controller.run_manager.max_concurrent,
+        "max_total_flow": controller.run_manager.max_flow,
+        "running": controller.run_manager.active_runs(),
+        "soaking": controller.run_manager.soaking_runs(),
+        "queued": controller.run_manager.queued_runs(),
+        "preempted": controller.run_manager.preempted_runs(),
+        "paused": controller.run_manager.paused_runs(),
+        "programs": controller.run_manager.active_sequences()
+    }
+
+
+@app.get("/programs", tags=["Programs"])
+async def get_programs():
+    """Get every program."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    return [program_status(program) for program in controller.programs]
+
+
+@app.get("/programs/{name}", tags=["Programs"])
+async def get_program(name: str):
+    """Get a specific program."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    return program_status(find_program(name))
+
+
+@app.post("/programs", status_code=201, tags=["Programs"])
+async def create_program(program: ProgramModel):
+    """Create a program that waters zones back to back from shared start times."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    if any(item.name == program.name for item in controller.zones + controller.programs):
+        raise HTTPException(status_code=409, detail=f"Zone or program '{program.name}' already exists")
+    try:
+        warnings = controller.add_program(program.name, program.to_steps(), program.to_schedules())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": f"Program '{program.name}' created successfully", "warnings": warnings}
+
+
+@app.put("/programs/{name}", tags=["Programs"])
+async def update_program(name: str, program: ProgramUpdateModel):
+    """Replace a program's steps and start times."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    find_program(name)
+    try:
+        warnings = controller.update_program(name, program.to_steps(), program.to_schedules())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": f"Program '{name}' updated successfully", "warnings": warnings}
+
+
+@app.delete("/programs/{name}", tags=["Programs"])
+async def delete_program(name: str):
+    """Delete a program (stopping it if it is running)."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    if not controller.remove_program(name):
+        raise HTTPException(status_code=404, detail=f"Program '{name}' not found")
+    return {"message": f"Program '{name}' deleted successfully"}
+
+
+@app.post("/programs/{name}/run", tags=["Programs"])
+async def run_program(name: str, run_params: ProgramRunModel = ProgramRunModel()):
+    """Run a program's zones one after another now."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    find_program(name)
+    sequence = controller.start_program(name, run_params.priority_level())
+    if sequence is None:
+        raise HTTPException(status_code=409, detail=f"Program '{name}' is already running")
+    return {
+        "message": f"Program '{name}' started",
+        **sequence.to_dict(controller.clock.monotonic())
+    }
+
+
+@app.post("/programs/{name}/stop", tags=["Programs"])
+async def stop_program(name: str):
+    """Stop a running program and its current zone."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    find_program(name)
+    if not controller.stop_program(name):
+        raise HTTPException(status_code=409, detail=f"Program '{name}' is not running")
+    return {"message": f"Program '{name}' stopped"}
+
+
+@app.put("/queue/limits", tags=["Manual Control"])
+async def set_dispatch_limits(limits: DispatchLimitsModel):
+    """Set how many zones (or how much total flow) may run at once."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    controller.set_dispatch_limits(limits.max_concurrent_zones, limits.max_total_flow)
+    return {"message": "Dispatch limits updated", **limits.model_dump()}
+
+
+@app.get("/master-valve", tags=["Manual Control"])
+async def get_master_valve():
+    """Get the master valve or pump relay, if there is one."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    master = controller.master_valve
+    if master is None:
+        raise HTTPException(status_code=404, detail="No master valve configured")
+    return {**master.to_dict(), "active": master.active}
+
+
+@app.put("/master-valve", tags=["Manual Control"])
+async def set_master_valve(master: MasterValveModel):
+    """Switch a master valve or pump relay on whenever any zone is on."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    gpio_pin = resolve_pin(master.gpio_pin)
+    try:
+        valve = controller.set_master_valve(gpio_pin, master.lead_seconds, master.lag_seconds)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": "Master valve updated", **valve.to_dict()}
+
+
+@app.delete("/master-valve", tags=["Manual Control"])
+async def delete_master_valve():
+    """Stop driving the master valve."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    if not controller.remove_master_valve():
+        raise HTTPException(status_code=404, detail="No master valve configured")
+    return {"message": "Master valve removed"}
+
+
 @app.get("/status", tags=["General"])
 async def get_system_status():
     """Get overall system status."""
@@ -264,13 +765,15 @@ async def get_system_status():
         raise HTTPException(status_code=500, detail="Controller not initialized")
     
     active_zones = [zone.name for zone in controller.zones if zone.active]
-    enabled_zones = [zone.name for zone in controller.zones if zone.schedule.enabled]
+    enabled_zones = [zone.name for zone in controller.zones if zone.schedule_enabled]
     
     return {
         "controller_running": controller.is_running,
         "global_schedule_enabled": controller.global_schedule_enabled,
         "total_zones": len(controller.zones),
         "active_zones": active_zones,
+        "master_valve_active": controller.master_valve is not None and controller.master_valve.active,
+        "gpio_pins": controller.gpio.pin_count,
         "zones": [zone.name for zone in controller.zones],
         "enabled_schedules": enabled_zones
     }
@@ -296,6 +799,146 @@ async def disable_global_schedule():
     return {"message": "Global schedule disabled", "enabled": False}
 
 
+@app.post("/schedule/reload", tags=["Schedule Control"])
+async def reload_schedule():
+    """Re-read the schedule file after editing it; unchanged running zones keep running."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    try:
+        controller.reload_schedule()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "message": "Schedule reloaded",
+        "zones": [zone.name for zone in controller.zones],
+        "active_zones": [zone.name for zone in controller.zones if zone.active]
+    }
+
+
+@app.get("/schedule/upcoming", tags=["Schedule Control"])
+async def get_upcoming_runs(hours: float = Query(default=24, gt=0, le=24 * 31, description="How many hours ahead to list")):
+    """Get the scheduled runs of all zones over the next hours, in start order."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    return {
+        "global_schedule_enabled": controller.global_schedule_enabled,
+        "hours": hours,
+        "runs": controller.upcoming_runs(hours)
+    }
+
+
+@app.get("/schedule/conflicts", tags=["Schedule Control"])
+async def get_schedule_conflicts(zone: Optional[str] = None):
+    """Get where zones' schedules overlap during the week (optionally only for one zone or program)."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    if zone is not None:
+        find_owner(zone)
+    conflicts = controller.find_schedule_conflicts(zone)
+    return {"count": len(conflicts), "conflicts": conflicts}
+
+
+@app.get("/schedule/week", tags=["Schedule Control"])
+async def get_week_plan(zone: Optional[str] = None,
+                        day: Optional[int] = Query(default=None, ge=0, le=6, description="Weekday (0=Monday)")):
+    """Get the runs planned for a typical week (optionally only for one zone or program, or weekday)."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    if zone is not None:
+        find_owner(zone)
+    runs = controller.week_plan(zone, day)
+    return {"count": len(runs), "runs": runs}
+
+
+@app.get("/schedule/suspensions", tags=["Schedule Control"])
+async def get_suspensions():
+    """Get every rain delay and blackout window."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    return controller.list_suspensions()
+
+
+@app.post("/schedule/rain-delay", status_code=201, tags=["Schedule Control"])
+async def add_rain_delay(delay: RainDelayModel):
+    """Suspend scheduled runs for a number of hours; they resume on their own."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    rain_delay = controller.add_rain_delay(delay.hours)
+    return {
+        "message": f"Scheduled runs suspended for {delay.hours} hours",
+        "id": rain_delay.id,
+        "until": controller.local_time.to_local(rain_delay.end)
+    }
+
+
+@app.post("/schedule/blackouts", status_code=201, tags=["Schedule Control"])
+async def add_blackout(blackout: BlackoutModel):
+    """Suspend scheduled runs between two local times every day (or on some weekdays)."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    if blackout.days is not None and any(not 0 <= day <= 6 for day in blackout.days):
+        raise HTTPException(status_code=400, detail="Days must be between 0 (Monday) and 6 (Sunday)")
+    expires_at = None
+    if blackout.expires_in_hours is not None:
+        expires_at = controller.clock.utcnow().replace(microsecond=0) + timedelta(hours=blackout.expires_in_hours)
+    try:
+        window = controller.add_blackout(blackout.start_time, blackout.end_time, blackout.days, expires_at)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": f"Blackout {blackout.start_time}-{blackout.end_time} added", "id": window.id}
+
+
+@app.delete("/schedule/suspensions/{suspension_id}", tags=["Schedule Control"])
+async def delete_suspension(suspension_id: int):
+    """Cancel a rain delay or blackout window."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    if not controller.remove_suspension(suspension_id):
+        raise HTTPException(status_code=404, detail=f"Suspension {suspension_id} not found")
+    return {"message": f"Suspension {suspension_id} removed"}
+
+
+@app.get("/schedule/timezone", tags=["Schedule Control"])
+async def get_timezone():
+    """Get the timezone schedules are written in and the DST policies."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    return {
+        "timezone": controller.local_time.name,
+        "nonexistent_policy": controller.nonexistent_policy,
+        "ambiguous_policy": controller.ambiguous_policy,
+        "local_time": controller.local_now().isoformat(timespec="seconds")
+    }
+
+
+@app.put("/schedule/timezone", tags=["Schedule Control"])
+async def set_timezone(settings: TimezoneModel):
+    """Set the timezone schedules are written in and how DST changes are handled."""
+    if not controller:
+        raise HTTPException(status_code=500, detail="Controller not initialized")
+    
+    try:
+        controller.set_timezone(settings.timezone, settings.nonexistent_policy, settings.ambiguous_policy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "message": "Timezone updated",
+        "timezone": controller.local_time.name,
+        "nonexistent_policy": controller.nonexistent_policy,
+        "ambiguous_policy": controller.ambiguous_policy
+    }
+
+
 @app.post("/zones/{zone_name}/schedule/enable", tags=["Schedule Control"])
 async def enable_zone_schedule(zone_name: str):
     """Enable automatic scheduling for a specific zone."""
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+asyncio Sprinkler Controller
+Runs the schedule and every zone run as tasks on an existing event loop.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from sprinkler_controller import SprinklerController, Zone, CHECK_RETRY_SECONDS
+from run_manager import Run, PRIORITY_MANUAL
+from gpio_backend import GPIOBackend
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSprinklerController(SprinklerController):
+    """
+    SprinklerController that shares the caller's asyncio event loop.
+    
+    The scheduler and the run manager run as tasks instead of threads, so a
+    FastAPI process can serve requests and water zones with no extra threads.
+    All controller state is then touched from the loop thread only.
+    """
+    
+    def __init__(self, schedule_file: str = "sprinkler_schedule.json", clock=None,
+                 gpio: Optional[GPIOBackend] = None):
+        """
+        Initialize the controller (call start() from the event loop to run it).
+        
+        Args:
+            schedule_file: Path to JSON file storing schedule configuration
+            clock: Source of wall-clock and monotonic time (defaults to SystemClock)
+            gpio: GPIO backend to drive pins with (defaults to RPi.GPIO)
+        """
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_wakeup: Optional[asyncio.Event] = None
+        self._tasks = []
+        super().__init__(schedule_file, clock=clock, gpio=gpio)
+    
+    def _start_run_manager(self):
+        """The run manager is started as a task by start()."""
+    
+    def _wake_scheduler(self):
+        """Interrupt the scheduler task's sleep."""
+        super()._wake_scheduler()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._async_wakeup.set)
+    
+    async def start(self):
+        """Start the scheduler and run manager tasks on the running loop."""
+        self._loop = asyncio.get_running_loop()
+        self._async_wakeup = asyncio.Event()
+        self.is_running = True
+        self._tasks = [
+            asyncio.create_task(self.run_manager.run_async()),
+            asyncio.create_task(self.run_scheduler())
+        ]
+        logger.info("Sprinkler controller started")
+    
+    async def stop(self):
+        """Stop all zones and cancel the controller tasks."""
+        self.cleanup()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+    
+    async def run_scheduler(self):
+        """Scheduler task - the asyncio counterpart of run_controller."""
+        while self.is_running:
+            self._async_wakeup.clear()
+            try:
+                self.check_and_run()
+                timeout = self._next_check_timeout()
+            except Exception as e:
+                # Keep scheduling; one failed check (e.g. a GPIO error) must not end the task
+                logger.error(f"Schedule check failed: {e}")
+                timeout = CHECK_RETRY_SECONDS
+            try:
+                await asyncio.wait_for(self._async_wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def run_zone(self, zone: Zone, duration_minutes: float, priority: int = PRIORITY_MANUAL) -> Optional[Run]:
+        """
+        Run sprinklers for a specific zone and wait for the run to finish.
+        
+        Cancelling the awaiting task stops the zone.
+        
+        Args:
+            zone: Zone object to run
+            duration_minutes: How long to run sprinklers in minutes
+            priority: Run priority (see start_run)
+            
+        Returns:
+            The finished Run, or None if the zone already has a run of equal or higher priority
+        """
+        run = self.start_run(zone, duration_minutes, priority)
+        if run is None:
+            return None
+        finished = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        run.add_done_callback(lambda: loop.call_soon_threadsafe(finished.set))
+        try:
+            await finished.wait()
+        except asyncio.CancelledError:
+            self.stop_run(zone.name)
+            raise
+        return run
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Cron Expressions for Sprinkler Controller
+Parses five-field cron expressions once into bitsets for constant-time matching.
+"""
+
+from datetime import date, datetime, timedelta, time as dt_time
+from typing import List, Optional
+
+MONTH_NAMES = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+DAY_NAMES = ['SUN', 'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']
+
+# Longest each month can be (February in a leap year)
+MONTH_DAYS = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+# How far next_match() searches before concluding an expression never fires
+MAX_SEARCH_DAYS = 8 * 366
+
+
+def _lowest_bit_from(bits: int, position: int) -> Optional[int]:
+    """Get the index of the lowest set bit at or above position."""
+    remaining = bits >> position
+    if not remaining:
+        return None
+    return position + (remaining & -remaining).bit_length() - 1
+
+
+def _parse_field(text: str, low: int, high: int, names: Optional[List[str]] = None, name_base: int = 0) -> int:
+    """
+    Parse one cron field into a bitset.
+    
+    Args:
+        text: Field text, e.g. "*", "*/3", "1-5", "MON,WED,FRI"
+        low: Smallest allowed value
+        high: Largest allowed value
+        names: Optional symbolic names for values, starting at name_base
+    
+    Returns:
+        Integer whose bit n is set when value n matches
+    """
+    def value(token: str) -> int:
+        if names and token.upper() in names:
+            return names.index(token.upper()) + name_base
+        number = int(token)
+        if not low <= number <= high:
+            raise ValueError(f"Value {number} out of range {low}-{high}")
+        return number
+    
+    bits = 0
+    for part in text.split(','):
+        if not part:
+            raise ValueError(f"Empty list item in cron field '{text}'")
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"Invalid step in cron field '{text}'")
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start_text, end_text = part.split('-', 1)
+            start, end = value(start_text), value(end_text)
+        else:
+            start = value(part)
+            end = high if step > 1 else start
+        if start > end:
+            raise ValueError(f"Invalid range in cron field '{text}'")
+        for number in range(start, end + 1, step):
+            bits |= 1 << number
+    return bits
+
+
+class CronExpression:
+    """
+    A "minute hour day-of-month month day-of-week" cron expression.
+    
+    Fields accept numbers, "*", ranges ("1-5"), steps ("*/3", "6-18/2") and
+    lists ("1,15"). Months and weekdays also accept names (JAN, MON).
+    Day-of-week uses cron numbering (0 or 7 = Sunday). As in standard cron,
+    when both day fields are restricted a day matches if either one does.
+    """
+    
+    def __init__(self, expression: str):
+        """
+        Parse a cron expression.
+        
+        Args:
+            expression: Five whitespace-separated fields
+        
+        Raises:
+            ValueError: If the expression is malformed or can never match (e.g. "0 6 31 2 *")
+        """
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression '{expression}' must have 5 fields")
+        self.expression = ' '.join(fields)
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = _parse_field(fields[1], 0, 23)
+        self.days_of_month = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12, MONTH_NAMES, 1)
+        cron_weekdays = _parse_field(fields[4], 0, 7, DAY_NAMES, 0)
+        # Convert cron weekdays (0/7 = Sunday) to Python's (0 = Monday)
+        self.weekdays = 0
+        for cron_day in range(8):
+            if cron_weekdays >> cron_day & 1:
+                self.weekdays |= 1 << ((cron_day - 1) % 7)
+        # Restricted means some day is left out, so "*/3" counts but "1-31" does not
+        self.dom_restricted = self.days_of_month != (1 << 32) - 2
+        self.dow_restricted = self.weekdays != 0b1111111
+        # With both day fields restricted, the weekday alone can match
+        if self.dom_restricted and not self.dow_restricted:
+            if not any(self.months >> month & 1 and self.days_of_month & ((1 << (MONTH_DAYS[month - 1] + 1)) - 2)
+                       for month in range(1, 13)):
+                raise ValueError(f"Cron expression '{self.expression}' never matches: no month in it has those days")
+    
+    def __repr__(self) -> str:
+        return f"CronExpression('{self.expression}')"
+    
+    def matches_date(self, day: date) -> bool:
+        """Check whether the expression fires at some time on a date."""
+        if not self.months >> day.month & 1:
+            return False
+        dom_match = bool(self.days_of_month >> day.day & 1)
+        dow_match = bool(self.weekdays >> day.weekday() & 1)
+        if self.dom_restricted and self.dow_restricted:
+            return dom_match or dow_match
+        return dom_match and dow_match
+    
+    def matches_time(self, moment: datetime) -> bool:
+        """Check whether the expression fires at the hour and minute of a datetime."""
+        return bool(self.hours >> moment.hour & 1) and bool(self.minutes >> moment.minute & 1)
+    
+    def matches(self, moment: datetime) -> bool:
+        """Check whether the expression fires in the minute of a datetime."""
+        return self.matches_time(moment) and self.matches_date(moment.date())
+    
+    def repeats_weekly(self) -> bool:
+        """Check whether the expression fires at the same minutes every week."""
+        all_months = (1 << 13) - 2
+        return self.months == all_months and not self.dom_restricted
+    
+    def week_minutes(self) -> List[int]:
+        """
+        Get the minute-of-week slots the expression can fire at.
+        
+        Day-of-month and month restrictions are not weekly, so they must
+        still be checked with matches_date() when a slot comes up.
+        """
+        weekdays = self.weekdays
+        if self.dom_restricted and self.dow_restricted:
+            weekdays = 0b1111111
+        slots = []
+        for weekday in range(7):
+            if not weekdays >> weekday & 1:
+                continue
+            for hour in range(24):
+                if not self.hours >> hour & 1:
+                    continue
+                for minute in range(60):
+                    if self.minutes >> minute & 1:
+                        slots.append((weekday * 24 + hour) * 60 + minute)
+        return slots
+    
+    def _first_time_from(self, hour: int, minute: int) -> Optional[dt_time]:
+        """Get the first matching time of day at or after hour:minute."""
+        next_hour = _lowest_bit_from(self.hours, hour)
+        if next_hour is None:
+            return None
+        if next_hour == hour:
+            next_minute = _lowest_bit_from(self.minutes, minute)
+            if next_minute is not None:
+                return dt_time(hour, next_minute)
+            next_hour = _lowest_bit_from(self.hours, hour + 1)
+            if next_hour is None:
+                return None
+        return dt_time(next_hour, _lowest_bit_from(self.minutes, 0))
+    
+    def next_match(self, after: datetime) -> Optional[datetime]:
+        """
+        Find the first matching minute at or after a datetime.
+        
+        Months that never match are skipped whole, and within a day the
+        hour and minute are found with bit scans rather than iteration.
+        
+        Args:
+            after: Earliest acceptable time (seconds are rounded up to the next minute)
+        
+        Returns:
+            The next matching minute, or None if there is none within ~8 years
+        """
+        if after.second or after.microsecond:
+            after = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = after.date()
+        first_time = self._first_time_from(after.hour, after.minute)
+        last_day = day + timedelta(days=MAX_SEARCH_DAYS)
+        while day <= last_day:
+            if not self.months >> day.month & 1:
+                # Jump to the first day of the next month
+                day = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+                first_time = self._first_time_from(0, 0)
+                continue
+            if first_time is not None and self.matches_date(day):
+                return datetime.combine(day, first_time)
+            day += timedelta(days=1)
+            first_time = self._first_time_from(0, 0)
+        return None
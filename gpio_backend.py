@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+"""
+GPIO Backends for Sprinkler Controller
+Drives relay pins through RPi.GPIO, MCP23017 I2C expanders or 74HC595 shift-register
+chains on a Pi, or records them in memory anywhere else.
+"""
+
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BACKEND_RPI = "rpi"
+BACKEND_SIMULATED = "simulated"
+BACKEND_MCP23017 = "mcp23017"
+BACKEND_74HC595 = "74hc595"
+BACKEND_NAMES = (BACKEND_RPI, BACKEND_SIMULATED, BACKEND_MCP23017, BACKEND_74HC595)
+
+# Bus name that gives an expander backend an in-memory bus
+BUS_SIMULATED = "simulated"
+
+# MCP23017 register addresses with IOCON.BANK = 0 (the power-on default), where
+# each A register is followed by its B register so one write covers both ports
+MCP23017_IODIRA = 0x00
+MCP23017_OLATA = 0x14
+MCP23017_BASE_ADDRESS = 0x20
+MCP23017_MAX_CHIPS = 8
+MCP23017_PINS = 16
+SHIFT_REGISTER_PINS = 8
+
+
+class GPIOBackend:
+    """
+    The pin operations the controller needs.
+    
+    Pins are BCM-numbered relay outputs: set up as outputs driven low,
+    switched on (high) and off (low), and released one by one when no
+    longer used or all together on cleanup.
+    output_many() applies several changes in one write where the hardware
+    allows it; the default falls back to one output() per pin.
+    """
+    
+    # Number of pins, numbered from 0 (None = no fixed limit)
+    pin_count: Optional[int] = None
+    
+    def setup(self, pin: int):
+        """Configure a pin as an output, initially off."""
+        raise NotImplementedError
+    
+    def output(self, pin: int, on: bool):
+        """Switch a pin on (high) or off (low)."""
+        raise NotImplementedError
+    
+    def output_many(self, changes: Dict[int, bool]):
+        """
+        Switch several pins together.
+        
+        Args:
+            changes: New state of each pin (True = on), applied in order
+        """
+        for pin, on in changes.items():
+            self.output(pin, on)
+    
+    def release(self, pin: int):
+        """Release one pin set up through this backend."""
+        raise NotImplementedError
+    
+    def cleanup(self):
+        """Release every pin set up through this backend."""
+        raise NotImplementedError
+    
+    def pin_number(self, chip: int, pin: int) -> int:
+        """
+        Get the pin number of a pin on an I/O expander chip.
+        
+        Raises:
+            ValueError: If there is no such chip or pin (backends without chips have none)
+        """
+        raise ValueError("This GPIO backend has no expander chips; use plain pin numbers")
+
+
+class RPiGPIOBackend(GPIOBackend):
+    """Backend for the Raspberry Pi's own header pins, through RPi.GPIO."""
+    
+    pin_count = 28
+    
+    def __init__(self):
+        """
+        Import RPi.GPIO and select BCM pin numbering.
+        
+        Raises:
+            RuntimeError: If RPi.GPIO is not installed (e.g. not running on a Pi)
+        """
+        try:
+            import RPi.GPIO as GPIO
+        except ImportError:
+            raise RuntimeError("RPi.GPIO is not available; use the simulated GPIO backend off the Pi")
+        self._gpio = GPIO
+        self._gpio.setmode(self._gpio.BCM)
+    
+    def setup(self, pin: int):
+        """Configure a pin as an output, initially off."""
+        self._gpio.setup(pin, self._gpio.OUT)
+        self._gpio.output(pin, self._gpio.LOW)
+    
+    def output(self, pin: int, on: bool):
+        """Switch a pin on (high) or off (low)."""
+        self._gpio.output(pin, self._gpio.HIGH if on else self._gpio.LOW)
+    
+    def output_many(self, changes: Dict[int, bool]):
+        """Switch several pins with a single RPi.GPIO list write."""
+        if not changes:
+            return
+        self._gpio.output(list(changes), [self._gpio.HIGH if on else self._gpio.LOW for on in changes.values()])
+    
+    def release(self, pin: int):
+        """Release one pin set up through this backend."""
+        self._gpio.cleanup(pin)
+    
+    def cleanup(self):
+        """Release every pin set up through this backend."""
+        self._gpio.cleanup()
+
+
+class SimulatedGPIOBackend(GPIOBackend):
+    """
+    In-memory backend that records every pin change with a timestamp.
+    
+    Used by the simulator and for testing and benchmarking off the Pi.
+    Writing to a pin that was never set up raises, as RPi.GPIO does.
+    Changes written together share one timestamp, and writes counts the
+    calls that would reach the hardware.
+    """
+    
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the backend.
+        
+        Args:
+            clock: Source of the timestamps recorded with each change
+        """
+        self._clock = clock
+        self.states: Dict[int, bool] = {}
+        self.history: List[Tuple[float, int, bool]] = []
+        self.writes = 0
+    
+    def setup(self, pin: int):
+        """Configure a pin as an output, initially off."""
+        self.states[pin] = False
+        self.history.append((self._clock(), pin, False))
+    
+    def output(self, pin: int, on: bool):
+        """Switch a pin on (high) or off (low)."""
+        self.output_many({pin: on})
+    
+    def output_many(self, changes: Dict[int, bool]):
+        """Switch several pins at one instant."""
+        for pin in changes:
+            if pin not in self.states:
+                raise RuntimeError(f"GPIO pin {pin} has not been set up as an output")
+        if not changes:
+            return
+        timestamp = self._clock()
+        for pin, on in changes.items():
+            self.states[pin] = on
+            self.history.append((timestamp, pin, on))
+        self.writes += 1
+    
+    def release(self, pin: int):
+        """Release one pin set up through this backend."""
+        self.states.pop(pin, None)
+    
+    def cleanup(self):
+        """Release every pin set up through this backend."""
+        self.states = {}
+    
+    def is_on(self, pin: int) -> bool:
+        """Check whether a pin is currently driven high."""
+        return self.states.get(pin, False)
+    
+    def pins_on(self) -> List[int]:
+        """Get the pins currently driven high, in pin order."""
+        return sorted(pin for pin, on in self.states.items() if on)
+    
+    def changes(self, pin: Optional[int] = None) -> List[Tuple[float, int, bool]]:
+        """
+        Get the recorded (timestamp, pin, on) changes, oldest first.
+        
+        Args:
+            pin: Only this pin's changes
+        """
+        if pin is None:
+            return list(self.history)
+        return [change for change in self.history if change[1] == pin]
+
+
+class I2CBus:
+    """The I2C operation the MCP23017 backend needs."""
+    
+    def write(self, messages: List[Tuple[int, bytes]]):
+        """
+        Write to one or more devices in a single transaction (repeated starts, one stop).
+        
+        Args:
+            messages: (7-bit device address, register address followed by data) of each write
+        """
+        raise NotImplementedError
+
+
+class SMBusI2CBus(I2CBus):
+    """The Pi's I2C bus (/dev/i2c-N), through smbus2."""
+    
+    def __init__(self, bus: int = 1):
+        """
+        Open the bus.
+        
+        Args:
+            bus: I2C bus number (1 on every current Pi)
+        
+        Raises:
+            RuntimeError: If smbus2 is not installed
+        """
+        try:
+            from smbus2 import SMBus, i2c_msg
+        except ImportError:
+            raise RuntimeError("smbus2 is not available; install it or use the simulated bus")
+        self._bus = SMBus(bus)
+        self._message = i2c_msg
+    
+    def write(self, messages: List[Tuple[int, bytes]]):
+        """Write to one or more devices in a single transaction."""
+        self._bus.i2c_rdwr(*(self._message.write(address, data) for address, data in messages))
+
+
+class SimulatedI2CBus(I2CBus):
+    """In-memory I2C bus that records each transaction and every device's registers."""
+    
+    def __init__(self):
+        """Initialize an idle bus."""
+        self.transactions: List[List[Tuple[int, bytes]]] = []
+        # Device address -> register address -> value
+        self.registers: Dict[int, Dict[int, int]] = {}
+    
+    def write(self, messages: List[Tuple[int, bytes]]):
+        """Write to one or more devices in a single transaction."""
+        self.transactions.append([(address, bytes(data)) for address, data in messages])
+        for address, data in messages:
+            registers = self.registers.setdefault(address, {})
+            # Data after the register address goes to consecutive registers
+            for offset, value in enumerate(data[1:]):
+                registers[data[0] + offset] = value
+
+
+class ShiftRegisterBus:
+    """The operation the 74HC595 backend needs."""
+    
+    def shift_out(self, data: bytes):
+        """
+        Shift bytes into the chain and latch them onto the outputs together.
+        
+        Args:
+            data: One byte per chip, the farthest chip's first
+        """
+        raise NotImplementedError
+
+
+class SPIShiftRegisterBus(ShiftRegisterBus):
+    """
+    A 74HC595 chain on the Pi's SPI port, through spidev.
+    
+    MOSI drives SER, SCLK drives SRCLK and the chip select drives RCLK, so
+    the outputs latch when the transfer ends.
+    """
+    
+    def __init__(self, bus: int = 0, device: int = 0):
+        """
+        Open the SPI device.
+        
+        Args:
+            bus: SPI bus number
+            device: Chip select line
+        
+        Raises:
+            RuntimeError: If spidev is not installed
+        """
+        try:
+            import spidev
+        except ImportError:
+            raise RuntimeError("spidev is not available; install it or use the simulated bus")
+        self._spi = spidev.SpiDev()
+        self._spi.open(bus, device)
+        self._spi.max_speed_hz = 1000000
+    
+    def shift_out(self, data: bytes):
+        """Shift bytes into the chain and latch them onto the outputs together."""
+        self._spi.xfer2(list(data))
+
+
+class SimulatedShiftRegisterBus(ShiftRegisterBus):
+    """In-memory 74HC595 chain that records every latched frame."""
+    
+    def __init__(self, chips: int = 1):
+        """
+        Initialize the chain.
+        
+        Args:
+            chips: Number of shift registers in the chain
+        """
+        self._shift = bytearray(chips)
+        self.outputs = bytes(chips)
+        self.frames: List[bytes] = []
+    
+    def shift_out(self, data: bytes):
+        """Shift bytes into the chain and latch them onto the outputs together."""
+        for value in data:
+            # Each byte pushes the previous ones one chip further down the chain
+            self._shift[1:] = self._shift[:-1]
+            self._shift[0] = value
+        self.outputs = bytes(self._shift)
+        self.frames.append(bytes(data))
+
+
+class MCP23017Backend(GPIOBackend):
+    """
+    Relay outputs on MCP23017 16-pin I2C expanders.
+    
+    Pin n is (chip, pin) = divmod(n, 16): pins 0-7 of a chip are GPA0-7 and
+    8-15 are GPB0-7, and chip c answers at I2C address 0x20 + c. The output
+    latches are kept in a shadow register, so nothing is ever read back and
+    output_many() writes every chip it changes in one bus transaction.
+    """
+    
+    def __init__(self, bus: I2CBus, chips: int = 1):
+        """
+        Initialize the backend; every pin stays an input until set up.
+        
+        Args:
+            bus: I2C bus the expanders are on
+            chips: Number of expanders, at consecutive addresses from 0x20
+        
+        Raises:
+            ValueError: If there are no chips or more than an I2C bus can address
+        """
+        if not 1 <= chips <= MCP23017_MAX_CHIPS:
+            raise ValueError(f"An I2C bus holds 1 to {MCP23017_MAX_CHIPS} MCP23017 chips, not {chips}")
+        self._bus = bus
+        self.chips = chips
+        self.pin_count = chips * MCP23017_PINS
+        # Shadow registers: a set bit in directions is an input, in latches an output driven high
+        self._directions = [0xFFFF] * chips
+        self._latches = [0] * chips
+    
+    def address(self, pin: int) -> Tuple[int, int]:
+        """
+        Get the (chip, pin) of a pin number.
+        
+        Raises:
+            ValueError: If no chip has the pin
+        """
+        if not 0 <= pin < self.pin_count:
+            raise ValueError(f"Pin {pin} is not on the {self.chips} MCP23017 chip(s) (pins 0-{self.pin_count - 1})")
+        return divmod(pin, MCP23017_PINS)
+    
+    def pin_number(self, chip: int, pin: int) -> int:
+        """
+        Get the pin number of a chip's pin (0-7 = GPA0-7, 8-15 = GPB0-7).
+        
+        Raises:
+            ValueError: If there is no such chip or pin
+        """
+        if not (0 <= chip < self.chips and 0 <= pin < MCP23017_PINS):
+            raise ValueError(f"There is no pin {pin} on MCP23017 chip {chip}")
+        return chip * MCP23017_PINS + pin
+    
+    def _register_write(self, chip: int, register: int, value: int) -> Tuple[int, bytes]:
+        """Build the write of a 16-bit value to a chip's A and B registers."""
+        return MCP23017_BASE_ADDRESS + chip, bytes([register, value & 0xFF, value >> 8])
+    
+    def setup(self, pin: int):
+        """Configure a pin as an output, initially off."""
+        chip, bit = self.address(pin)
+        self._latches[chip] &= ~(1 << bit)
+        self._directions[chip] &= ~(1 << bit)
+        # Latch low before turning the pin into an output, so it never drives high
+        self._bus.write([
+            self._register_write(chip, MCP23017_OLATA, self._latches[chip]),
+            self._register_write(chip, MCP23017_IODIRA, self._directions[chip])
+        ])
+    
+    def output(self, pin: int, on: bool):
+        """Switch a pin on (high) or off (low)."""
+        self.output_many({pin: on})
+    
+    def output_many(self, changes: Dict[int, bool]):
+        """Switch several pins, writing every chip that changes in one transaction."""
+        latches = list(self._latches)
+        for pin, on in changes.items():
+            chip, bit = self.address(pin)
+            if self._directions[chip] & (1 << bit):
+                raise RuntimeError(f"GPIO pin {pin} has not been set up as an output")
+            if on:
+                latches[chip] |= 1 << bit
+            else:
+                latches[chip] &= ~(1 << bit)
+        changed = [chip for chip in range(self.chips) if latches[chip] != self._latches[chip]]
+        if not changed:
+            return
+        self._bus.write([self._register_write(chip, MCP23017_OLATA, latches[chip]) for chip in changed])
+        self._latches = latches
+    
+    def release(self, pin: int):
+        """Release one pin set up through this backend."""
+        chip, bit = self.address(pin)
+        self._latches[chip] &= ~(1 << bit)
+        self._directions[chip] |= 1 << bit
+        self._bus.write([
+            self._register_write(chip, MCP23017_OLATA, self._latches[chip]),
+            self._register_write(chip, MCP23017_IODIRA, self._directions[chip])
+        ])
+    
+    def cleanup(self):
+        """Release every pin set up through this backend."""
+        self._latches = [0] * self.chips
+        self._directions = [0xFFFF] * self.chips
+        self._bus.write([
+            message for chip in range(self.chips) for message in (
+                self._register_write(chip, MCP23017_OLATA, 0),
+                self._register_write(chip, MCP23017_IODIRA, 0xFFFF)
+            )
+        ])
+
+
+class ShiftRegisterBackend(GPIOBackend):
+    """
+    Relay outputs on a chain of 74HC595 shift registers.
+    
+    Pin n is (chip, pin) = divmod(n, 8), pin p being output Qp and chip 0
+    the one wired to the Pi. The chain can't be read back, so the whole
+    chain is kept in a shadow register and every write shifts all of it
+    out and latches it at once: output_many() is one bus transaction
+    however many pins and chips it changes.
+    """
+    
+    def __init__(self, bus: ShiftRegisterBus, chips: int = 1):
+        """
+        Initialize the backend and drive every output low.
+        
+        Args:
+            bus: Bus the chain is on
+            chips: Number of shift registers in the chain
+        
+        Raises:
+            ValueError: If there are no chips
+        """
+        if chips < 1:
+            raise ValueError(f"A shift-register chain needs at least one chip, not {chips}")
+        self._bus = bus
+        self.chips = chips
+        self.pin_count = chips * SHIFT_REGISTER_PINS
+        self._outputs = bytearray(chips)
+        self._set_up = set()
+        # The outputs power up in no particular state
+        self._write()
+    
+    def address(self, pin: int) -> Tuple[int, int]:
+        """
+        Get the (chip, pin) of a pin number.
+        
+        Raises:
+            ValueError: If no chip has the pin
+        """
+        if not 0 <= pin < self.pin_count:
+            raise ValueError(f"Pin {pin} is not on the {self.chips} 74HC595 chip(s) (pins 0-{self.pin_count - 1})")
+        return divmod(pin, SHIFT_REGISTER_PINS)
+    
+    def pin_number(self, chip: int, pin: int) -> int:
+        """
+        Get the pin number of output Qpin of a chip.
+        
+        Raises:
+            ValueError: If there is no such chip or pin
+        """
+        if not (0 <= chip < self.chips and 0 <= pin < SHIFT_REGISTER_PINS):
+            raise ValueError(f"There is no pin {pin} on 74HC595 chip {chip}")
+        return chip * SHIFT_REGISTER_PINS + pin
+    
+    def _write(self):
+        """Shift the shadow register out, farthest chip first, and latch it."""
+        self._bus.shift_out(bytes(reversed(self._outputs)))
+    
+    def _set(self, pin: int, on: bool) -> bool:
+        """Set a pin in the shadow register; returns whether it changed."""
+        chip, bit = self.address(pin)
+        value = self._outputs[chip] | (1 << bit) if on else self._outputs[chip] & ~(1 << bit)
+        changed = value != self._outputs[chip]
+        self._outputs[chip] = value
+        return changed
+    
+    def setup(self, pin: int):
+        """Configure a pin as an output, initially off."""
+        self._set_up.add(pin)
+        if self._set(pin, False):
+            self._write()
+    
+    def output(self, pin: int, on: bool):
+        """Switch a pin on (high) or off (low)."""
+        self.output_many({pin: on})
+    
+    def output_many(self, changes: Dict[int, bool]):
+        """Switch several pins with one shift of the whole chain."""
+        for pin in changes:
+            if pin not in self._set_up:
+                raise RuntimeError(f"GPIO pin {pin} has not been set up as an output")
+        changed = False
+        for pin, on in changes.items():
+            changed = self._set(pin, on) or changed
+        if changed:
+            self._write()
+    
+    def release(self, pin: int):
+        """Release one pin set up through this backend."""
+        self._set_up.discard(pin)
+        if self._set(pin, False):
+            self._write()
+    
+    def cleanup(self):
+        """Release every pin set up through this backend."""
+        self._set_up = set()
+        self._outputs = bytearray(self.chips)
+        self._write()
+
+
+def create_backend(name: str = BACKEND_RPI, chips: int = 1, bus: Optional[str] = None) -> GPIOBackend:
+    """
+    Create a GPIO backend by name.
+    
+    Args:
+        name: "rpi" (RPi.GPIO), "simulated" (in memory), "mcp23017" (I2C expanders)
+            or "74hc595" (shift-register chain)
+        chips: Number of expanders or shift registers
+        bus: I2C bus number or SPI "bus.device" of the expanders, or "simulated"
+            for an in-memory bus (default: I2C bus 1, SPI 0.0)
+    
+    Raises:
+        ValueError: If the name or expander settings are invalid
+    """
+    if name == BACKEND_RPI:
+        return RPiGPIOBackend()
+    if name == BACKEND_SIMULATED:
+        logger.info("Using the simulated GPIO backend - no pins will be switched")
+        return SimulatedGPIOBackend()
+    if name == BACKEND_MCP23017:
+        if bus == BUS_SIMULATED:
+            logger.info("Using MCP23017 expanders on a simulated I2C bus - no pins will be switched")
+            return MCP23017Backend(SimulatedI2CBus(), chips)
+        return MCP23017Backend(SMBusI2CBus(int(bus or 1)), chips)
+    if name == BACKEND_74HC595:
+        if bus == BUS_SIMULATED:
+            logger.info("Using a 74HC595 chain on a simulated bus - no pins will be switched")
+            return ShiftRegisterBackend(SimulatedShiftRegisterBus(chips), chips)
+        spi_bus, _, device = (bus or "0.0").partition(".")
+        return ShiftRegisterBackend(SPIShiftRegisterBus(int(spi_bus), int(device or 0)), chips)
+    raise ValueError(f"Unknown GPIO backend '{name}' (expected one of: {', '.join(BACKEND_NAMES)})")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Run Calendar for Sprinkler Controller
+Caches each zone's and program's upcoming scheduled runs so previews don't re-scan every schedule.
+"""
+
+import bisect
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# How far ahead a zone is expanded at once, beyond what a query needs
+CALENDAR_CHUNK = timedelta(days=7)
+
+
+class RunCalendar:
+    """
+    Upcoming scheduled runs, kept per zone (or program) in start order.
+    
+    A zone's runs are expanded lazily up to the furthest time queried (in
+    chunks of CALENDAR_CHUNK) and dropped once they are in the past. When a
+    zone's schedules change only that zone is invalidated; the other zones'
+    runs stay cached.
+    """
+    
+    def __init__(self, expand: Callable[[str, datetime, datetime], List[Tuple[datetime, object]]]):
+        """
+        Initialize the calendar.
+        
+        Args:
+            expand: Function (zone_name, start, end) returning the zone's
+                (start time, run) pairs in [start, end), sorted by start
+        """
+        self._expand = expand
+        self._runs: Dict[str, List[Tuple[datetime, object]]] = {}
+        self._covered_until: Dict[str, datetime] = {}
+    
+    def invalidate(self, zone_name: str):
+        """Forget a zone's cached runs (its schedules changed)."""
+        self._runs.pop(zone_name, None)
+        self._covered_until.pop(zone_name, None)
+    
+    def clear(self):
+        """Forget every cached run."""
+        self._runs = {}
+        self._covered_until = {}
+    
+    def zone_runs(self, zone_name: str, start: datetime, end: datetime) -> List[Tuple[datetime, object]]:
+        """
+        Get a zone's runs starting in [start, end), expanding the cache if needed.
+        
+        Args:
+            zone_name: Zone to look up
+            start: Earliest start time (also the point before which cached runs are dropped)
+            end: Latest start time (exclusive)
+        """
+        runs = self._runs.get(zone_name)
+        covered_until = self._covered_until.get(zone_name)
+        if runs is None or covered_until < start:
+            runs, covered_until = [], start
+        else:
+            # Drop runs that have already started
+            del runs[:bisect.bisect_left(runs, (start,))]
+        if covered_until < end:
+            new_end = end + CALENDAR_CHUNK
+            runs.extend(self._expand(zone_name, covered_until, new_end))
+            covered_until = new_end
+        self._runs[zone_name] = runs
+        self._covered_until[zone_name] = covered_until
+        return runs[:bisect.bisect_left(runs, (end,))]
+    
+    def upcoming(self, zone_names: List[str], start: datetime, end: datetime) -> List[Tuple[datetime, str, object]]:
+        """
+        Get every listed zone's runs starting in [start, end), merged in start order.
+        
+        Args:
+            zone_names: Zones to include
+            start: Earliest start time
+            end: Latest start time (exclusive)
+        
+        Returns:
+            (start time, zone name, run) tuples
+        """
+        per_zone = [
+            [(run_start, zone_name, schedule) for run_start, schedule in self.zone_runs(zone_name, start, end)]
+            for zone_name in zone_names
+        ]
+        return list(heapq.merge(*per_zone, key=lambda run: run[:2]))
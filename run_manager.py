@@ -0,0 +1,1115 @@
+#!/usr/bin/env python3
+"""
+Run Manager for Sprinkler Controller
+Times every zone run from a single thread using a hierarchical timer wheel.
+"""
+
+import math
+import heapq
+import contextlib
+import asyncio
+import itertools
+import time
+import threading
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Fraction of a tick by which a time may miss a tick boundary through float
+# round-off and still count as on it
+TICK_TOLERANCE = 1e-6
+
+
+class Timer:
+    """A callback scheduled on a TimerWheel."""
+    
+    __slots__ = ('deadline', 'tick', 'callback', 'cancelled', '_bucket')
+    
+    def __init__(self, deadline: float, tick: int, callback: Callable[[], None]):
+        """
+        Initialize a timer.
+        
+        Args:
+            deadline: Clock time at which the timer expires
+            tick: Wheel tick the deadline rounds up to
+            callback: Function to call on expiry
+        """
+        self.deadline = deadline
+        self.tick = tick
+        self.callback = callback
+        self.cancelled = False
+        self._bucket = None
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel.
+    
+    Level 0 has one slot per tick; each higher level has slots that span a
+    whole revolution of the level below and cascade down when reached. Adding
+    and cancelling are O(1), and advancing jumps straight to the next
+    non-empty slot, so idle time costs nothing.
+    """
+    
+    def __init__(self, tick_seconds: float = 1.0, slot_bits: int = 6, levels: int = 4, origin: float = 0.0):
+        """
+        Initialize the wheel.
+        
+        Args:
+            tick_seconds: Resolution of the wheel in seconds
+            slot_bits: log2 of the number of slots per level
+            levels: Number of levels (horizon is tick * 2**(slot_bits * levels))
+            origin: Clock time corresponding to tick 0
+        """
+        self.tick_seconds = tick_seconds
+        self._bits = slot_bits
+        self._slots = 1 << slot_bits
+        self._mask = self._slots - 1
+        self._levels = [[[] for _ in range(self._slots)] for _ in range(levels)]
+        self._horizon = 1 << (slot_bits * levels)
+        self._origin = origin
+        self._current = 0
+        self._count = 0
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def add(self, deadline: float, callback: Callable[[], None]) -> Timer:
+        """
+        Schedule a callback.
+        
+        Args:
+            deadline: Clock time at which to fire (never fires early)
+            callback: Function to call on expiry
+        
+        Returns:
+            Timer handle that can be passed to cancel()
+        """
+        tick = math.ceil((deadline - self._origin) / self.tick_seconds - TICK_TOLERANCE)
+        timer = Timer(deadline, max(tick, self._current + 1), callback)
+        self._place(timer)
+        self._count += 1
+        return timer
+    
+    def cancel(self, timer: Timer):
+        """Cancel a pending timer (no-op if it already fired)."""
+        if timer.cancelled or timer._bucket is None:
+            return
+        timer.cancelled = True
+        timer._bucket.remove(timer)
+        timer._bucket = None
+        self._count -= 1
+    
+    def _place(self, timer: Timer):
+        """Put a timer into the slot matching its distance from the current tick."""
+        tick = min(timer.tick, self._current + self._horizon - 1)
+        delta = tick - self._current
+        level = 0
+        while delta >= 1 << (self._bits * (level + 1)):
+            level += 1
+        bucket = self._levels[level][(tick >> (self._bits * level)) & self._mask]
+        bucket.append(timer)
+        timer._bucket = bucket
+    
+    def _next_event_tick(self) -> Optional[int]:
+        """Find the next tick at which a slot fires or cascades."""
+        if not self._count:
+            return None
+        best = None
+        for level, slots in enumerate(self._levels):
+            shift = self._bits * level
+            base = self._current >> shift
+            for k in range(1, self._slots + 1):
+                tick = (base + k) << shift
+                if best is not None and tick >= best:
+                    break
+                if slots[(base + k) & self._mask]:
+                    best = tick
+                    break
+        return best
+    
+    def next_deadline(self) -> Optional[float]:
+        """
+        Get the clock time of the next wheel event.
+        
+        This may be a cascade rather than an expiry, so callers should simply
+        advance() again when it is reached.
+        """
+        tick = self._next_event_tick()
+        if tick is None:
+            return None
+        return self._origin + tick * self.tick_seconds
+    
+    def advance(self, now: float) -> List[Timer]:
+        """
+        Move the wheel forward to a clock time.
+        
+        Args:
+            now: Current clock time
+        
+        Returns:
+            Timers that expired, in tick order
+        """
+        target = math.floor((now - self._origin) / self.tick_seconds + TICK_TOLERANCE)
+        expired = []
+        while self._current < target:
+            tick = self._next_event_tick()
+            if tick is None or tick > target:
+                self._current = target
+                break
+            self._current = tick
+            for level in range(len(self._levels) - 1, 0, -1):
+                shift = self._bits * level
+                if tick & ((1 << shift) - 1) == 0:
+                    self._cascade(level, (tick >> shift) & self._mask)
+            slot = tick & self._mask
+            bucket = self._levels[0][slot]
+            self._levels[0][slot] = []
+            for timer in bucket:
+                if timer.tick <= tick:
+                    timer._bucket = None
+                    self._count -= 1
+                    expired.append(timer)
+                else:
+                    self._place(timer)
+        return expired
+    
+    def _cascade(self, level: int, slot: int):
+        """Redistribute one higher-level slot into the levels below."""
+        bucket = self._levels[level][slot]
+        self._levels[level][slot] = []
+        for timer in bucket:
+            self._place(timer)
+
+
+RUN_QUEUED = "queued"
+RUN_RUNNING = "running"
+RUN_SOAKING = "soaking"
+RUN_PREEMPTED = "preempted"
+RUN_PAUSED = "paused"
+RUN_DONE = "done"
+
+# Resolution of run and soak timers - fine enough for runs measured in seconds
+TIMER_TICK_SECONDS = 0.1
+
+# Wait before polling again after a poll failed (e.g. a GPIO error while switching)
+POLL_RETRY_SECONDS = 1.0
+
+# Leftover watering shorter than this is dropped rather than run as another cycle
+MIN_CYCLE_SECONDS = 1.0
+
+# Run priorities - higher runs go first and may preempt lower ones
+PRIORITY_TEST = 0
+PRIORITY_SCHEDULED = 1
+PRIORITY_MANUAL = 2
+PRIORITY_FROST = 3
+PRIORITY_NAMES = {
+    PRIORITY_TEST: "test",
+    PRIORITY_SCHEDULED: "scheduled",
+    PRIORITY_MANUAL: "manual",
+    PRIORITY_FROST: "frost",
+}
+
+
+class Run:
+    """
+    A zone run tracked by the RunManager, from queueing until it finishes.
+    
+    With a cycle length set, the run waters in several cycles of at most
+    cycle_seconds, split evenly, and the zone rests soak_seconds between them.
+    A preempted or paused run keeps its remaining watering time for when it resumes.
+    """
+    
+    def __init__(self, zone, duration_seconds: float, priority: int = 0,
+                 cycle_seconds: Optional[float] = None, soak_seconds: float = 0.0):
+        """
+        Initialize a run.
+        
+        Args:
+            zone: Zone being watered
+            duration_seconds: Total watering time in seconds
+            priority: Run priority (higher runs first and may preempt lower ones)
+            cycle_seconds: Longest single cycle (None = water in one go)
+            soak_seconds: Rest between cycles
+        """
+        self.zone = zone
+        self.duration_seconds = duration_seconds
+        self.priority = priority
+        # Cycling without a soak would only flick the valve off and on
+        self.cycle_seconds = cycle_seconds if cycle_seconds and soak_seconds > 0 else None
+        self.soak_seconds = soak_seconds
+        self.pending_seconds = duration_seconds
+        self.state = RUN_QUEUED
+        self.seq = 0
+        self.started_at: Optional[float] = None
+        self.cycle_started_at: Optional[float] = None
+        self.ends_at: Optional[float] = None
+        self.resumes_at: Optional[float] = None
+        # Set while paused by the user, even when preempted on top of that
+        self.paused_at: Optional[float] = None
+        self.completed_cycles: List[Tuple[float, float]] = []
+        self.preemptions = 0
+        # Lower-priority run of the same zone that resumes once this one ends
+        self.displaced: Optional["Run"] = None
+        self.timer: Optional[Timer] = None
+        self.done = threading.Event()
+        self._done_callbacks: List[Callable[[], None]] = []
+    
+    def add_done_callback(self, callback: Callable[[], None]):
+        """Call a function once the run finishes (immediately if it already has)."""
+        if self.done.is_set():
+            callback()
+        else:
+            self._done_callbacks.append(callback)
+    
+    def _set_done(self):
+        """Mark the run finished and notify waiters."""
+        self.state = RUN_DONE
+        self.done.set()
+        for callback in self._done_callbacks:
+            callback()
+        self._done_callbacks = []
+    
+    def next_cycle_seconds(self, pending_seconds: Optional[float] = None) -> float:
+        """Get the length of the next cycle, splitting the pending time into equal cycles."""
+        if pending_seconds is None:
+            pending_seconds = self.pending_seconds
+        if self.cycle_seconds is None or pending_seconds <= self.cycle_seconds:
+            return pending_seconds
+        return pending_seconds / math.ceil(pending_seconds / self.cycle_seconds)
+    
+    def remaining_seconds(self, now: float) -> float:
+        """Get the watering time left, including the rest of the current cycle."""
+        remaining = self.pending_seconds
+        if self.state == RUN_RUNNING:
+            # A cycle waiting for the master valve's lead has not started watering yet
+            remaining += max(0.0, self.ends_at - max(now, self.cycle_started_at))
+        return remaining
+    
+    def cycle_timeline(self, now: float) -> List[Dict]:
+        """
+        Get the run's cycles as times relative to now (negative = in the past).
+        
+        Cycles not yet started are estimated assuming each one starts as soon
+        as its soak ends; the dispatch limits may push them later.
+        """
+        timeline = [
+            {'state': RUN_DONE, 'starts_in_seconds': start - now, 'ends_in_seconds': end - now}
+            for start, end in self.completed_cycles
+        ]
+        next_start = now
+        if self.state == RUN_RUNNING:
+            timeline.append({
+                'state': RUN_RUNNING,
+                'starts_in_seconds': self.cycle_started_at - now,
+                'ends_in_seconds': self.ends_at - now
+            })
+            next_start = self.ends_at + self.soak_seconds
+        elif self.state == RUN_SOAKING:
+            next_start = self.resumes_at
+        pending = self.pending_seconds
+        while pending >= MIN_CYCLE_SECONDS:
+            length = self.next_cycle_seconds(pending)
+            timeline.append({
+                'state': RUN_QUEUED,
+                'starts_in_seconds': next_start - now,
+                'ends_in_seconds': next_start + length - now
+            })
+            pending -= length
+            next_start += length + self.soak_seconds
+        return [{'cycle': index + 1, **cycle} for index, cycle in enumerate(timeline)]
+    
+    def to_dict(self, now: float) -> Dict:
+        """Convert run to dictionary."""
+        return {
+            'zone': self.zone.name,
+            'state': self.state,
+            'priority': PRIORITY_NAMES.get(self.priority, self.priority),
+            'duration_seconds': self.duration_seconds,
+            'remaining_seconds': self.remaining_seconds(now),
+            'preemptions': self.preemptions,
+            'paused_seconds': now - self.paused_at if self.paused_at is not None else None,
+            'cycle_seconds': self.cycle_seconds,
+            'soak_seconds': self.soak_seconds,
+            'cycles': self.cycle_timeline(now)
+        }
+
+
+class Sequence:
+    """
+    Zone runs started one after another, each once the previous one finishes.
+    
+    Used for programs: every step is an ordinary run, so it queues behind
+    the dispatch limits and can be preempted like any other.
+    """
+    
+    def __init__(self, name: str, steps: List[Tuple], priority: int = 0):
+        """
+        Initialize a sequence.
+        
+        Args:
+            name: Program name
+            steps: (zone, duration_seconds, cycle_seconds, soak_seconds) of each step, in order
+            priority: Priority of every step's run
+        """
+        self.name = name
+        self.steps = steps
+        self.priority = priority
+        self.index = -1
+        self.run: Optional[Run] = None
+        self.stopped = False
+        self.done = threading.Event()
+    
+    def remaining_seconds(self, now: float) -> float:
+        """Get the watering time left in the current step and the ones after it."""
+        remaining = sum(step[1] for step in self.steps[self.index + 1:])
+        if self.run is not None:
+            remaining += self.run.remaining_seconds(now)
+        return remaining
+    
+    def to_dict(self, now: float) -> Dict:
+        """Convert sequence to dictionary."""
+        return {
+            'program': self.name,
+            'priority': PRIORITY_NAMES.get(self.priority, self.priority),
+            'step': self.index + 1,
+            'steps': len(self.steps),
+            'zone': self.run.zone.name if self.run is not None else None,
+            'state': self.run.state if self.run is not None else None,
+            'remaining_seconds': self.remaining_seconds(now),
+            'zones': [step[0].name for step in self.steps]
+        }
+
+
+class RunManager:
+    """
+    Starts, stops and times out zone runs from one manager thread.
+    
+    Runs wait in a priority queue (FIFO within a priority) until the
+    hydraulic limits allow them: at most max_concurrent zones at once and at
+    most max_flow total flow. The head of the queue is never overtaken, so a
+    high-flow zone cannot be starved by a stream of smaller ones.
+    
+    When the head does not fit, lower-priority running zones are preempted
+    (lowest priority, then most recently started, first) if that makes room.
+    They rejoin the queue at their original place with the watering time
+    they had left. A higher-priority run for a zone that is already busy
+    sets the current run aside until it ends.
+    
+    A cycle-and-soak run gives up its place while soaking, so other zones'
+    cycles fill the gap; it then rejoins the queue with its original place.
+    
+    A paused run closes its valve and holds its remaining watering time
+    until resumed; it keeps the zone, so nothing else starts there meanwhile.
+    
+    Sequences (programs) start their next step's run when the previous one
+    finishes, however it finished.
+    
+    Valve changes are collected while an operation (or every timer due at
+    one tick) is processed and applied together in one switch_zones call,
+    so a switchover from one zone to the next is a single GPIO write. A
+    zone turned off and back on within one transition is never touched.
+    
+    An optional master valve (or pump relay) is on whenever any zone runs.
+    It opens lead_seconds before the first zone, whose cycle starts once
+    the lead is over, and closes lag_seconds after the last one, so runs
+    less than the lag apart keep it on instead of short-cycling the pump.
+    """
+    
+    def __init__(self, switch_zones: Callable[[List, List], None], clock: Callable[[], float] = time.monotonic,
+                 max_concurrent: Optional[int] = None, max_flow: Optional[float] = None):
+        """
+        Initialize the run manager.
+        
+        Args:
+            switch_zones: Function (zones to turn on, zones to turn off) applying one transition
+            clock: Monotonic clock returning seconds
+            max_concurrent: Maximum number of zones running at once (None = no limit)
+            max_flow: Maximum total flow_rate of running zones (None = no limit)
+        """
+        self._switch_zones = switch_zones
+        # Valve changes of the transition in progress, by zone (or master valve)
+        self._pending_outputs: Dict[object, bool] = {}
+        self._transition_depth = 0
+        self._master = None
+        self._master_on = False
+        self._master_ready_at = 0.0
+        # Runs whose cycle waits for the master valve's lead, and the timers ending the lead and the lag
+        self._priming: List["Run"] = []
+        self._lead_timer: Optional[Timer] = None
+        self._lag_timer: Optional[Timer] = None
+        self._clock = clock
+        self.max_concurrent = max_concurrent
+        self.max_flow = max_flow
+        self._wheel = TimerWheel(tick_seconds=TIMER_TICK_SECONDS, origin=clock())
+        self._runs: Dict[str, Run] = {}
+        self._sequences: Dict[str, Sequence] = {}
+        self._queue = []
+        self._queue_counter = itertools.count()
+        self._running_count = 0
+        self._running_flow = 0.0
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_wakeup: Optional[asyncio.Event] = None
+        self._running = False
+    
+    @contextlib.contextmanager
+    def _transition(self):
+        """Hold the lock and apply the valve changes made inside in one switch_zones call."""
+        with self._lock:
+            self._transition_depth += 1
+            try:
+                yield
+            finally:
+                self._transition_depth -= 1
+                if self._transition_depth == 0:
+                    self._release_master()
+                    if self._pending_outputs:
+                        changes = list(self._pending_outputs.items())
+                        self._pending_outputs = {}
+                        self._switch_zones([zone for zone, on in changes if on],
+                                           [zone for zone, on in changes if not on])
+    
+    def _set_output(self, zone, on: bool):
+        """Record a valve change for the current transition."""
+        pending = self._pending_outputs.get(zone)
+        if pending is not None and pending != on:
+            # Turned back within the same transition: the valve never needs to move
+            del self._pending_outputs[zone]
+        else:
+            self._pending_outputs[zone] = on
+    
+    def set_master(self, master):
+        """
+        Set (or remove) the master valve.
+        
+        A master valve added while zones run opens at once, without its lead.
+        
+        Args:
+            master: Object with lead_seconds and lag_seconds, switched like a
+                zone through switch_zones (None = no master valve)
+        """
+        with self._transition():
+            if self._master is not None and self._master_on:
+                self._master_off()
+            self._master = master
+            if master is not None and self._running_count > 0:
+                self._master_on = True
+                self._master_ready_at = self._clock()
+                self._set_output(master, True)
+            self._open_primed()
+        self._wake()
+    
+    def _master_off(self):
+        """Close the master valve now."""
+        self._master_on = False
+        self._set_output(self._master, False)
+        for timer in (self._lead_timer, self._lag_timer):
+            if timer is not None:
+                self._wheel.cancel(timer)
+        self._lead_timer = self._lag_timer = None
+    
+    def _release_master(self):
+        """Start the master valve's lag once no zone needs it."""
+        if not self._master_on or self._running_count > 0 or self._lag_timer is not None:
+            return
+        if self._master.lag_seconds > 0:
+            self._lag_timer = self._wheel.add(self._clock() + self._master.lag_seconds, self._lag_over)
+        else:
+            self._master_off()
+    
+    def _lag_over(self):
+        """Close the master valve if no zone started during its lag."""
+        self._lag_timer = None
+        if self._running_count == 0:
+            self._master_off()
+    
+    def _open_primed(self):
+        """Open the valves of cycles that were waiting for the master valve's lead."""
+        if self._lead_timer is not None:
+            self._wheel.cancel(self._lead_timer)
+            self._lead_timer = None
+        for run in self._priming:
+            self._set_output(run.zone, True)
+        self._priming = []
+    
+    def _lead_over(self):
+        """The master valve's lead has passed; open the zones waiting for it."""
+        self._lead_timer = None
+        self._open_primed()
+    
+    def start(self):
+        """Start the manager thread."""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run_thread, name="run-manager", daemon=True)
+        self._thread.start()
+    
+    def shutdown(self):
+        """Stop every run and the manager thread."""
+        with self._transition():
+            for sequence in self._sequences.values():
+                sequence.stopped = True
+            # Drop queued runs first so stopping a running zone starts nothing new
+            for run in sorted(self._runs.values(), key=lambda run: run.state == RUN_RUNNING):
+                self.stop_run(run.zone.name)
+            # No lag on shutdown
+            if self._master_on:
+                self._master_off()
+            self._running = False
+        self._wake()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+    
+    def set_limits(self, max_concurrent: Optional[int], max_flow: Optional[float]):
+        """
+        Change the hydraulic limits; queued runs start at once if they now fit.
+        
+        Args:
+            max_concurrent: Maximum number of zones running at once (None = no limit)
+            max_flow: Maximum total flow_rate of running zones (None = no limit)
+        """
+        with self._transition():
+            self.max_concurrent = max_concurrent
+            self.max_flow = max_flow
+            self._dispatch()
+        self._wake()
+    
+    def start_run(self, zone, duration_seconds: float, priority: int = 0,
+                  cycle_seconds: Optional[float] = None, soak_seconds: float = 0.0) -> Optional[Run]:
+        """
+        Queue a zone run; it starts immediately if the limits allow.
+        
+        If the zone already has a lower-priority run, that run is set aside
+        (keeping its remaining time) and resumes after the new one.
+        
+        Args:
+            zone: Zone to run
+            duration_seconds: Total watering time once started
+            priority: Run priority (higher runs first and may preempt lower ones)
+            cycle_seconds: Longest single cycle (None = water in one go)
+            soak_seconds: Rest between cycles
+            
+        Returns:
+            The new Run, or None if the zone already has a run of equal or higher priority
+        """
+        with self._transition():
+            current = self._runs.get(zone.name)
+            if current is not None and current.priority >= priority:
+                return None
+            run = Run(zone, duration_seconds, priority, cycle_seconds, soak_seconds)
+            run.seq = next(self._queue_counter)
+            if current is not None:
+                self._suspend(current)
+                current.preemptions += 1
+                current.state = RUN_PREEMPTED
+                run.displaced = current
+                logger.info(f"Run for zone '{zone.name}' set aside for a {PRIORITY_NAMES.get(priority, priority)} run")
+            self._runs[zone.name] = run
+            self._enqueue(run)
+            self._dispatch()
+        self._wake()
+        return run
+    
+    def stop_run(self, zone_name: str) -> bool:
+        """
+        Stop a running or soaking zone, or drop it from the queue.
+        
+        Runs set aside for this one are dropped as well.
+        
+        Args:
+            zone_name: Name of the zone to stop
+            
+        Returns:
+            True if a run was stopped, False if the zone was not running or queued
+        """
+        with self._transition():
+            run = self._runs.get(zone_name)
+            if run is None:
+                return False
+            if run.timer is not None:
+                self._wheel.cancel(run.timer)
+            displaced, run.displaced = run.displaced, None
+            while displaced is not None:
+                displaced._set_done()
+                displaced = displaced.displaced
+            self._finish(run)
+        self._wake()
+        return True
+    
+    def start_sequence(self, name: str, steps: List[Tuple], priority: int = 0) -> Optional[Sequence]:
+        """
+        Run zones one after another.
+        
+        A step whose zone already has a run of equal or higher priority is
+        skipped.
+        
+        Args:
+            name: Program name (only one sequence per name runs at a time)
+            steps: (zone, duration_seconds, cycle_seconds, soak_seconds) of each step, in order
+            priority: Priority of every step's run
+            
+        Returns:
+            The new Sequence, or None if a sequence with this name is already running
+        """
+        with self._transition():
+            if name in self._sequences:
+                return None
+            sequence = Sequence(name, steps, priority)
+            self._sequences[name] = sequence
+            self._next_step(sequence)
+        self._wake()
+        return sequence
+    
+    def stop_sequence(self, name: str) -> bool:
+        """
+        Stop a sequence and its current step's run.
+        
+        Args:
+            name: Program name
+            
+        Returns:
+            True if the sequence was stopped, False if it was not running
+        """
+        with self._transition():
+            sequence = self._sequences.get(name)
+            if sequence is None:
+                return False
+            sequence.stopped = True
+            if sequence.run is not None:
+                self._cancel(sequence.run)
+            else:
+                self._end_sequence(sequence)
+        self._wake()
+        return True
+    
+    def merge_run(self, zone_name: str, duration_seconds: float) -> bool:
+        """
+        Extend an active or queued run so at least duration_seconds of watering remain.
+        
+        Args:
+            zone_name: Name of the running zone
+            duration_seconds: Minimum remaining watering time
+            
+        Returns:
+            True if the zone was running, soaking or queued, False otherwise
+        """
+        with self._transition():
+            run = self._runs.get(zone_name)
+            if run is None:
+                return False
+            extra = duration_seconds - run.remaining_seconds(self._clock())
+            if extra > 0:
+                self._extend(run, extra)
+        self._wake()
+        return True
+    
+    def extend_run(self, zone_name: str, seconds: float) -> bool:
+        """
+        Add watering time to an active, soaking, queued or paused run.
+        
+        Args:
+            zone_name: Name of the zone
+            seconds: Watering time to add
+            
+        Returns:
+            True if the zone had a run, False otherwise
+        """
+        with self._transition():
+            run = self._runs.get(zone_name)
+            if run is None:
+                return False
+            self._extend(run, seconds)
+        self._wake()
+        return True
+    
+    def pause_run(self, zone_name: str) -> bool:
+        """
+        Close a zone's valve and hold its run, remaining time included, until resumed.
+        
+        A queued or soaking run can be paused too; soaking goes on while paused.
+        
+        Args:
+            zone_name: Name of the zone
+            
+        Returns:
+            True if the run was paused, False if the zone has no run or it is already paused
+        """
+        with self._transition():
+            run = self._runs.get(zone_name)
+            if run is None or run.paused_at is not None:
+                return False
+            self._suspend(run)
+            run.state = RUN_PAUSED
+            run.paused_at = self._clock()
+            # Other zones may use the freed capacity
+            self._dispatch()
+        self._wake()
+        return True
+    
+    def resume_run(self, zone_name: str) -> bool:
+        """
+        Continue a paused run with the watering time it had left.
+        
+        Args:
+            zone_name: Name of the zone
+            
+        Returns:
+            True if the run was resumed, False if the zone has no paused run
+        """
+        with self._transition():
+            run = self._runs.get(zone_name)
+            if run is None or run.paused_at is None:
+                return False
+            run.paused_at = None
+            if run.state == RUN_PAUSED:
+                self._restore(run)
+                self._dispatch()
+        self._wake()
+        return True
+    
+    def is_running(self, zone_name: str) -> bool:
+        """Check whether a zone has an active, soaking or queued run."""
+        return zone_name in self._runs
+    
+    def get_run(self, zone_name: str) -> Optional[Dict]:
+        """Get a snapshot of a zone's current run, or None if it has none."""
+        with self._lock:
+            run = self._runs.get(zone_name)
+            return run.to_dict(self._clock()) if run is not None else None
+    
+    def active_runs(self) -> List[Dict]:
+        """Get a snapshot of all running zones."""
+        with self._lock:
+            now = self._clock()
+            return [run.to_dict(now) for run in self._runs.values() if run.state == RUN_RUNNING]
+    
+    def queued_runs(self) -> List[Dict]:
+        """Get a snapshot of waiting runs in dispatch order."""
+        with self._lock:
+            now = self._clock()
+            return [
+                run.to_dict(now) for _, _, run in sorted(self._queue, key=lambda entry: entry[:2])
+                if run.state == RUN_QUEUED
+            ]
+    
+    def soaking_runs(self) -> List[Dict]:
+        """Get a snapshot of runs resting between cycles."""
+        with self._lock:
+            now = self._clock()
+            return [run.to_dict(now) for run in self._runs.values() if run.state == RUN_SOAKING]
+    
+    def paused_runs(self) -> List[Dict]:
+        """Get a snapshot of runs paused by the user."""
+        with self._lock:
+            now = self._clock()
+            return [run.to_dict(now) for run in self._runs.values() if run.state == RUN_PAUSED]
+    
+    def preempted_runs(self) -> List[Dict]:
+        """Get a snapshot of runs set aside for a higher-priority run of the same zone."""
+        with self._lock:
+            now = self._clock()
+            preempted = []
+            for run in self._runs.values():
+                displaced = run.displaced
+                while displaced is not None:
+                    preempted.append(displaced.to_dict(now))
+                    displaced = displaced.displaced
+            return preempted
+    
+    def active_sequences(self) -> List[Dict]:
+        """Get a snapshot of running sequences."""
+        with self._lock:
+            now = self._clock()
+            return [sequence.to_dict(now) for sequence in self._sequences.values()]
+    
+    def _next_step(self, sequence: Sequence):
+        """Start a sequence's next step that can run, or end the sequence."""
+        sequence.run = None
+        while not sequence.stopped and sequence.index + 1 < len(sequence.steps):
+            sequence.index += 1
+            zone, duration_seconds, cycle_seconds, soak_seconds = sequence.steps[sequence.index]
+            run = self.start_run(zone, duration_seconds, sequence.priority, cycle_seconds, soak_seconds)
+            if run is None:
+                logger.warning(f"Program '{sequence.name}' skipped zone '{zone.name}' - "
+                               f"it already has a run of equal or higher priority")
+                continue
+            sequence.run = run
+            run.add_done_callback(lambda: self._next_step(sequence))
+            return
+        self._end_sequence(sequence)
+    
+    def _end_sequence(self, sequence: Sequence):
+        """Release a finished or stopped sequence."""
+        if self._sequences.get(sequence.name) is sequence:
+            del self._sequences[sequence.name]
+        sequence.done.set()
+        logger.info(f"Program '{sequence.name}' {'stopped' if sequence.stopped else 'finished'}")
+    
+    def _cancel(self, run: Run):
+        """Stop one run, whether it is active, queued or set aside; runs it set aside resume."""
+        holder = self._runs.get(run.zone.name)
+        if holder is run:
+            if run.timer is not None:
+                self._wheel.cancel(run.timer)
+            self._finish(run)
+            return
+        while holder is not None and holder.displaced is not run:
+            holder = holder.displaced
+        if holder is not None:
+            holder.displaced, run.displaced = run.displaced, None
+            run._set_done()
+    
+    def _fits(self, run: Run, running_count: Optional[int] = None, running_flow: Optional[float] = None) -> bool:
+        """Check whether a run can start without exceeding the limits (optionally with other totals)."""
+        if running_count is None:
+            running_count, running_flow = self._running_count, self._running_flow
+        if running_count == 0:
+            return True
+        if self.max_concurrent is not None and running_count >= self.max_concurrent:
+            return False
+        if self.max_flow is not None and running_flow + run.zone.flow_rate > self.max_flow:
+            return False
+        return True
+    
+    def _preempt_for(self, run: Run) -> bool:
+        """
+        Preempt lower-priority running zones until a run fits.
+        
+        Nothing is preempted unless the run would fit afterwards.
+        
+        Returns:
+            True if the run now fits
+        """
+        candidates = sorted(
+            (other for other in self._runs.values() if other.state == RUN_RUNNING and other.priority < run.priority),
+            key=lambda other: (other.priority, -other.cycle_started_at)
+        )
+        running_count, running_flow = self._running_count, self._running_flow
+        victims = []
+        for other in candidates:
+            victims.append(other)
+            running_count -= 1
+            running_flow -= other.zone.flow_rate
+            if self._fits(run, running_count, running_flow):
+                break
+        else:
+            return False
+        for other in victims:
+            logger.info(f"Zone '{other.zone.name}' preempted by a {PRIORITY_NAMES.get(run.priority, run.priority)} "
+                        f"run for zone '{run.zone.name}'")
+            self._suspend(other)
+            other.preemptions += 1
+            self._enqueue(other)
+        return True
+    
+    def _suspend(self, run: Run):
+        """Stop a run's watering, place in the queue or soak timer, keeping its time left and soak deadline."""
+        if run.timer is not None:
+            self._wheel.cancel(run.timer)
+            run.timer = None
+        if run.state == RUN_QUEUED:
+            self._queue = [entry for entry in self._queue if entry[2] is not run]
+            heapq.heapify(self._queue)
+        elif run.state == RUN_RUNNING:
+            now = self._clock()
+            run.pending_seconds += max(0.0, run.ends_at - max(now, run.cycle_started_at))
+            if now > run.cycle_started_at:
+                run.completed_cycles.append((run.cycle_started_at, now))
+            self._running_count -= 1
+            self._running_flow -= run.zone.flow_rate
+            self._close(run)
+    
+    def _extend(self, run: Run, extra: float):
+        """Lengthen a run by extra seconds of watering."""
+        run.duration_seconds += extra
+        if run.state == RUN_RUNNING and run.cycle_seconds is None:
+            self._wheel.cancel(run.timer)
+            run.ends_at += extra
+            run.timer = self._wheel.add(run.ends_at, lambda: self._end_cycle(run))
+        else:
+            # Later cycles absorb the extra time
+            run.pending_seconds += extra
+    
+    def _restore(self, run: Run):
+        """Put a run that was set aside or paused back in line (or back to soaking or paused)."""
+        if run.paused_at is not None:
+            run.state = RUN_PAUSED
+        elif run.resumes_at is not None and run.resumes_at > self._clock():
+            run.state = RUN_SOAKING
+            run.timer = self._wheel.add(run.resumes_at, lambda: self._resume(run))
+        else:
+            run.resumes_at = None
+            self._enqueue(run)
+    
+    def _enqueue(self, run: Run):
+        """Put a run in the dispatch queue at its original place."""
+        run.state = RUN_QUEUED
+        heapq.heappush(self._queue, (-run.priority, run.seq, run))
+    
+    def _dispatch(self):
+        """Start queued runs in priority order while they fit."""
+        while self._queue:
+            run = self._queue[0][2]
+            if run.state != RUN_QUEUED:
+                heapq.heappop(self._queue)
+                continue
+            if not self._fits(run) and not self._preempt_for(run):
+                break
+            heapq.heappop(self._queue)
+            self._begin(run)
+    
+    def _begin(self, run: Run):
+        """Turn a queued run's zone on and schedule the end of its next cycle."""
+        now = self._clock()
+        cycle_seconds = run.next_cycle_seconds()
+        run.state = RUN_RUNNING
+        if run.started_at is None:
+            run.started_at = now
+        opens_at = self._open_master(now)
+        run.cycle_started_at = opens_at
+        run.ends_at = opens_at + cycle_seconds
+        run.pending_seconds -= cycle_seconds
+        self._running_count += 1
+        self._running_flow += run.zone.flow_rate
+        if opens_at > now:
+            self._priming.append(run)
+        else:
+            self._set_output(run.zone, True)
+        run.timer = self._wheel.add(run.ends_at, lambda: self._end_cycle(run))
+    
+    def _open_master(self, now: float) -> float:
+        """
+        Make sure the master valve is on (or opening) for a zone about to start.
+        
+        Returns:
+            When the zone's valve may open: now, or the end of the master valve's lead
+        """
+        if self._master is None:
+            return now
+        if self._lag_timer is not None:
+            self._wheel.cancel(self._lag_timer)
+            self._lag_timer = None
+        if not self._master_on:
+            self._master_on = True
+            self._set_output(self._master, True)
+            self._master_ready_at = now + self._master.lead_seconds
+            if self._master_ready_at > now:
+                self._lead_timer = self._wheel.add(self._master_ready_at, self._lead_over)
+        return max(now, self._master_ready_at)
+    
+    def _close(self, run: Run):
+        """Turn a running zone off (or stop it waiting for the master valve's lead)."""
+        if run in self._priming:
+            self._priming.remove(run)
+        else:
+            self._set_output(run.zone, False)
+    
+    def _end_cycle(self, run: Run):
+        """End a run's current cycle: soak if watering remains, otherwise finish."""
+        if self._runs.get(run.zone.name) is not run:
+            return
+        if run.pending_seconds < MIN_CYCLE_SECONDS:
+            self._finish(run)
+            return
+        run.completed_cycles.append((run.cycle_started_at, run.ends_at))
+        run.state = RUN_SOAKING
+        run.resumes_at = run.ends_at + run.soak_seconds
+        self._running_count -= 1
+        self._running_flow -= run.zone.flow_rate
+        self._close(run)
+        run.timer = self._wheel.add(run.resumes_at, lambda: self._resume(run))
+        # Let other zones use the soak gap
+        self._dispatch()
+    
+    def _resume(self, run: Run):
+        """Queue a soaked run's next cycle."""
+        if self._runs.get(run.zone.name) is not run:
+            return
+        run.timer = None
+        run.resumes_at = None
+        self._enqueue(run)
+        self._dispatch()
+    
+    def _finish(self, run: Run):
+        """
+        Turn a run's zone off (or drop it from the queue or its soak) and release it.
+        
+        A run it set aside for the same zone takes its place in the queue.
+        """
+        if self._runs.get(run.zone.name) is not run:
+            return
+        del self._runs[run.zone.name]
+        if run.state == RUN_RUNNING:
+            self._running_count -= 1
+            self._running_flow -= run.zone.flow_rate
+            self._close(run)
+        if run.displaced is not None:
+            self._runs[run.zone.name] = run.displaced
+            self._restore(run.displaced)
+            run.displaced = None
+        run._set_done()
+        self._dispatch()
+    
+    def poll(self) -> Optional[float]:
+        """
+        Fire every timer that has expired.
+        
+        Returns:
+            Seconds until the next wheel event, or None if nothing is pending
+        """
+        with self._transition():
+            now = self._clock()
+            for timer in self._wheel.advance(now):
+                try:
+                    timer.callback()
+                except Exception as e:
+                    logger.error(f"Run manager timer failed: {e}")
+        # Read after the transition, which may have started the master valve's lag
+        with self._lock:
+            next_deadline = self._wheel.next_deadline()
+        if next_deadline is None:
+            return None
+        return max(0.0, next_deadline - self._clock())
+    
+    def _safe_poll(self) -> Optional[float]:
+        """Poll for the manager loops, logging a failure instead of ending the loop."""
+        try:
+            return self.poll()
+        except Exception as e:
+            logger.error(f"Run manager poll failed: {e}")
+            return POLL_RETRY_SECONDS
+    
+    def _wake(self):
+        """Interrupt the manager's sleep so it re-reads the timer wheel."""
+        self._wakeup.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._async_wakeup.set)
+    
+    def _run_thread(self):
+        """Manager thread body - sleeps until the next timer is due."""
+        while self._running:
+            timeout = self._safe_poll()
+            self._wakeup.wait(timeout=timeout)
+            self._wakeup.clear()
+    
+    async def run_async(self):
+        """Drive the manager from an asyncio task instead of a thread."""
+        self._loop = asyncio.get_running_loop()
+        self._async_wakeup = asyncio.Event()
+        self._running = True
+        try:
+            while self._running:
+                timeout = self._safe_poll()
+                try:
+                    await asyncio.wait_for(self._async_wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._async_wakeup.clear()
+        finally:
+            self._loop = None
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Schedule Simulator for Sprinkler Controller
+Replays a schedule file against a virtual clock to produce the exact valve timeline.
+"""
+
+import argparse
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sprinkler_controller import SprinklerController, MasterValve, Zone
+from gpio_backend import SimulatedGPIOBackend
+
+logger = logging.getLogger(__name__)
+
+
+class VirtualClock:
+    """Clock that only moves when told to."""
+    
+    def __init__(self, start: datetime):
+        """
+        Initialize the clock.
+        
+        Args:
+            start: UTC time the simulation starts at
+        """
+        self._start = start
+        self._elapsed = 0.0
+    
+    def utcnow(self) -> datetime:
+        """Get the current virtual UTC time."""
+        return self._start + timedelta(seconds=self._elapsed)
+    
+    def set_utc(self, moment: datetime):
+        """Set the UTC time without moving the monotonic clock."""
+        self._start = moment - timedelta(seconds=self._elapsed)
+    
+    def monotonic(self) -> float:
+        """Get seconds elapsed since the simulation started."""
+        return self._elapsed
+    
+    def advance(self, seconds: float):
+        """Move the clock forward."""
+        self._elapsed += seconds
+
+
+class SimulatedController(SprinklerController):
+    """
+    SprinklerController on a virtual clock with simulated GPIO and no threads.
+    
+    The scheduling, catch-up and dispatch logic are the real ones; only time,
+    pins and persistence are replaced. Valve openings are recorded in timeline
+    (the master valve's in master_timeline), and every pin change in the GPIO
+    backend's history.
+    """
+    
+    def __init__(self, schedule_file: str, start: datetime):
+        """
+        Initialize the simulated controller.
+        
+        Args:
+            schedule_file: Path to JSON file storing schedule configuration (never written)
+            start: Local wall-clock time the simulation starts at
+        """
+        self.timeline: List[Dict] = []
+        self.master_timeline: List[Dict] = []
+        self._opened_at: Dict[object, Tuple[datetime, datetime]] = {}
+        clock = VirtualClock(start)
+        super().__init__(schedule_file, clock=clock, gpio=SimulatedGPIOBackend(clock.monotonic))
+        # The schedule file's timezone is only known once it has been loaded
+        self.clock.set_utc(self.local_time.to_utc(start))
+        self._rebuild_schedule_queue()
+    
+    def _start_run_manager(self):
+        """The simulation loop polls the run manager itself."""
+    
+    def save_schedule(self):
+        """Never touch the schedule file during a simulation."""
+    
+    def switch_zones(self, on: List[Zone], off: List[Zone]):
+        super().switch_zones(on, off)
+        for zone in off:
+            opened = self._opened_at.pop(zone, None)
+            if opened is not None:
+                opened_at, opened_utc = opened
+                timeline = self.master_timeline if isinstance(zone, MasterValve) else self.timeline
+                timeline.append({
+                    'zone': zone.name,
+                    'start': opened_at,
+                    'end': self.local_now(),
+                    'minutes': (self.clock.utcnow() - opened_utc).total_seconds() / 60
+                })
+        for zone in on:
+            self._opened_at[zone] = (self.local_now(), self.clock.utcnow())
+    
+    def run_until(self, end: datetime):
+        """
+        Jump the virtual clock from event to event until end.
+        
+        Args:
+            end: Local wall-clock time to stop at (zones still open are closed then)
+        """
+        end = self.local_time.to_utc(end)
+        while True:
+            self.run_manager.poll()
+            self.check_and_run()
+            waits = [self.run_manager.poll(), self.seconds_until_next_run()]
+            waits = [wait for wait in waits if wait is not None]
+            if not waits or self.clock.utcnow() + timedelta(seconds=min(waits)) > end:
+                break
+            self.clock.advance(min(waits))
+        self.clock.advance(max(0.0, (end - self.clock.utcnow()).total_seconds()))
+        self.run_manager.shutdown()
+
+
+def find_overlaps(runs: List[Dict]) -> List[Dict]:
+    """
+    Find every pair of valve openings that overlap in time.
+    
+    Args:
+        runs: Timeline entries with 'zone', 'start' and 'end'
+    
+    Returns:
+        One entry per overlapping pair with the shared interval
+    """
+    # Closings sort before openings at the same instant, so touching runs don't count
+    events = sorted(
+        [(run['start'], 1, i) for i, run in enumerate(runs)] +
+        [(run['end'], 0, i) for i, run in enumerate(runs)]
+    )
+    open_runs = set()
+    overlaps = []
+    for _, is_start, i in events:
+        if not is_start:
+            open_runs.discard(i)
+            continue
+        for j in open_runs:
+            start = runs[i]['start']
+            end = min(runs[i]['end'], runs[j]['end'])
+            overlaps.append({
+                'zones': [runs[j]['zone'], runs[i]['zone']],
+                'start': start,
+                'end': end,
+                'minutes': (end - start).total_seconds() / 60
+            })
+        open_runs.add(i)
+    return overlaps
+
+
+def simulate(schedule_file: str, start: Optional[datetime] = None, days: int = 120,
+             respect_global_enable: bool = False) -> Dict:
+    """
+    Simulate a schedule file over a period.
+    
+    Args:
+        schedule_file: Path to JSON file storing schedule configuration
+        start: Local wall-clock time to start at (defaults to now)
+        days: Length of the simulation in days
+        respect_global_enable: Honour global_schedule_enabled=false instead of simulating anyway
+    
+    Returns:
+        Dictionary with the valve timeline, overlaps, total runtime per zone
+        and the master valve's openings
+    """
+    start = start or datetime.now().replace(second=0, microsecond=0)
+    end = start + timedelta(days=days)
+    controller = SimulatedController(schedule_file, start)
+    if not respect_global_enable:
+        controller.global_schedule_enabled = True
+    controller.run_until(end)
+    
+    runs = sorted(controller.timeline, key=lambda run: (run['start'], run['zone']))
+    runtime = {zone.name: 0.0 for zone in controller.zones}
+    for run in runs:
+        runtime[run['zone']] = runtime.get(run['zone'], 0.0) + run['minutes']
+    return {
+        'start': start,
+        'end': end,
+        'runs': runs,
+        'overlaps': find_overlaps(runs),
+        'runtime_minutes': runtime,
+        'master_valve_runs': controller.master_timeline
+    }
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Simulate a sprinkler schedule on a virtual clock")
+    parser.add_argument("schedule_file", nargs="?", default="sprinkler_schedule.json")
+    parser.add_argument("--start", help="Start time, ISO format (default: now)")
+    parser.add_argument("--days", type=int, default=120, help="Number of days to simulate")
+    parser.add_argument("--respect-global-enable", action="store_true",
+                        help="Simulate nothing if the schedule file has global_schedule_enabled=false")
+    parser.add_argument("--json", action="store_true", help="Print the full result as JSON")
+    parser.add_argument("--timeline", action="store_true", help="Print every valve opening")
+    args = parser.parse_args()
+    
+    # Per-run log lines would swamp the summary
+    logging.getLogger().setLevel(logging.WARNING)
+    
+    start = datetime.fromisoformat(args.start) if args.start else None
+    result = simulate(args.schedule_file, start, args.days, args.respect_global_enable)
+    
+    if args.json:
+        print(json.dumps(result, indent=2, default=str))
+        return
+    
+    print(f"Simulated {result['start']:%Y-%m-%d %H:%M} to {result['end']:%Y-%m-%d %H:%M}: "
+          f"{len(result['runs'])} runs, {len(result['overlaps'])} overlaps")
+    if args.timeline:
+        for run in result['runs']:
+            print(f"  {run['start']:%Y-%m-%d %a %H:%M:%S} - {run['end']:%H:%M:%S}  {run['zone']}")
+    for zone_name, minutes in result['runtime_minutes'].items():
+        print(f"  {zone_name}: {minutes:.1f} minutes total")
+    if result['master_valve_runs']:
+        print(f"  Master valve: {len(result['master_valve_runs'])} starts, "
+              f"{sum(run['minutes'] for run in result['master_valve_runs']):.1f} minutes total")
+    for overlap in result['overlaps']:
+        print(f"  Overlap {overlap['start']:%Y-%m-%d %a %H:%M} {' & '.join(overlap['zones'])}: "
+              f"{overlap['minutes']:.1f} minutes")
+
+
+if __name__ == "__main__":
+    main()
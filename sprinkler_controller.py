@@ -4,13 +4,24 @@ Raspberry Pi Sprinkler Controller
 Automates sprinkler control based on a configurable schedule.
 """
 
-import RPi.GPIO as GPIO
 import time
 import json
-from datetime import datetime, time as dt_time
-from typing import List, Dict
+import heapq
+import itertools
+from datetime import date, datetime, timedelta, timezone, time as dt_time
+from typing import List, Dict, Optional, Tuple
 import threading
 import logging
+from abc import ABC, abstractmethod
+
+from cron import CronExpression
+from gpio_backend import GPIOBackend, RPiGPIOBackend
+from run_calendar import RunCalendar
+from week_timeline import WeekTimeline, TimelineRun, SECONDS_PER_DAY, SECONDS_PER_WEEK
+from suspensions import SuspensionSet, RainDelay, Blackout
+from run_manager import Run, RunManager, Sequence, RUN_QUEUED, PRIORITY_MANUAL, PRIORITY_SCHEDULED
+from timezone_table import (TransitionTable, NONEXISTENT_SHIFT, NONEXISTENT_POLICIES,
+                            AMBIGUOUS_FIRST, AMBIGUOUS_POLICIES)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,128 +30,759 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class SystemClock:
+    """Real wall-clock and monotonic time."""
+    
+    def utcnow(self) -> datetime:
+        """Get the current UTC time as a naive datetime."""
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+    
+    def monotonic(self) -> float:
+        """Get seconds from a clock that never jumps."""
+        return time.monotonic()
+
+
+# Day rules a schedule can follow
+SCHEDULE_WEEKLY = "weekly"      # on the listed weekdays
+SCHEDULE_INTERVAL = "interval"  # every interval_days days, counted from epoch
+SCHEDULE_ODD = "odd"            # on odd days of the month
+SCHEDULE_EVEN = "even"          # on even days of the month
+SCHEDULE_TYPES = (SCHEDULE_WEEKLY, SCHEDULE_INTERVAL, SCHEDULE_ODD, SCHEDULE_EVEN)
+
+# Default anchor for interval schedules
+DEFAULT_EPOCH = date(1970, 1, 1)
+
+
+def parse_time_of_day(text: str) -> dt_time:
+    """Parse a start time in "HH:MM" or "HH:MM:SS" format (24-hour)."""
+    for time_format in ("%H:%M:%S", "%H:%M"):
+        try:
+            return datetime.strptime(text, time_format).time()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid time '{text}' - expected HH:MM or HH:MM:SS")
+
+
+def format_time_of_day(moment: dt_time) -> str:
+    """Format a start time as "HH:MM", or "HH:MM:SS" when it has seconds."""
+    return moment.strftime("%H:%M:%S" if moment.second else "%H:%M")
+
+
+def duration_fields(duration_seconds: float) -> Dict:
+    """Get a duration in the form files written before second resolution can read."""
+    if duration_seconds % 60:
+        return {'duration_seconds': duration_seconds}
+    return {'duration_minutes': int(duration_seconds // 60)}
+
+
 class SprinklerSchedule:
     """Represents a sprinkler schedule configuration."""
     
-    def __init__(self, days: List[int], start_time: str, duration_minutes: int, enabled: bool = True):
+    def __init__(self, days: Optional[List[int]], start_time: Optional[str], duration_minutes: Optional[float],
+                 enabled: bool = True, cron: Optional[str] = None, schedule_type: str = SCHEDULE_WEEKLY,
+                 interval_days: Optional[int] = None, epoch=None, duration_seconds: Optional[float] = None):
         """
         Initialize a sprinkler schedule.
         
         Args:
-            days: List of weekday numbers (0=Monday, 6=Sunday)
-            start_time: Time to start in "HH:MM" format (24-hour)
+            days: List of weekday numbers (0=Monday, 6=Sunday), for weekly schedules
+            start_time: Time to start in "HH:MM" or "HH:MM:SS" format (24-hour)
             duration_minutes: How long to run sprinklers in minutes
             enabled: Whether the schedule is enabled
+            cron: Cron expression ("min hour dom month dow") used instead of days/start_time
+            schedule_type: Day rule - "weekly", "interval", "odd" or "even"
+            interval_days: Days between runs, for interval schedules
+            epoch: Date (or "YYYY-MM-DD") an interval schedule counts from
+            duration_seconds: Run length in seconds, used instead of duration_minutes
         """
-        self.days = days
-        self.start_time = datetime.strptime(start_time, "%H:%M").time()
-        self.duration_minutes = duration_minutes
+        if schedule_type not in SCHEDULE_TYPES:
+            raise ValueError(f"Unknown schedule type '{schedule_type}'")
+        self.cron = CronExpression(cron) if cron else None
+        self.schedule_type = schedule_type if self.cron is None else SCHEDULE_WEEKLY
+        if self.cron is None:
+            if start_time is None or (self.schedule_type == SCHEDULE_WEEKLY and days is None):
+                raise ValueError("A schedule needs either days and start_time or a cron expression")
+            if self.schedule_type == SCHEDULE_INTERVAL and (not interval_days or interval_days < 1):
+                raise ValueError("An interval schedule needs interval_days of at least 1")
+            if self.schedule_type == SCHEDULE_WEEKLY:
+                for day in days:
+                    if not 0 <= day <= 6:
+                        raise ValueError(f"Invalid weekday {day} - expected 0 (Monday) to 6 (Sunday)")
+        self.days = days if self.cron is None and self.schedule_type == SCHEDULE_WEEKLY else None
+        self.start_time = parse_time_of_day(start_time) if self.cron is None else None
+        self.interval_days = interval_days if self.schedule_type == SCHEDULE_INTERVAL else None
+        if isinstance(epoch, str):
+            epoch = date.fromisoformat(epoch)
+        self.epoch = (epoch or DEFAULT_EPOCH) if self.schedule_type == SCHEDULE_INTERVAL else None
+        if duration_seconds is None:
+            if duration_minutes is None:
+                raise ValueError("A schedule needs duration_minutes or duration_seconds")
+            duration_seconds = duration_minutes * 60
+        if duration_seconds <= 0:
+            raise ValueError("A schedule's duration must be positive")
+        self.duration_seconds = duration_seconds
         self.enabled = enabled
     
-    def should_run_today(self) -> bool:
-        """Check if sprinklers should run today."""
-        return datetime.now().weekday() in self.days
+    @property
+    def duration_minutes(self) -> float:
+        """Run length in minutes (a whole number unless the duration has seconds)."""
+        if self.duration_seconds % 60:
+            return self.duration_seconds / 60
+        return int(self.duration_seconds // 60)
     
-    def is_start_time(self) -> bool:
-        """Check if current time matches start time (within 1 minute)."""
-        now = datetime.now().time()
+    @property
+    def start_second(self) -> int:
+        """Seconds past the minute-of-week slot at which the schedule starts."""
+        return self.start_time.second if self.start_time is not None else 0
+    
+    def runs_on(self, day: date) -> bool:
+        """
+        Check the date-level conditions that the minute-of-week index cannot encode.
+        
+        Constant time: cron day-of-month and month restrictions, the interval
+        from the epoch, or the parity of the day of the month.
+        """
+        if self.cron is not None:
+            return self.cron.matches_date(day)
+        if self.schedule_type == SCHEDULE_INTERVAL:
+            return (day - self.epoch).days % self.interval_days == 0
+        if self.schedule_type == SCHEDULE_ODD:
+            return day.day % 2 == 1
+        if self.schedule_type == SCHEDULE_EVEN:
+            return day.day % 2 == 0
+        return True
+    
+    def should_run_today(self, now: Optional[datetime] = None) -> bool:
+        """Check if sprinklers should run today (or on the day of now)."""
+        if now is None:
+            now = datetime.now()
+        if self.days is not None:
+            return now.weekday() in self.days
+        return self.runs_on(now.date())
+    
+    def is_start_time(self, now: Optional[datetime] = None) -> bool:
+        """Check if current time (or now) is in the minute of the start time."""
+        if now is None:
+            now = datetime.now()
+        if self.cron is not None:
+            return self.cron.matches_time(now)
+        now = now.time()
         now_minutes = now.hour * 60 + now.minute
         start_minutes = self.start_time.hour * 60 + self.start_time.minute
         return now_minutes == start_minutes
     
+    def next_fire_time(self, after: datetime) -> Optional[datetime]:
+        """
+        Compute the next time this schedule fires.
+        
+        Args:
+            after: Earliest acceptable fire time (inclusive)
+            
+        Returns:
+            Datetime of the next start, or None if the schedule never fires
+        """
+        if self.cron is not None:
+            return self.cron.next_match(after)
+        day = after.date()
+        if datetime.combine(day, self.start_time) < after:
+            day += timedelta(days=1)
+        if self.schedule_type == SCHEDULE_INTERVAL:
+            day += timedelta(days=-(day - self.epoch).days % self.interval_days)
+            return datetime.combine(day, self.start_time)
+        if self.schedule_type in (SCHEDULE_ODD, SCHEDULE_EVEN):
+            # A month ending on the 31st gives two odd days in a row, so at most two steps
+            while not self.runs_on(day):
+                day += timedelta(days=1)
+            return datetime.combine(day, self.start_time)
+        for offset in range(8):
+            day = after.date() + timedelta(days=offset)
+            if day.weekday() not in self.days:
+                continue
+            candidate = datetime.combine(day, self.start_time)
+            if candidate >= after:
+                return candidate
+        return None
+    
+    def week_minutes(self) -> List[int]:
+        """Get the minute-of-week slots at which this schedule can start (see start_second)."""
+        if self.cron is not None:
+            return self.cron.week_minutes()
+        start_minutes = self.start_time.hour * 60 + self.start_time.minute
+        # Non-weekly rules are checked by runs_on() when the slot comes up
+        days = set(self.days) if self.days is not None else range(7)
+        return sorted(day * 24 * 60 + start_minutes for day in days)
+    
+    def repeats_weekly(self) -> bool:
+        """Check whether the schedule fires at all of its week_minutes() slots every week."""
+        if self.cron is not None:
+            return self.cron.repeats_weekly()
+        return self.schedule_type == SCHEDULE_WEEKLY
+    
     def to_dict(self) -> Dict:
         """Convert schedule to dictionary."""
+        if self.cron is not None:
+            return {
+                'cron': self.cron.expression,
+                **duration_fields(self.duration_seconds),
+                'enabled': self.enabled
+            }
+        if self.schedule_type != SCHEDULE_WEEKLY:
+            data = {
+                'type': self.schedule_type,
+                'start_time': format_time_of_day(self.start_time),
+                **duration_fields(self.duration_seconds),
+                'enabled': self.enabled
+            }
+            if self.schedule_type == SCHEDULE_INTERVAL:
+                data['interval_days'] = self.interval_days
+                data['epoch'] = self.epoch.isoformat()
+            return data
         return {
             'days': self.days,
-            'start_time': self.start_time.strftime("%H:%M"),
-            'duration_minutes': self.duration_minutes,
+            'start_time': format_time_of_day(self.start_time),
+            **duration_fields(self.duration_seconds),
             'enabled': self.enabled
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SprinklerSchedule":
+        """Create a schedule from its dictionary form."""
+        return cls(
+            days=data.get('days'),
+            start_time=data.get('start_time'),
+            duration_minutes=data.get('duration_minutes'),
+            enabled=data.get('enabled', True),
+            cron=data.get('cron'),
+            schedule_type=data.get('type') or SCHEDULE_WEEKLY,
+            interval_days=data.get('interval_days'),
+            epoch=data.get('epoch'),
+            duration_seconds=data.get('duration_seconds')
+        )
+
+
+MINUTES_PER_WEEK = 7 * 24 * 60
+
+# What to do with a trigger whose minute was missed (long pause, clock step)
+CATCHUP_RUN_LATE = "run_late"    # run the full duration as soon as possible
+CATCHUP_SKIP = "skip"            # drop the run
+CATCHUP_SHORTEN = "shorten"      # run only until the originally planned end
+CATCHUP_POLICIES = (CATCHUP_RUN_LATE, CATCHUP_SKIP, CATCHUP_SHORTEN)
+
+# Upper bound on a single sleep so wall-clock steps are noticed reasonably soon
+WALL_CLOCK_RESYNC_SECONDS = 900
+
+# Wait before checking the schedule again after a check failed (e.g. a GPIO error)
+CHECK_RETRY_SECONDS = 5
+
+
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def minute_of_week(moment: datetime) -> int:
+    """Get the minute-of-week slot (0 = Monday 00:00) for a datetime."""
+    return (moment.weekday() * 24 + moment.hour) * 60 + moment.minute
+
+
+def format_week_minute(slot: float) -> Tuple[str, str]:
+    """Get the weekday name and "HH:MM" (or "HH:MM:SS") of a possibly fractional minute-of-week slot."""
+    day, seconds = divmod(round(slot * 60) % (MINUTES_PER_WEEK * 60), 24 * 3600)
+    text = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}"
+    if seconds % 60:
+        text += f":{seconds % 60:02d}"
+    return WEEKDAY_NAMES[day], text
 
 
-class Zone:
-    """Represents a sprinkler zone with its own GPIO pin and schedule."""
+def seconds_to_minutes(seconds: float) -> float:
+    """Convert seconds to minutes - a whole number unless there are leftover seconds."""
+    if seconds % 60:
+        return round(seconds / 60, 2)
+    return int(seconds // 60)
+
+
+class TriggerIndex:
+    """Maps each minute of the week to the zone and program schedules that start then."""
     
-    def __init__(self, name: str, gpio_pin: int, schedule: SprinklerSchedule):
+    def __init__(self):
+        """Initialize an empty index."""
+        self._slots: Dict[int, Dict[str, List[Tuple["ScheduleOwner", SprinklerSchedule]]]] = {}
+        self._zone_slots: Dict[str, List[int]] = {}
+    
+    def add(self, zone: "ScheduleOwner", entries: List[Tuple[int, SprinklerSchedule]]):
         """
-        Initialize a zone.
+        Index a zone's (or program's) schedules, replacing any previous entries for it.
+        
+        Args:
+            zone: Zone or program to index
+            entries: (minute-of-week slot, schedule) pairs at which it starts
+            
+        Raises:
+            ValueError: If a slot is outside the week (nothing is changed then)
+        """
+        for slot, _ in entries:
+            if not 0 <= slot < MINUTES_PER_WEEK:
+                raise ValueError(f"Minute-of-week slot {slot} is outside the week (0-{MINUTES_PER_WEEK - 1})")
+        self.remove(zone.name)
+        slots = []
+        for slot, schedule in entries:
+            bucket = self._slots.setdefault(slot, {})
+            if zone.name not in bucket:
+                bucket[zone.name] = []
+                slots.append(slot)
+            bucket[zone.name].append((zone, schedule))
+        self._zone_slots[zone.name] = slots
+    
+    def remove(self, zone_name: str):
+        """Remove a zone from every slot it occupies."""
+        for slot in self._zone_slots.pop(zone_name, []):
+            bucket = self._slots.get(slot)
+            if bucket is not None:
+                bucket.pop(zone_name, None)
+                if not bucket:
+                    del self._slots[slot]
+    
+    def clear(self):
+        """Remove every zone from the index."""
+        self._slots.clear()
+        self._zone_slots.clear()
+    
+    def lookup(self, slot: int) -> List[Tuple["ScheduleOwner", SprinklerSchedule]]:
+        """Get the (zone or program, schedule) pairs that start at a minute-of-week slot."""
+        bucket = self._slots.get(slot)
+        if not bucket:
+            return []
+        return [entry for entries in bucket.values() for entry in entries]
+
+
+class ScheduleOwner(ABC):
+    """Something whose schedules start runs - a zone or a program."""
+    
+    schedules: List[SprinklerSchedule]
+    
+    @property
+    def schedule(self) -> Optional[SprinklerSchedule]:
+        """The first schedule (kept for single-schedule callers)."""
+        return self.schedules[0] if self.schedules else None
+    
+    @schedule.setter
+    def schedule(self, schedule: SprinklerSchedule):
+        self.schedules = [schedule]
+    
+    @property
+    def schedule_enabled(self) -> bool:
+        """Whether any of the schedules is enabled."""
+        return any(schedule.enabled for schedule in self.schedules)
+    
+    def next_fire_time(self, after: datetime) -> Optional[datetime]:
+        """Get the earliest next fire time across the enabled schedules."""
+        fire_times = [
+            schedule.next_fire_time(after) for schedule in self.schedules if schedule.enabled
+        ]
+        fire_times = [fire_time for fire_time in fire_times if fire_time is not None]
+        return min(fire_times) if fire_times else None
+    
+    def week_entries(self) -> List[Tuple[int, SprinklerSchedule]]:
+        """Get (minute-of-week slot, schedule) pairs for every enabled schedule."""
+        return [
+            (slot, schedule)
+            for schedule in self.schedules if schedule.enabled
+            for slot in schedule.week_minutes()
+        ]
+    
+    @abstractmethod
+    def timeline_entries(self, week_entries: Optional[List[Tuple[int, SprinklerSchedule]]] = None
+                         ) -> List[Tuple[float, float, SprinklerSchedule, str, float]]:
+        """
+        Get the week timeline runs: (second-of-week start, duration, schedule, zone, offset).
+        
+        Args:
+            week_entries: (minute-of-week slot, schedule) pairs to lay out (default: week_entries())
+        """
+
+
+class Zone(ScheduleOwner):
+    """Represents a sprinkler zone with its own GPIO pin and schedules."""
+    
+    def __init__(self, name: str, gpio_pin: int, schedule: Optional[SprinklerSchedule] = None,
+                 schedules: Optional[List[SprinklerSchedule]] = None, flow_rate: float = 0.0,
+                 cycle_minutes: Optional[float] = None, soak_minutes: float = 0.0):
+        """
+        Initialize a zone (the controller sets its pin up).
         
         Args:
             name: Descriptive name for the zone
             gpio_pin: GPIO pin number (BCM numbering) to control relay
             schedule: SprinklerSchedule object for this zone
+            schedules: Additional schedules, for zones that water several times a day
+            flow_rate: Water flow of the zone while open (any consistent unit, e.g. GPM)
+            cycle_minutes: Longest the zone may water before soaking (None = no limit)
+            soak_minutes: How long the zone rests between cycles
         """
         self.name = name
         self.gpio_pin = gpio_pin
-        self.schedule = schedule
+        self.flow_rate = flow_rate
+        self.cycle_minutes = cycle_minutes
+        self.soak_minutes = soak_minutes
+        self.schedules = list(schedules) if schedules else []
+        if schedule is not None:
+            self.schedules.insert(0, schedule)
         self.active = False
-        
-        # Setup GPIO for this zone
-        GPIO.setup(self.gpio_pin, GPIO.OUT)
-        GPIO.output(self.gpio_pin, GPIO.LOW)
+    
+    @property
+    def cycle_seconds(self) -> Optional[float]:
+        """Longest single cycle in seconds (None = water in one go)."""
+        return self.cycle_minutes * 60 if self.cycle_minutes else None
+    
+    def timeline_entries(self, week_entries: Optional[List[Tuple[int, SprinklerSchedule]]] = None
+                         ) -> List[Tuple[float, float, SprinklerSchedule, str, float]]:
+        """Get the week timeline runs: (second-of-week start, duration, schedule, zone, offset)."""
+        if week_entries is None:
+            week_entries = self.week_entries()
+        return [
+            (slot * 60 + schedule.start_second, schedule.duration_seconds, schedule, self.name, 0)
+            for slot, schedule in week_entries
+        ]
     
     def to_dict(self) -> Dict:
         """Convert zone to dictionary."""
         return {
             'name': self.name,
             'gpio_pin': self.gpio_pin,
-            'schedule': self.schedule.to_dict()
+            'flow_rate': self.flow_rate,
+            'cycle_minutes': self.cycle_minutes,
+            'soak_minutes': self.soak_minutes,
+            'schedules': [schedule.to_dict() for schedule in self.schedules]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Zone":
+        """Create a zone from its dictionary form."""
+        # Older files hold a single 'schedule' per zone
+        schedules_data = data.get('schedules')
+        if schedules_data is None:
+            schedules_data = [data['schedule']]
+        return cls(
+            name=data['name'],
+            gpio_pin=data['gpio_pin'],
+            schedules=[SprinklerSchedule.from_dict(item) for item in schedules_data],
+            flow_rate=data.get('flow_rate', 0.0),
+            cycle_minutes=data.get('cycle_minutes'),
+            soak_minutes=data.get('soak_minutes', 0.0)
+        )
+
+
+class ProgramStep:
+    """One zone of a program and how long it waters."""
+    
+    def __init__(self, zone_name: str, duration_minutes: Optional[float] = None,
+                 duration_seconds: Optional[float] = None):
+        """
+        Initialize a program step.
+        
+        Args:
+            zone_name: Zone to water
+            duration_minutes: How long to water in minutes
+            duration_seconds: Watering time in seconds, used instead of duration_minutes
+        """
+        if duration_seconds is None:
+            if duration_minutes is None:
+                raise ValueError("A program step needs duration_minutes or duration_seconds")
+            duration_seconds = duration_minutes * 60
+        if duration_seconds <= 0:
+            raise ValueError("A program step's duration must be positive")
+        self.zone_name = zone_name
+        self.duration_seconds = duration_seconds
+    
+    @property
+    def duration_minutes(self) -> float:
+        """Watering time in minutes (a whole number unless the duration has seconds)."""
+        if self.duration_seconds % 60:
+            return self.duration_seconds / 60
+        return int(self.duration_seconds // 60)
+    
+    def to_dict(self) -> Dict:
+        """Convert program step to dictionary."""
+        return {'zone': self.zone_name, **duration_fields(self.duration_seconds)}
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ProgramStep":
+        """Create a program step from its dictionary form."""
+        return cls(data['zone'], data.get('duration_minutes'), data.get('duration_seconds'))
+
+
+class Program(ScheduleOwner):
+    """
+    Zones watered back to back from one set of start times.
+    
+    Each step starts when the previous one finishes, so changing a step's
+    duration moves every later step with it. The week timeline places the
+    steps end to end; cycle/soak settings and the dispatch limits can stretch
+    the real run beyond that.
+    """
+    
+    def __init__(self, name: str, steps: List[ProgramStep], schedules: Optional[List[SprinklerSchedule]] = None):
+        """
+        Initialize a program.
+        
+        Args:
+            name: Program name (distinct from every zone name)
+            steps: Zones to water, in order
+            schedules: Start times of the whole program (none = manual runs only)
+        """
+        self.name = name
+        self.schedules = list(schedules) if schedules else []
+        self.set_steps(steps)
+    
+    def set_steps(self, steps: List[ProgramStep]):
+        """Replace the steps; the schedules' durations follow the program's length."""
+        self.steps = list(steps)
+        if self.duration_seconds > 0:
+            for schedule in self.schedules:
+                schedule.duration_seconds = self.duration_seconds
+    
+    @property
+    def duration_seconds(self) -> float:
+        """Total watering time of every step."""
+        return sum(step.duration_seconds for step in self.steps)
+    
+    def timeline_entries(self, week_entries: Optional[List[Tuple[int, SprinklerSchedule]]] = None
+                         ) -> List[Tuple[float, float, SprinklerSchedule, str, float]]:
+        """Get the week timeline runs: (second-of-week start, duration, schedule, zone, offset)."""
+        if week_entries is None:
+            week_entries = self.week_entries()
+        entries = []
+        for slot, schedule in week_entries:
+            offset = 0
+            for step in self.steps:
+                # A late step of a Sunday-night start falls in the next week
+                start = (slot * 60 + schedule.start_second + offset) % SECONDS_PER_WEEK
+                entries.append((start, step.duration_seconds, schedule, step.zone_name, offset))
+                offset += step.duration_seconds
+        return entries
+    
+    def to_dict(self) -> Dict:
+        """Convert program to dictionary (schedules carry no duration of their own)."""
+        schedules = []
+        for schedule in self.schedules:
+            data = schedule.to_dict()
+            data.pop('duration_minutes', None)
+            data.pop('duration_seconds', None)
+            schedules.append(data)
+        return {
+            'name': self.name,
+            'steps': [step.to_dict() for step in self.steps],
+            'schedules': schedules
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Program":
+        """Create a program from its dictionary form."""
+        steps = [ProgramStep.from_dict(item) for item in data['steps']]
+        duration_seconds = sum(step.duration_seconds for step in steps) or 60
+        schedules = [
+            SprinklerSchedule.from_dict({**item, 'duration_seconds': duration_seconds})
+            for item in data.get('schedules', [])
+        ]
+        return cls(data['name'], steps, schedules)
+
+
+class MasterValve:
+    """A master valve or pump-start relay that must be on whenever any zone is on."""
+    
+    name = "master valve"
+    
+    def __init__(self, gpio_pin: int, lead_seconds: float = 0.0, lag_seconds: float = 0.0):
+        """
+        Initialize a master valve.
+        
+        Args:
+            gpio_pin: GPIO pin number (BCM numbering) of the master valve or pump relay
+            lead_seconds: How long it is on before the first zone opens (lets the pump build pressure)
+            lag_seconds: How long it stays on after the last zone closes (bridges back-to-back runs)
+        """
+        self.gpio_pin = gpio_pin
+        self.lead_seconds = lead_seconds
+        self.lag_seconds = lag_seconds
+        self.active = False
+    
+    def to_dict(self) -> Dict:
+        """Convert master valve to dictionary."""
+        return {
+            'gpio_pin': self.gpio_pin,
+            'lead_seconds': self.lead_seconds,
+            'lag_seconds': self.lag_seconds
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MasterValve":
+        """Create a master valve from its dictionary form."""
+        return cls(data['gpio_pin'], data.get('lead_seconds', 0.0), data.get('lag_seconds', 0.0))
+
+
+class PinError(ValueError):
+    """A zone or master valve pin the GPIO backend cannot drive."""
 
 
 class SprinklerController:
     """Controls sprinkler system via Raspberry Pi GPIO."""
     
-    def __init__(self, schedule_file: str = "sprinkler_schedule.json"):
+    def __init__(self, schedule_file: str = "sprinkler_schedule.json", clock=None,
+                 gpio: Optional[GPIOBackend] = None):
         """
         Initialize the sprinkler controller.
         
         Args:
             schedule_file: Path to JSON file storing schedule configuration
+            clock: Source of UTC and monotonic time (defaults to SystemClock)
+            gpio: GPIO backend to drive pins with (defaults to RPi.GPIO)
+            
+        Raises:
+            RuntimeError: If no backend is given and RPi.GPIO is not available
+            PinError: If the schedule file uses pins the GPIO backend does not have
         """
         self.schedule_file = schedule_file
+        self.clock = clock or SystemClock()
+        self.gpio = gpio or RPiGPIOBackend()
         self.zones = []
+        self.programs = []
+        self.master_valve: Optional[MasterValve] = None
+        # Pins currently set up on the GPIO backend
+        self._pins = set()
         self.is_running = False
-        self.stop_events = {}
         self.global_schedule_enabled = True
         
-        # Setup GPIO
-        GPIO.setmode(GPIO.BCM)
+        # Priority queue of (fire_time, token, name) for zones and programs; entries whose
+        # token no longer matches self._schedule_tokens are stale and skipped when popped
+        self._schedule_heap = []
+        self._schedule_tokens = {}
+        self._token_counter = itertools.count()
+        self._schedule_lock = threading.RLock()
+        self._wakeup = threading.Event()
+        
+        # One thread times every run, however many zones are watering
+        self.run_manager = RunManager(self.switch_zones, clock=self.clock.monotonic)
+        self._start_run_manager()
+        self._trigger_index = TriggerIndex()
+        self._checked_until = None
+        self.catchup_policy = CATCHUP_RUN_LATE
+        self.max_catchup_minutes = 60
+        
+        # Schedules are in local wall time; the scheduler itself runs on UTC
+        self.local_time = TransitionTable()
+        self.nonexistent_policy = NONEXISTENT_SHIFT
+        self.ambiguous_policy = AMBIGUOUS_FIRST
+        self.run_calendar = RunCalendar(self._expand_runs)
+        self.week_timeline = WeekTimeline()
+        self.suspensions = SuspensionSet()
         
         # Load zones and schedules
-        self.load_schedule()
+        try:
+            self.load_schedule()
+        except PinError:
+            self.run_manager.shutdown()
+            raise
         
         logger.info(f"Sprinkler controller initialized with {len(self.zones)} zones")
     
     def load_schedule(self):
         """Load zones and schedules from JSON file."""
         try:
-            with open(self.schedule_file, 'r') as f:
-                data = json.load(f)
-                self.global_schedule_enabled = data.get('global_schedule_enabled', True)
-                self.zones = []
-                for zone_data in data['zones']:
-                    schedule = SprinklerSchedule(
-                        days=zone_data['schedule']['days'],
-                        start_time=zone_data['schedule']['start_time'],
-                        duration_minutes=zone_data['schedule']['duration_minutes'],
-                        enabled=zone_data['schedule'].get('enabled', True)
-                    )
-                    zone = Zone(
-                        name=zone_data['name'],
-                        gpio_pin=zone_data['gpio_pin'],
-                        schedule=schedule
-                    )
-                    self.zones.append(zone)
-                    self.stop_events[zone.name] = threading.Event()
-                logger.info(f"Loaded {len(self.zones)} zones")
+            self.reload_schedule()
         except FileNotFoundError:
             logger.warning(f"Schedule file not found. Creating default schedule.")
             self.create_default_schedule()
+        except PinError as e:
+            # Default zones would replace the file's zones, and may not fit the backend either
+            logger.error(f"Error loading schedule: {e}")
+            raise PinError(f"{self.schedule_file}: {e}; fix the pins or the GPIO backend settings") from e
         except Exception as e:
             logger.error(f"Error loading schedule: {e}")
             self.create_default_schedule()
     
+    def reload_schedule(self):
+        """
+        Re-read the schedule file, changing only what differs from the running setup.
+        
+        A zone with the same name, GPIO pin and flow rate is kept, with its new
+        schedules and cycle/soak settings, so a run in progress carries on and
+        its pin is left alone. Runs (and programs) of zones that were removed
+        or changed are stopped. Only pins that are new are set up, and pins no
+        longer used are released.
+        
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the file is not a valid schedule (nothing is changed then)
+            PinError: If its pins do not fit the GPIO backend (nothing is changed then)
+        """
+        with open(self.schedule_file, 'r') as f:
+            data = json.load(f)
+        try:
+            zones = [Zone.from_dict(item) for item in data['zones']]
+            programs = [Program.from_dict(item) for item in data.get('programs', [])]
+            master_data = data.get('master_valve')
+            master = MasterValve.from_dict(master_data) if master_data else None
+            suspensions = SuspensionSet.from_list(data.get('suspensions', []))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid schedule file: {e}")
+        for output in zones + ([master] if master is not None else []):
+            output.gpio_pin = self.resolve_pin(output.gpio_pin)
+        self._check_pins(zones, master)
+        
+        current = {zone.name: zone for zone in self.zones}
+        for i, zone in enumerate(zones):
+            kept = current.get(zone.name)
+            if kept is not None and (kept.gpio_pin, kept.flow_rate) == (zone.gpio_pin, zone.flow_rate):
+                kept.schedules = zone.schedules
+                kept.cycle_minutes = zone.cycle_minutes
+                kept.soak_minutes = zone.soak_minutes
+                zones[i] = kept
+        dropped = {name for name, zone in current.items() if zone not in zones}
+        
+        # Stop what runs on removed or rewired zones before their pins change hands
+        program_names = {program.name for program in programs}
+        for sequence in self.run_manager.active_sequences():
+            if sequence['program'] not in program_names or dropped.intersection(sequence['zones']):
+                self.run_manager.stop_sequence(sequence['program'])
+        for zone_name in dropped:
+            self.run_manager.stop_run(zone_name)
+        
+        self.global_schedule_enabled = data.get('global_schedule_enabled', True)
+        self.catchup_policy = data.get('catchup_policy', CATCHUP_RUN_LATE)
+        if self.catchup_policy not in CATCHUP_POLICIES:
+            logger.warning(f"Unknown catch-up policy '{self.catchup_policy}', using '{CATCHUP_RUN_LATE}'")
+            self.catchup_policy = CATCHUP_RUN_LATE
+        self.max_catchup_minutes = data.get('max_catchup_minutes', 60)
+        self._load_timezone(data)
+        self.suspensions = suspensions
+        self.run_manager.set_limits(data.get('max_concurrent_zones'), data.get('max_total_flow'))
+        self.zones = zones
+        self.programs = programs
+        if master is not None and self.master_valve is not None and master.gpio_pin == self.master_valve.gpio_pin:
+            self.master_valve.lead_seconds = master.lead_seconds
+            self.master_valve.lag_seconds = master.lag_seconds
+            self._sync_pins()
+        else:
+            self._set_master_valve(master)
+        self._rebuild_schedule_queue()
+        self._wake_scheduler()
+        logger.info(f"Loaded {len(self.zones)} zones and {len(self.programs)} programs"
+                    f"{f' ({len(dropped)} removed or changed)' if dropped else ''}")
+    
+    def _load_timezone(self, data: Dict):
+        """Read the timezone and DST policies from schedule file data."""
+        try:
+            self.local_time = TransitionTable(data.get('timezone'))
+        except ValueError as e:
+            logger.warning(f"{e}, using system local time")
+            self.local_time = TransitionTable()
+        self.nonexistent_policy = data.get('dst_nonexistent_policy', NONEXISTENT_SHIFT)
+        if self.nonexistent_policy not in NONEXISTENT_POLICIES:
+            logger.warning(f"Unknown DST policy '{self.nonexistent_policy}', using '{NONEXISTENT_SHIFT}'")
+            self.nonexistent_policy = NONEXISTENT_SHIFT
+        self.ambiguous_policy = data.get('dst_ambiguous_policy', AMBIGUOUS_FIRST)
+        if self.ambiguous_policy not in AMBIGUOUS_POLICIES:
+            logger.warning(f"Unknown DST policy '{self.ambiguous_policy}', using '{AMBIGUOUS_FIRST}'")
+            self.ambiguous_policy = AMBIGUOUS_FIRST
+    
     def create_default_schedule(self):
         """Create default zones with schedules."""
         schedule1 = SprinklerSchedule(
@@ -154,14 +796,16 @@ class SprinklerController:
             duration_minutes=15
         )
         
+        # Common relay-board pins on a Pi; expanders number their pins from 0
+        pin_count = self.gpio.pin_count
+        front_pin, back_pin = (17, 27) if pin_count is None or pin_count > 27 else (0, 1)
         self.zones = [
-            Zone(name="Front Yard", gpio_pin=17, schedule=schedule1),
-            Zone(name="Back Yard", gpio_pin=27, schedule=schedule2)
+            Zone(name="Front Yard", gpio_pin=front_pin, schedule=schedule1),
+            Zone(name="Back Yard", gpio_pin=back_pin, schedule=schedule2)
         ]
+        self._sync_pins()
         
-        for zone in self.zones:
-            self.stop_events[zone.name] = threading.Event()
-        
+        self._rebuild_schedule_queue()
         self.save_schedule()
         logger.info("Default zones created")
     
@@ -171,50 +815,284 @@ class SprinklerController:
             with open(self.schedule_file, 'w') as f:
                 data = {
                     'global_schedule_enabled': self.global_schedule_enabled,
-                    'zones': [zone.to_dict() for zone in self.zones]
+                    'catchup_policy': self.catchup_policy,
+                    'max_catchup_minutes': self.max_catchup_minutes,
+                    'timezone': self.local_time.name,
+                    'dst_nonexistent_policy': self.nonexistent_policy,
+                    'dst_ambiguous_policy': self.ambiguous_policy,
+                    'suspensions': self.suspensions.to_list(),
+                    'max_concurrent_zones': self.run_manager.max_concurrent,
+                    'max_total_flow': self.run_manager.max_flow,
+                    'master_valve': self.master_valve.to_dict() if self.master_valve else None,
+                    'zones': [zone.to_dict() for zone in self.zones],
+                    'programs': [program.to_dict() for program in self.programs]
                 }
                 json.dump(data, f, indent=2)
             logger.info("Schedule saved")
         except Exception as e:
             logger.error(f"Error saving schedule: {e}")
     
-    def update_zone_schedule(self, zone_name: str, days: List[int], start_time: str, duration_minutes: int, enabled: bool = True):
+    def update_zone_schedule(self, zone_name: str, days: List[int], start_time: str, duration_minutes: int,
+                             enabled: bool = True) -> List[Dict]:
         """
-        Update the schedule for a specific zone.
+        Replace all schedules of a specific zone with a single schedule.
         
         Args:
             zone_name: Name of the zone to update
             days: List of weekday numbers (0=Monday, 6=Sunday)
-            start_time: Time to start in "HH:MM" format (24-hour)
+            start_time: Time to start in "HH:MM" or "HH:MM:SS" format (24-hour)
             duration_minutes: How long to run sprinklers in minutes
             enabled: Whether the schedule is enabled
+            
+        Returns:
+            The zone's schedule conflicts with other zones (see find_schedule_conflicts)
         """
         for zone in self.zones:
             if zone.name == zone_name:
                 zone.schedule = SprinklerSchedule(days, start_time, duration_minutes, enabled)
+                self._schedule_zone(zone)
                 self.save_schedule()
                 logger.info(f"Schedule updated for zone '{zone_name}': {zone.schedule.to_dict()}")
-                return
+                return self._warn_conflicts(zone_name)
         logger.warning(f"Zone '{zone_name}' not found")
+        return []
     
-    def add_zone(self, name: str, gpio_pin: int, days: List[int], start_time: str, duration_minutes: int, enabled: bool = True):
+    def set_zone_schedules(self, zone_name: str, schedules: List[SprinklerSchedule]) -> List[Dict]:
+        """
+        Replace all schedules of a specific zone.
+        
+        Args:
+            zone_name: Name of the zone to update
+            schedules: New schedules for the zone
+            
+        Returns:
+            The zone's schedule conflicts with other zones (see find_schedule_conflicts)
+        """
+        for zone in self.zones:
+            if zone.name == zone_name:
+                zone.schedules = list(schedules)
+                self._schedule_zone(zone)
+                self.save_schedule()
+                logger.info(f"Zone '{zone_name}' now has {len(zone.schedules)} schedules")
+                return self._warn_conflicts(zone_name)
+        logger.warning(f"Zone '{zone_name}' not found")
+        return []
+    
+    def add_zone_schedule(self, zone_name: str, days: Optional[List[int]], start_time: Optional[str],
+                          duration_minutes: Optional[float], enabled: bool = True, cron: Optional[str] = None,
+                          schedule_type: str = SCHEDULE_WEEKLY, interval_days: Optional[int] = None, epoch=None,
+                          duration_seconds: Optional[float] = None) -> bool:
+        """
+        Add another schedule to a specific zone.
+        
+        Args:
+            zone_name: Name of the zone to update
+            days: List of weekday numbers (0=Monday, 6=Sunday)
+            start_time: Time to start in "HH:MM" or "HH:MM:SS" format (24-hour)
+            duration_minutes: How long to run sprinklers in minutes
+            enabled: Whether the schedule is enabled
+            cron: Cron expression used instead of days/start_time
+            schedule_type: Day rule - "weekly", "interval", "odd" or "even"
+            interval_days: Days between runs, for interval schedules
+            epoch: Date an interval schedule counts from
+            duration_seconds: Run length in seconds, used instead of duration_minutes
+            
+        Returns:
+            True if the schedule was added, False if the zone was not found
+        """
+        for zone in self.zones:
+            if zone.name == zone_name:
+                self.set_zone_schedules(
+                    zone_name,
+                    zone.schedules + [SprinklerSchedule(days, start_time, duration_minutes, enabled, cron,
+                                                        schedule_type, interval_days, epoch, duration_seconds)]
+                )
+                return True
+        logger.warning(f"Zone '{zone_name}' not found")
+        return False
+    
+    def remove_zone_schedule(self, zone_name: str, index: int) -> bool:
+        """
+        Remove one schedule from a specific zone.
+        
+        Args:
+            zone_name: Name of the zone to update
+            index: Position of the schedule in the zone's schedule list
+            
+        Returns:
+            True if the schedule was removed, False if the zone or schedule was not found
+        """
+        for zone in self.zones:
+            if zone.name == zone_name:
+                if not 0 <= index < len(zone.schedules):
+                    logger.warning(f"Zone '{zone_name}' has no schedule {index}")
+                    return False
+                self.set_zone_schedules(zone_name, zone.schedules[:index] + zone.schedules[index + 1:])
+                return True
+        logger.warning(f"Zone '{zone_name}' not found")
+        return False
+    
+    def add_zone(self, name: str, gpio_pin: int, days: Optional[List[int]] = None, start_time: Optional[str] = None,
+                 duration_minutes: Optional[int] = None, enabled: bool = True,
+                 schedules: Optional[List[SprinklerSchedule]] = None, flow_rate: float = 0.0,
+                 cycle_minutes: Optional[float] = None, soak_minutes: float = 0.0) -> List[Dict]:
         """
         Add a new zone.
         
         Args:
             name: Descriptive name for the zone
-            gpio_pin: GPIO pin number (BCM numbering) to control relay
+            gpio_pin: GPIO pin number (BCM numbering) to control relay, or an expander address (see resolve_pin)
             days: List of weekday numbers (0=Monday, 6=Sunday)
-            start_time: Time to start in "HH:MM" format (24-hour)
+            start_time: Time to start in "HH:MM" or "HH:MM:SS" format (24-hour)
             duration_minutes: How long to run sprinklers in minutes
             enabled: Whether the schedule is enabled
+            schedules: Schedules to use instead of days/start_time/duration_minutes
+            flow_rate: Water flow of the zone while open, checked against max_total_flow
+            cycle_minutes: Longest the zone may water before soaking (None = no limit)
+            soak_minutes: How long the zone rests between cycles
+            
+        Returns:
+            The new zone's schedule conflicts with other zones (see find_schedule_conflicts)
+            
+        Raises:
+            PinError: If the backend has no such pin or another zone or the master valve uses it
         """
-        schedule = SprinklerSchedule(days, start_time, duration_minutes, enabled)
-        zone = Zone(name, gpio_pin, schedule)
+        if schedules is None:
+            schedules = [SprinklerSchedule(days, start_time, duration_minutes, enabled)]
+        gpio_pin = self.resolve_pin(gpio_pin)
+        zone = Zone(name, gpio_pin, schedules=schedules, flow_rate=flow_rate,
+                    cycle_minutes=cycle_minutes, soak_minutes=soak_minutes)
+        self._check_pins(self.zones + [zone], self.master_valve)
         self.zones.append(zone)
-        self.stop_events[zone.name] = threading.Event()
+        self._sync_pins()
+        self._schedule_zone(zone)
         self.save_schedule()
         logger.info(f"Zone '{name}' added on GPIO pin {gpio_pin}")
+        return self._warn_conflicts(name)
+    
+    def find_schedule_conflicts(self, zone_name: Optional[str] = None) -> List[Dict]:
+        """
+        Find where enabled schedules of different zones overlap during the week.
+        
+        The runs come from the compiled week timeline, already in start
+        order (runs crossing Sunday midnight wrap to Monday), and include
+        program steps. One sweep keeps a heap of the runs still open, so the
+        cost is O(n log n) plus one step per overlap found rather than one
+        per pair. For a single zone only its runs and the runs overlapping
+        them are swept.
+        
+        Args:
+            zone_name: Only report conflicts involving this zone (or program)
+            
+        Returns:
+            One entry per overlap, ordered by start: zones, day, start, end, minutes,
+            'conditional' when a schedule involved doesn't fire every week
+            (interval, odd/even or a date-restricted cron), and 'programs' when
+            program steps are involved
+        """
+        with self._schedule_lock:
+            if zone_name is None:
+                runs = self.week_timeline.runs()
+            else:
+                runs = self.week_timeline.overlaps_of(zone_name)
+        
+        conflicts = []
+        open_runs = []
+        for index, run in enumerate(runs):
+            while open_runs and open_runs[0][0] <= run.start:
+                heapq.heappop(open_runs)
+            for other_end, other_index in open_runs:
+                other = runs[other_index]
+                if other.zone_name == run.zone_name:
+                    continue
+                if zone_name is not None and zone_name not in (run.zone_name, other.zone_name, run.owner, other.owner):
+                    continue
+                overlap_end = min(run.end, other_end)
+                day, start_text = format_week_minute(run.start / 60)
+                conflict = {
+                    'zones': [other.zone_name, run.zone_name],
+                    'day': day,
+                    'start': start_text,
+                    'end': format_week_minute(overlap_end / 60)[1],
+                    'minutes': seconds_to_minutes(overlap_end - run.start),
+                    'conditional': run.conditional or other.conditional
+                }
+                # Zone and program names never clash, so an owner that isn't the zone is a program
+                programs = sorted({item.owner for item in (other, run) if item.owner != item.zone_name})
+                if programs:
+                    conflict['programs'] = programs
+                conflicts.append(conflict)
+            heapq.heappush(open_runs, (run.end, index))
+        return conflicts
+    
+    def week_plan(self, zone_name: Optional[str] = None, day: Optional[int] = None) -> List[Dict]:
+        """
+        Get the runs planned for a typical week, from the compiled week timeline.
+        
+        Args:
+            zone_name: Only runs watering this zone (its own and program steps), or started by this program
+            day: Only runs that are on at some point during this weekday (0=Monday)
+            
+        Returns:
+            One entry per run, ordered by start: zone, day, start, end, minutes,
+            'conditional' when the run doesn't happen every week (a run crossing
+            Sunday midnight is listed as two parts), and 'program' for program steps
+        """
+        with self._schedule_lock:
+            if day is not None:
+                runs = self.week_timeline.overlapping(day * SECONDS_PER_DAY, (day + 1) * SECONDS_PER_DAY, zone_name)
+            elif zone_name is not None:
+                # Zone and program names never clash, so at most one of these has runs
+                runs = self.week_timeline.zone_runs(zone_name) or self.week_timeline.owner_runs(zone_name)
+            else:
+                runs = self.week_timeline.runs()
+        plan = []
+        for run in runs:
+            run_day, start_text = format_week_minute(run.start / 60)
+            entry = {
+                'zone': run.zone_name,
+                'day': run_day,
+                'start': start_text,
+                'end': format_week_minute(run.end / 60)[1],
+                'minutes': seconds_to_minutes(run.end - run.start),
+                'conditional': run.conditional
+            }
+            if run.owner != run.zone_name:
+                entry['program'] = run.owner
+            plan.append(entry)
+        return plan
+    
+    def _warn_conflicts(self, zone_name: str) -> List[Dict]:
+        """Log and return the schedule conflicts involving a zone or program."""
+        conflicts = self.find_schedule_conflicts(zone_name)
+        for conflict in conflicts:
+            logger.warning(f"Schedule conflict: {' & '.join(conflict['zones'])} overlap on {conflict['day']} "
+                           f"{conflict['start']}-{conflict['end']} ({conflict['minutes']} minutes)")
+        return conflicts
+    
+    def set_zone_cycle_soak(self, zone_name: str, cycle_minutes: Optional[float], soak_minutes: float) -> bool:
+        """
+        Split a zone's runs into cycles with soak breaks, so heavy soil can absorb the water.
+        
+        Runs already in progress keep their current settings.
+        
+        Args:
+            zone_name: Name of the zone to update
+            cycle_minutes: Longest the zone may water before soaking (None = no limit)
+            soak_minutes: How long the zone rests between cycles
+            
+        Returns:
+            True if the zone was found, False otherwise
+        """
+        for zone in self.zones:
+            if zone.name == zone_name:
+                zone.cycle_minutes = cycle_minutes
+                zone.soak_minutes = soak_minutes
+                self.save_schedule()
+                logger.info(f"Cycle/soak for zone '{zone_name}': {cycle_minutes} min cycles, {soak_minutes} min soak")
+                return True
+        logger.warning(f"Zone '{zone_name}' not found")
+        return False
     
     def enable_zone_schedule(self, zone_name: str):
         """
@@ -225,7 +1103,9 @@ class SprinklerController:
         """
         for zone in self.zones:
             if zone.name == zone_name:
-                zone.schedule.enabled = True
+                for schedule in zone.schedules:
+                    schedule.enabled = True
+                self._schedule_zone(zone)
                 self.save_schedule()
                 logger.info(f"Schedule enabled for zone '{zone_name}'")
                 return
@@ -240,7 +1120,9 @@ class SprinklerController:
         """
         for zone in self.zones:
             if zone.name == zone_name:
-                zone.schedule.enabled = False
+                for schedule in zone.schedules:
+                    schedule.enabled = False
+                self._unschedule_zone(zone.name)
                 self.save_schedule()
                 logger.info(f"Schedule disabled for zone '{zone_name}'")
                 return
@@ -249,12 +1131,16 @@ class SprinklerController:
     def enable_global_schedule(self):
         """Enable all automatic scheduling."""
         self.global_schedule_enabled = True
+        # Minutes that passed while disabled must not be replayed as missed
+        self._checked_until = None
+        self._rebuild_schedule_queue()
         self.save_schedule()
         logger.info("Global schedule enabled")
     
     def disable_global_schedule(self):
         """Disable all automatic scheduling."""
         self.global_schedule_enabled = False
+        self._wake_scheduler()
         self.save_schedule()
         logger.info("Global schedule disabled")
     
@@ -271,13 +1157,18 @@ class SprinklerController:
         for i, zone in enumerate(self.zones):
             if zone.name == zone_name:
                 # Stop zone if active
-                if zone.active:
-                    self.stop_events[zone_name].set()
-                    self.stop_zone(zone)
+                self.run_manager.stop_run(zone_name)
                 
                 # Remove from lists
                 del self.zones[i]
-                del self.stop_events[zone_name]
+                self._sync_pins()
+                self._unschedule_zone(zone_name)
+                
+                # Programs skip the zone from now on
+                for program in self.programs:
+                    if any(step.zone_name == zone_name for step in program.steps):
+                        program.set_steps([step for step in program.steps if step.zone_name != zone_name])
+                        self._schedule_zone(program)
                 
                 self.save_schedule()
                 logger.info(f"Zone '{zone_name}' removed")
@@ -286,64 +1177,926 @@ class SprinklerController:
         logger.warning(f"Zone '{zone_name}' not found")
         return False
     
+    def switch_zones(self, on: List[Zone], off: List[Zone]):
+        """
+        Turn several zones on and off in one GPIO write.
+        
+        The run manager applies every transition through this, so switching
+        from one zone to the next never leaves both valves open (or neither)
+        for longer than the backend's write. Logging waits until the pins are set.
+        
+        Args:
+            on: Zones (or the master valve) to turn on
+            off: Zones (or the master valve) to turn off
+        """
+        changes = {zone.gpio_pin: False for zone in off}
+        changes.update((zone.gpio_pin, True) for zone in on)
+        self.gpio.output_many(changes)
+        for zone in off:
+            zone.active = False
+        for zone in on:
+            zone.active = True
+        for zone in off:
+            logger.info(f"{self._output_label(zone)} turned OFF")
+        for zone in on:
+            logger.info(f"{self._output_label(zone)} turned ON")
+    
+    def _output_label(self, zone) -> str:
+        """Describe a switched output for the log."""
+        if isinstance(zone, MasterValve):
+            return "Master valve"
+        return f"Zone '{zone.name}'"
+    
     def start_zone(self, zone: Zone):
         """Turn on sprinklers for a specific zone."""
-        GPIO.output(zone.gpio_pin, GPIO.HIGH)
-        zone.active = True
-        logger.info(f"Zone '{zone.name}' turned ON")
+        self.switch_zones([zone], [])
     
     def stop_zone(self, zone: Zone):
         """Turn off sprinklers for a specific zone."""
-        GPIO.output(zone.gpio_pin, GPIO.LOW)
-        zone.active = False
-        logger.info(f"Zone '{zone.name}' turned OFF")
+        self.switch_zones([], [zone])
     
-    def run_zone(self, zone: Zone, duration_minutes: int):
+    def set_master_valve(self, gpio_pin: int, lead_seconds: float = 0.0, lag_seconds: float = 0.0) -> MasterValve:
         """
-        Run sprinklers for a specific zone.
+        Drive a master valve or pump relay whenever any zone is on.
+        
+        Changing only the delays keeps the current valve (and its state).
+        
+        Args:
+            gpio_pin: GPIO pin number (BCM numbering) of the relay, or an expander address (see resolve_pin)
+            lead_seconds: How long it is on before the first zone opens
+            lag_seconds: How long it stays on after the last zone closes
+            
+        Returns:
+            The master valve
+            
+        Raises:
+            PinError: If the backend has no such pin or a zone uses it
+        """
+        gpio_pin = self.resolve_pin(gpio_pin)
+        self._check_pins(self.zones, MasterValve(gpio_pin))
+        if self.master_valve is not None and self.master_valve.gpio_pin == gpio_pin:
+            self.master_valve.lead_seconds = lead_seconds
+            self.master_valve.lag_seconds = lag_seconds
+        else:
+            self._set_master_valve(MasterValve(gpio_pin, lead_seconds, lag_seconds))
+        self.save_schedule()
+        logger.info(f"Master valve on GPIO pin {gpio_pin} ({lead_seconds}s lead, {lag_seconds}s lag)")
+        return self.master_valve
+    
+    def remove_master_valve(self) -> bool:
+        """
+        Stop driving a master valve.
+        
+        Returns:
+            True if there was one, False otherwise
+        """
+        if self.master_valve is None:
+            return False
+        self._set_master_valve(None)
+        self.save_schedule()
+        logger.info("Master valve removed")
+        return True
+    
+    def _set_master_valve(self, master: Optional[MasterValve]):
+        """Hand a master valve to the run manager, setting its pin up first and releasing the old one after."""
+        self.master_valve = master
+        self._sync_pins(release=False)
+        self.run_manager.set_master(master)
+        self._sync_pins()
+    
+    def resolve_pin(self, gpio_pin) -> int:
+        """
+        Get the pin number of a pin given as a number, {"chip": c, "pin": p} or "c.p".
+        
+        The pair forms address pin p of I/O expander chip c, saving the
+        chip * 16 + pin (MCP23017) or chip * 8 + pin (74HC595) arithmetic.
+        
+        Raises:
+            PinError: If the form is not recognised or the backend has no such chip or pin
+        """
+        if isinstance(gpio_pin, int) and not isinstance(gpio_pin, bool):
+            return gpio_pin
+        chip = pin = None
+        if isinstance(gpio_pin, dict) and set(gpio_pin) == {'chip', 'pin'}:
+            chip, pin = gpio_pin['chip'], gpio_pin['pin']
+        elif isinstance(gpio_pin, str):
+            chip_text, _, pin_text = gpio_pin.partition('.')
+            if chip_text.isdigit() and pin_text.isdigit():
+                chip, pin = int(chip_text), int(pin_text)
+        if not (isinstance(chip, int) and isinstance(pin, int)):
+            raise PinError(f"Invalid GPIO pin {gpio_pin!r} - expected a number, {{\"chip\": c, \"pin\": p}} or \"c.p\"")
+        try:
+            return self.gpio.pin_number(chip, pin)
+        except ValueError as e:
+            raise PinError(str(e)) from e
+    
+    def check_pin(self, gpio_pin: int, owner: Optional[str] = None):
+        """
+        Raise PinError unless the GPIO backend has a pin.
+        
+        Args:
+            gpio_pin: Pin number to check
+            owner: What the pin drives, for the error message (e.g. "zone 'Front'")
+        """
+        pin_count = self.gpio.pin_count
+        if gpio_pin < 0 or (pin_count is not None and gpio_pin >= pin_count):
+            available = f"pins 0-{pin_count - 1} are available" if pin_count is not None else "pins start at 0"
+            raise PinError(f"GPIO pin {gpio_pin}{f' of {owner}' if owner else ''} does not exist ({available})")
+    
+    def _check_pins(self, zones: List[Zone], master: Optional[MasterValve]):
+        """Raise PinError unless every pin exists on the GPIO backend and no two outputs share one."""
+        outputs = [(zone.gpio_pin, f"zone '{zone.name}'") for zone in zones]
+        if master is not None:
+            outputs.append((master.gpio_pin, "the master valve"))
+        owners = {}
+        for pin, owner in outputs:
+            self.check_pin(pin, owner)
+            if pin in owners:
+                raise PinError(f"GPIO pin {pin} is used by both {owners[pin]} and {owner}")
+            owners[pin] = owner
+    
+    def _sync_pins(self, release: bool = True):
+        """
+        Set up the pins of the zones and master valve that are not set up yet.
+        
+        Args:
+            release: Also release pins nothing uses any more
+        """
+        pins = {zone.gpio_pin for zone in self.zones}
+        if self.master_valve is not None:
+            pins.add(self.master_valve.gpio_pin)
+        for pin in sorted(pins - self._pins):
+            self.gpio.setup(pin)
+        if release:
+            for pin in sorted(self._pins - pins):
+                self.gpio.release(pin)
+            self._pins = pins
+        else:
+            self._pins |= pins
+    
+    def set_dispatch_limits(self, max_concurrent_zones: Optional[int], max_total_flow: Optional[float]):
+        """
+        Limit how many zones may water at once so line pressure stays adequate.
+        
+        Runs beyond the limits wait in the run manager's queue.
+        
+        Args:
+            max_concurrent_zones: Maximum number of zones open at once (None = no limit)
+            max_total_flow: Maximum summed flow_rate of open zones (None = no limit)
+        """
+        self.run_manager.set_limits(max_concurrent_zones, max_total_flow)
+        self.save_schedule()
+        logger.info(f"Dispatch limits set: {max_concurrent_zones} zones, {max_total_flow} total flow")
+    
+    def start_run(self, zone: Zone, duration_minutes: float, priority: int = PRIORITY_MANUAL) -> Optional[Run]:
+        """
+        Start (or queue, if the dispatch limits are reached) a timed run without blocking.
+        
+        The run follows the zone's cycle/soak settings, so duration_minutes is
+        the total watering time rather than the time the valve stays open.
         
         Args:
             zone: Zone object to run
             duration_minutes: How long to run sprinklers in minutes
+            priority: Run priority - test, scheduled, manual or frost (run_manager.PRIORITY_*);
+                a higher priority preempts lower-priority runs when the dispatch limits are reached
+            
+        Returns:
+            The Run, or None if the zone already has a run of equal or higher priority
+        """
+        if duration_minutes < 1:
+            logger.info(f"Running zone '{zone.name}' for {duration_minutes * 60:.0f} seconds")
+        else:
+            logger.info(f"Running zone '{zone.name}' for {duration_minutes} minutes")
+        run = self.run_manager.start_run(zone, duration_minutes * 60, priority, zone.cycle_seconds, zone.soak_minutes * 60)
+        if run is not None and run.state == RUN_QUEUED:
+            logger.info(f"Zone '{zone.name}' queued until the dispatch limits allow it to start")
+        return run
+    
+    def stop_run(self, zone_name: str) -> bool:
+        """
+        Stop a zone's current run.
+        
+        Args:
+            zone_name: Name of the zone to stop
+            
+        Returns:
+            True if a run was stopped, False if the zone was not running
+        """
+        return self.run_manager.stop_run(zone_name)
+    
+    def pause_run(self, zone_name: str) -> bool:
         """
-        logger.info(f"Running zone '{zone.name}' for {duration_minutes} minutes")
-        self.start_zone(zone)
+        Pause a zone's current run, closing the valve but keeping the remaining time.
         
-        # Wait for duration or stop event
-        self.stop_events[zone.name].wait(timeout=duration_minutes * 60)
+        Args:
+            zone_name: Name of the zone to pause
+            
+        Returns:
+            True if the run was paused, False if the zone has no run or it is already paused
+        """
+        if not self.run_manager.pause_run(zone_name):
+            return False
+        logger.info(f"Zone '{zone_name}' paused")
+        return True
+    
+    def resume_run(self, zone_name: str) -> bool:
+        """
+        Resume a paused run with the watering time it had left.
         
-        self.stop_zone(zone)
-        self.stop_events[zone.name].clear()
+        Args:
+            zone_name: Name of the zone to resume
+            
+        Returns:
+            True if the run was resumed, False if the zone has no paused run
+        """
+        if not self.run_manager.resume_run(zone_name):
+            return False
+        logger.info(f"Zone '{zone_name}' resumed")
+        return True
     
-    def check_and_run(self):
-        """Check if it's time to run sprinklers for any zone and execute if needed."""
+    def extend_run(self, zone_name: str, minutes: float) -> bool:
+        """
+        Add watering time to a zone's current run (running, soaking, queued or paused).
+        
+        Args:
+            zone_name: Name of the zone
+            minutes: Watering time to add in minutes
+            
+        Returns:
+            True if the run was extended, False if the zone has no run
+        """
+        if not self.run_manager.extend_run(zone_name, minutes * 60):
+            return False
+        logger.info(f"Run for zone '{zone_name}' extended by {minutes} minutes")
+        return True
+    
+    def run_zone(self, zone: Zone, duration_minutes: float, priority: int = PRIORITY_MANUAL) -> Optional[Run]:
+        """
+        Run sprinklers for a specific zone and wait for the run to finish.
+        
+        Args:
+            zone: Zone object to run
+            duration_minutes: How long to run sprinklers in minutes
+            priority: Run priority (see start_run)
+            
+        Returns:
+            The finished Run, or None if the zone already has a run of equal or higher priority
+        """
+        run = self.start_run(zone, duration_minutes, priority)
+        if run is not None:
+            run.done.wait()
+        return run
+    
+    def find_program(self, name: str) -> Optional[Program]:
+        """Get a program by name, or None."""
+        for program in self.programs:
+            if program.name == name:
+                return program
+        return None
+    
+    def _check_program(self, steps: List[ProgramStep]):
+        """Raise ValueError unless every step names an existing zone."""
+        zone_names = {zone.name for zone in self.zones}
+        for step in steps:
+            if step.zone_name not in zone_names:
+                raise ValueError(f"Zone '{step.zone_name}' not found")
+    
+    def add_program(self, name: str, steps: List[ProgramStep],
+                    schedules: Optional[List[SprinklerSchedule]] = None) -> List[Dict]:
+        """
+        Add a program that waters zones back to back from shared start times.
+        
+        Args:
+            name: Program name (distinct from every zone and program name)
+            steps: Zones to water, in order
+            schedules: Start times of the whole program (none = manual runs only)
+            
+        Returns:
+            The program's schedule conflicts with other zones (see find_schedule_conflicts)
+            
+        Raises:
+            ValueError: If the name is taken or a step names an unknown zone
+        """
+        if any(item.name == name for item in self.zones + self.programs):
+            raise ValueError(f"Name '{name}' is already used by a zone or program")
+        self._check_program(steps)
+        program = Program(name, steps, schedules)
+        self.programs.append(program)
+        self._schedule_zone(program)
+        self.save_schedule()
+        logger.info(f"Program '{name}' added: {', '.join(step.zone_name for step in steps)}")
+        return self._warn_conflicts(name)
+    
+    def update_program(self, name: str, steps: List[ProgramStep],
+                       schedules: Optional[List[SprinklerSchedule]] = None) -> List[Dict]:
+        """
+        Replace a program's steps and schedules; a run in progress keeps its old steps.
+        
+        Args:
+            name: Program to update
+            steps: Zones to water, in order
+            schedules: Start times of the whole program (none = manual runs only)
+            
+        Returns:
+            The program's schedule conflicts with other zones (see find_schedule_conflicts)
+            
+        Raises:
+            ValueError: If a step names an unknown zone
+        """
+        program = self.find_program(name)
+        if program is None:
+            logger.warning(f"Program '{name}' not found")
+            return []
+        self._check_program(steps)
+        program.schedules = list(schedules) if schedules else []
+        program.set_steps(steps)
+        self._schedule_zone(program)
+        self.save_schedule()
+        logger.info(f"Program '{name}' updated: {', '.join(step.zone_name for step in steps)}")
+        return self._warn_conflicts(name)
+    
+    def remove_program(self, name: str) -> bool:
+        """
+        Remove a program, stopping it if it is running.
+        
+        Args:
+            name: Program to remove
+            
+        Returns:
+            True if the program was removed, False if not found
+        """
+        program = self.find_program(name)
+        if program is None:
+            logger.warning(f"Program '{name}' not found")
+            return False
+        self.run_manager.stop_sequence(name)
+        self.programs.remove(program)
+        self._unschedule_zone(name)
+        self.save_schedule()
+        logger.info(f"Program '{name}' removed")
+        return True
+    
+    def start_program(self, name: str, priority: int = PRIORITY_MANUAL, skip_seconds: float = 0) -> Optional[Sequence]:
+        """
+        Run a program's zones one after another without blocking.
+        
+        Each step is an ordinary run of its zone (following the zone's
+        cycle/soak settings and the dispatch limits) and starts once the
+        previous step has finished.
+        
+        Args:
+            name: Program to run
+            priority: Priority of every step's run (run_manager.PRIORITY_*)
+            skip_seconds: Watering time to leave out from the start of the program
+            
+        Returns:
+            The Sequence, or None if the program is unknown or already running
+        """
+        program = self.find_program(name)
+        if program is None:
+            logger.warning(f"Program '{name}' not found")
+            return None
+        zones_by_name = {zone.name: zone for zone in self.zones}
+        steps = []
+        for step in program.steps:
+            duration_seconds = step.duration_seconds - skip_seconds
+            skip_seconds = max(0, -duration_seconds)
+            zone = zones_by_name.get(step.zone_name)
+            if duration_seconds <= 0 or zone is None:
+                continue
+            steps.append((zone, duration_seconds, zone.cycle_seconds, zone.soak_minutes * 60))
+        sequence = self.run_manager.start_sequence(name, steps, priority)
+        if sequence is None:
+            logger.info(f"Program '{name}' is already running")
+        else:
+            logger.info(f"Running program '{name}': {', '.join(step[0].name for step in steps)}")
+        return sequence
+    
+    def stop_program(self, name: str) -> bool:
+        """
+        Stop a running program and its current zone.
+        
+        Args:
+            name: Program to stop
+            
+        Returns:
+            True if the program was stopped, False if it was not running
+        """
+        return self.run_manager.stop_sequence(name)
+    
+    def _queue_zone(self, zone: ScheduleOwner, after: Optional[datetime] = None):
+        """
+        Push the next fire time of a zone or program onto the schedule queue.
+        
+        Any entry previously queued for it becomes stale.
+        
+        Args:
+            zone: Zone or program to queue
+            after: Earliest acceptable UTC fire time (defaults to the current minute)
+        """
+        if after is None:
+            after = self.clock.utcnow().replace(second=0, microsecond=0)
+        with self._schedule_lock:
+            token = next(self._token_counter)
+            self._schedule_tokens[zone.name] = token
+            if zone.schedule_enabled:
+                fire_time = self._next_fire_utc(zone, after)
+                if fire_time is not None:
+                    heapq.heappush(self._schedule_heap, (fire_time, token, zone.name))
+            # Drop stale entries once they outnumber live ones
+            if len(self._schedule_heap) > 2 * len(self._schedule_tokens) + 16:
+                self._schedule_heap = [
+                    entry for entry in self._schedule_heap
+                    if self._schedule_tokens.get(entry[2]) == entry[1]
+                ]
+                heapq.heapify(self._schedule_heap)
+        self._wake_scheduler()
+    
+    def _next_fire_utc(self, zone: ScheduleOwner, after: datetime) -> Optional[datetime]:
+        """
+        Get a zone's or program's next fire time as a UTC instant, applying the DST policies.
+        
+        Args:
+            zone: Zone or program to look up
+            after: Earliest acceptable UTC fire time
+        """
+        local_after = self.local_time.to_local(after)
+        while True:
+            fire_local = zone.next_fire_time(local_after)
+            if fire_local is None:
+                return None
+            fire_time = self._fire_local_to_utc(fire_local)
+            # Skipped times, and repeated times already passed, move on to the next start
+            if fire_time is not None and fire_time >= after:
+                return fire_time
+            local_after = fire_local + timedelta(seconds=1)
+    
+    def _fire_local_to_utc(self, fire_local: datetime) -> Optional[datetime]:
+        """
+        Convert a local start time to the UTC instant check_and_run fires it at.
+        
+        The minute is converted under the DST policies and the seconds are
+        added afterwards, so a start shifted out of a spring-forward gap
+        keeps its offset into the minute.
+        """
+        fire_minute = fire_local.replace(second=0, microsecond=0)
+        fire_time = self.local_time.to_utc(fire_minute, self.nonexistent_policy, self.ambiguous_policy)
+        if fire_time is None:
+            return None
+        return fire_time + (fire_local - fire_minute)
+    
+    def _schedule_zone(self, zone: ScheduleOwner):
+        """Re-index, re-queue and patch the week timeline for a zone or program after its schedule changed."""
+        with self._schedule_lock:
+            self.run_calendar.invalidate(zone.name)
+            if zone.schedule_enabled:
+                # The timeline (and so upcoming runs and conflicts) is laid out from the indexed slots
+                week_entries = zone.week_entries()
+                self._trigger_index.add(zone, week_entries)
+                self.week_timeline.set_runs(zone.name, zone.timeline_entries(week_entries))
+            else:
+                self._trigger_index.remove(zone.name)
+                self.week_timeline.remove(zone.name)
+            self._queue_zone(zone)
+    
+    def _unschedule_zone(self, zone_name: str):
+        """Drop a zone or program from the trigger index and week timeline and invalidate its queued fire time."""
+        with self._schedule_lock:
+            self._trigger_index.remove(zone_name)
+            self.week_timeline.remove(zone_name)
+            self._schedule_tokens.pop(zone_name, None)
+            self.run_calendar.invalidate(zone_name)
+        self._wake_scheduler()
+    
+    def _rebuild_schedule_queue(self):
+        """Recompute the trigger index, week timeline and schedule queue from scratch for all zones and programs."""
+        with self._schedule_lock:
+            self._trigger_index.clear()
+            self.week_timeline.clear()
+            self.run_calendar.clear()
+            self._schedule_heap = []
+            self._schedule_tokens = {}
+            for zone in self.zones + self.programs:
+                self._schedule_zone(zone)
+    
+    def _advance_schedule_queue(self, now: datetime):
+        """Pop every live queue entry due at or before now and requeue its zone or program."""
+        zones_by_name = {zone.name: zone for zone in self.zones + self.programs}
+        with self._schedule_lock:
+            while self._schedule_heap and self._schedule_heap[0][0] <= now:
+                fire_time, token, zone_name = heapq.heappop(self._schedule_heap)
+                zone = zones_by_name.get(zone_name)
+                if self._schedule_tokens.get(zone_name) != token or zone is None:
+                    continue
+                self._queue_zone(zone, after=fire_time + timedelta(seconds=1))
+    
+    def _expand_runs(self, name: str, start: datetime, end: datetime) -> List[Tuple[datetime, TimelineRun]]:
+        """
+        List the runs a zone's or program's schedules start in a UTC range, for the run calendar.
+        
+        Each local week in the range is laid out from its runs on the
+        compiled week timeline. Date-dependent runs are checked with
+        runs_on() on the day the schedule fires, and fire times are converted
+        under the DST policies; program steps follow at their offset.
+        
+        Args:
+            name: Zone or program to expand
+            start: Earliest UTC start time
+            end: Latest UTC start time (exclusive)
+            
+        Returns:
+            (UTC start, timeline run) pairs sorted by start
+        """
+        with self._schedule_lock:
+            week_runs = [run for run in self.week_timeline.owner_runs(name) if not run.continued]
+        if not week_runs:
+            return []
+        # A day either side covers any UTC offset
+        first_day = (self.local_time.to_local(start) - timedelta(days=1)).date()
+        week = datetime.combine(first_day - timedelta(days=first_day.weekday()), dt_time())
+        last_local = self.local_time.to_local(end) + timedelta(days=1)
+        runs = []
+        while week <= last_local:
+            for run in week_runs:
+                fire_local = week + timedelta(seconds=run.start - run.offset)
+                if not run.schedule.runs_on(fire_local.date()):
+                    continue
+                fire_time = self._fire_local_to_utc(fire_local)
+                if fire_time is None:
+                    continue
+                fire_time += timedelta(seconds=run.offset)
+                if start <= fire_time < end:
+                    runs.append((fire_time, run))
+            week += timedelta(days=7)
+        runs.sort(key=lambda run: run[0])
+        return runs
+    
+    def upcoming_runs(self, hours: float) -> List[Dict]:
+        """
+        Get the scheduled runs of all zones and programs over the next hours, in start order.
+        
+        Served from the run calendar, which keeps each zone's and program's
+        upcoming runs and only re-expands one after its schedules change.
+        Disabled schedules and zones and runs inside a rain delay or blackout
+        are left out, and nothing is listed while the global schedule is
+        disabled. Program steps are listed at their planned start, assuming
+        each step waters without waiting.
+        
+        Args:
+            hours: How far ahead to look
+            
+        Returns:
+            List of dictionaries with zone, start, end (local time), duration_minutes,
+            duration_seconds, and 'program' for program steps
+        """
         if not self.global_schedule_enabled:
+            return []
+        now = self.clock.utcnow()
+        self._expire_suspensions(now)
+        with self._schedule_lock:
+            names = [item.name for item in self.zones + self.programs]
+            runs = self.run_calendar.upcoming(names, now, now + timedelta(hours=hours))
+        upcoming = []
+        for start, name, run in runs:
+            # Suspensions apply when the schedule fires, so a program is kept or skipped whole
+            fired_at = start - timedelta(seconds=run.offset)
+            if self.suspensions.reason(fired_at, minute_of_week(self.local_time.to_local(fired_at))):
+                continue
+            entry = {
+                'zone': run.zone_name,
+                'start': self.local_time.to_local(start),
+                'end': self.local_time.to_local(start + timedelta(seconds=run.duration)),
+                'duration_minutes': seconds_to_minutes(run.duration),
+                'duration_seconds': run.duration
+            }
+            if name != run.zone_name:
+                entry['program'] = name
+            upcoming.append(entry)
+        return upcoming
+    
+    def seconds_until_next_run(self) -> Optional[float]:
+        """
+        Get the number of seconds until the earliest queued schedule fires.
+        
+        Returns:
+            Seconds to wait (0 if already due), or None if nothing is queued
+        """
+        fire_time = self._peek_next_fire_time()
+        if fire_time is None:
+            return None
+        return max(0.0, (fire_time - self.clock.utcnow()).total_seconds())
+    
+    def _peek_next_fire_time(self) -> Optional[datetime]:
+        """Get the earliest live (UTC) fire time in the schedule queue."""
+        with self._schedule_lock:
+            while self._schedule_heap:
+                fire_time, token, zone_name = self._schedule_heap[0]
+                if self._schedule_tokens.get(zone_name) == token:
+                    return fire_time
+                heapq.heappop(self._schedule_heap)
+        return None
+    
+    def local_now(self) -> datetime:
+        """Get the current local wall-clock time in the schedule's timezone."""
+        return self.local_time.to_local(self.clock.utcnow())
+    
+    def set_timezone(self, name: Optional[str], nonexistent_policy: Optional[str] = None,
+                     ambiguous_policy: Optional[str] = None):
+        """
+        Set the timezone schedules are written in and how DST changes are handled.
+        
+        Args:
+            name: IANA timezone name, e.g. "America/Chicago" (None = system local time)
+            nonexistent_policy: "shift" or "skip" for start times a spring-forward change skips
+            ambiguous_policy: "first" or "second" for start times a fall-back change repeats
+            
+        Raises:
+            ValueError: If the timezone or a policy is unknown
+        """
+        if nonexistent_policy is not None and nonexistent_policy not in NONEXISTENT_POLICIES:
+            raise ValueError(f"Unknown DST policy '{nonexistent_policy}'")
+        if ambiguous_policy is not None and ambiguous_policy not in AMBIGUOUS_POLICIES:
+            raise ValueError(f"Unknown DST policy '{ambiguous_policy}'")
+        self.local_time = TransitionTable(name)
+        if nonexistent_policy is not None:
+            self.nonexistent_policy = nonexistent_policy
+        if ambiguous_policy is not None:
+            self.ambiguous_policy = ambiguous_policy
+        self._rebuild_schedule_queue()
+        self.save_schedule()
+        logger.info(f"Timezone set to {name or 'system local time'} "
+                    f"(skipped times: {self.nonexistent_policy}, repeated times: {self.ambiguous_policy})")
+    
+    def add_rain_delay(self, hours: float) -> RainDelay:
+        """
+        Suspend scheduled runs from now for a number of hours; they resume on their own.
+        
+        Args:
+            hours: Length of the delay
+            
+        Returns:
+            The new rain delay
+        """
+        now = self.clock.utcnow().replace(microsecond=0)
+        delay = RainDelay(self.suspensions.next_id(), now, now + timedelta(hours=hours))
+        self.suspensions.add(delay)
+        self.save_schedule()
+        logger.info(f"Rain delay {delay.id}: scheduled runs suspended until {self.local_time.to_local(delay.end):%Y-%m-%d %H:%M}")
+        return delay
+    
+    def add_blackout(self, start_time: str, end_time: str, days: Optional[List[int]] = None,
+                     expires_at: Optional[datetime] = None) -> Blackout:
+        """
+        Suspend scheduled runs every day (or on some weekdays) between two local times.
+        
+        Args:
+            start_time: Local time the window opens, "HH:MM"
+            end_time: Local time the window closes, "HH:MM" (earlier than start_time = next day)
+            days: Weekdays the window opens on (0=Monday, None = every day)
+            expires_at: UTC time the window stops applying (None = never)
+            
+        Returns:
+            The new blackout window
+        """
+        blackout = Blackout(self.suspensions.next_id(), start_time, end_time, days, expires_at)
+        self.suspensions.add(blackout)
+        self.save_schedule()
+        logger.info(f"Blackout {blackout.id}: no scheduled runs {start_time}-{end_time}")
+        return blackout
+    
+    def remove_suspension(self, suspension_id: int) -> bool:
+        """
+        Cancel a rain delay or blackout window.
+        
+        Args:
+            suspension_id: Identifier of the window
+            
+        Returns:
+            True if it was removed, False if there is no such window
+        """
+        if not self.suspensions.remove(suspension_id):
+            logger.warning(f"Suspension {suspension_id} not found")
+            return False
+        self.save_schedule()
+        logger.info(f"Suspension {suspension_id} removed")
+        return True
+    
+    def list_suspensions(self) -> List[Dict]:
+        """
+        Get every rain delay and blackout window with times in local time.
+        
+        Returns:
+            One dictionary per window, with 'active' telling whether it suspends runs right now
+        """
+        now = self.clock.utcnow()
+        self._expire_suspensions(now)
+        local_now = self.local_time.to_local(now)
+        windows = []
+        for item in self.suspensions.suspensions:
+            data = item.to_dict()
+            for key in ('start', 'end', 'expires_at'):
+                if data.get(key) is not None:
+                    data[key] = self.local_time.to_local(getattr(item, key))
+            data['active'] = item.is_active(now, minute_of_week(local_now))
+            windows.append(data)
+        return windows
+    
+    def _expire_suspensions(self, now: datetime):
+        """Drop rain delays and blackouts that have run out."""
+        expired = self.suspensions.expire(now)
+        if expired:
+            for item in expired:
+                logger.info(f"Suspension {item.id} expired - scheduled runs resume")
+            self.save_schedule()
+    
+    def set_catchup_policy(self, policy: str, max_catchup_minutes: Optional[int] = None):
+        """
+        Configure how missed trigger minutes are handled.
+        
+        Args:
+            policy: One of "run_late", "skip" or "shorten"
+            max_catchup_minutes: How far back missed minutes are replayed
+        """
+        if policy not in CATCHUP_POLICIES:
+            raise ValueError(f"Unknown catch-up policy '{policy}'")
+        self.catchup_policy = policy
+        if max_catchup_minutes is not None:
+            self.max_catchup_minutes = max_catchup_minutes
+        self.save_schedule()
+        logger.info(f"Catch-up policy set to '{policy}' ({self.max_catchup_minutes} minute window)")
+    
+    def check_and_run(self, now: Optional[datetime] = None):
+        """
+        Start every zone and program whose start time has passed since the last check.
+        
+        The check walks UTC minutes and maps each one to local wall time with
+        the precomputed transition table, so no timezone lookups happen here.
+        Each indexed schedule fires at its minute plus its start_second, and
+        only once that instant has been reached, so the scheduler (which
+        sleeps until the exact queued fire time) starts runs to the second.
+        Local minutes skipped or repeated by a DST change follow the
+        nonexistent/ambiguous policies. Runs due inside a rain delay or
+        blackout window are skipped. Start times skipped since the previous
+        call (long pause, forward clock step) are replayed under the
+        configured catch-up policy. Start times already checked are never
+        triggered twice, even if the clock steps backwards.
+        
+        Args:
+            now: Current UTC time (defaults to the controller clock)
+        """
+        if now is None:
+            now = self.clock.utcnow()
+        self._expire_suspensions(now)
+        # Nothing can trigger before the earliest queued fire time, so the
+        # replay below starts there rather than at every idle minute
+        first_due = self._peek_next_fire_time()
+        self._advance_schedule_queue(now)
+        
+        # Start times in (checked_until, now] are due in this call
+        checked_until = self._checked_until
+        if checked_until is not None and now <= checked_until:
             return
+        self._checked_until = now
         
-        for zone in self.zones:
-            if not zone.schedule.enabled:
-                continue
-                
-            if zone.schedule.should_run_today() and zone.schedule.is_start_time():
-                if not zone.active:
-                    logger.info(f"Schedule triggered for zone '{zone.name}' - starting sprinklers")
-                    # Run in separate thread to avoid blocking
-                    thread = threading.Thread(
-                        target=self.run_zone,
-                        args=(zone, zone.schedule.duration_minutes)
-                    )
-                    thread.daemon = True
-                    thread.start()
+        if not self.global_schedule_enabled or first_due is None or first_due > now:
+            return
+        
+        if checked_until is None:
+            # First check: only start times in the current minute
+            checked_until = now.replace(second=0, microsecond=0) - timedelta(microseconds=1)
+        else:
+            oldest = now - timedelta(minutes=self.max_catchup_minutes)
+            missed_from = max(checked_until, first_due)
+            if missed_from < oldest:
+                logger.warning(f"Missed schedule minutes {self.local_time.to_local(missed_from):%Y-%m-%d %H:%M} to "
+                               f"{self.local_time.to_local(oldest):%H:%M} are beyond the catch-up window")
+                checked_until = oldest
+        
+        minute = max(checked_until, first_due).replace(second=0, microsecond=0)
+        while minute <= now:
+            for local_minute in self.local_time.fire_minutes(minute, self.nonexistent_policy, self.ambiguous_policy):
+                with self._schedule_lock:
+                    due_zones = self._trigger_index.lookup(minute_of_week(local_minute))
+                for zone, schedule in sorted(due_zones, key=lambda entry: entry[1].start_second):
+                    fire_time = minute + timedelta(seconds=schedule.start_second)
+                    if not checked_until < fire_time <= now or not schedule.runs_on(local_minute.date()):
+                        continue
+                    suspended = self.suspensions.reason(fire_time, minute_of_week(local_minute))
+                    if suspended:
+                        start_local = local_minute + timedelta(seconds=schedule.start_second)
+                        kind = "program" if isinstance(zone, Program) else "zone"
+                        logger.info(f"Skipping scheduled run for {kind} '{zone.name}' at {format_time_of_day(start_local.time())} ({suspended})")
+                        continue
+                    if isinstance(zone, Program):
+                        self._trigger_program(zone, fire_time, now)
+                    else:
+                        self._trigger_zone(zone, schedule, fire_time, now)
+            minute += timedelta(minutes=1)
+    
+    def _trigger_zone(self, zone: Zone, schedule: SprinklerSchedule, scheduled_at: datetime, now: datetime):
+        """
+        Start a scheduled run, applying the catch-up policy if it is late.
+        
+        If the zone is already running, the runs overlap and are merged by
+        extending the current run to cover this one.
+        
+        Args:
+            zone: Zone to run
+            schedule: Schedule that triggered
+            scheduled_at: UTC instant the run was scheduled for
+            now: Current UTC time
+        """
+        duration_seconds = schedule.duration_seconds
+        late_seconds = (now - scheduled_at).total_seconds()
+        scheduled_local = format_time_of_day(self.local_time.to_local(scheduled_at).time().replace(microsecond=0))
+        if late_seconds >= 60:
+            if self.catchup_policy == CATCHUP_SKIP:
+                logger.warning(f"Skipping missed run for zone '{zone.name}' scheduled at {scheduled_local}")
+                return
+            if self.catchup_policy == CATCHUP_SHORTEN:
+                duration_seconds -= late_seconds
+                if duration_seconds <= 0:
+                    logger.warning(f"Missed run for zone '{zone.name}' scheduled at {scheduled_local} would already have ended")
+                    return
+            logger.warning(f"Running zone '{zone.name}' {late_seconds / 60:.0f} minutes late (scheduled at {scheduled_local})")
+        
+        if self.run_manager.merge_run(zone.name, duration_seconds):
+            logger.info(f"Schedule for zone '{zone.name}' overlaps its current run - merged")
+            return
+        logger.info(f"Schedule triggered for zone '{zone.name}' - starting sprinklers")
+        self.start_run(zone, duration_seconds / 60, PRIORITY_SCHEDULED)
+    
+    def _trigger_program(self, program: Program, scheduled_at: datetime, now: datetime):
+        """
+        Start a scheduled program, applying the catch-up policy if it is late.
+        
+        A program still running from an earlier start is left alone.
+        
+        Args:
+            program: Program to run
+            scheduled_at: UTC instant the program was scheduled for
+            now: Current UTC time
+        """
+        skip_seconds = 0
+        late_seconds = (now - scheduled_at).total_seconds()
+        scheduled_local = format_time_of_day(self.local_time.to_local(scheduled_at).time().replace(microsecond=0))
+        if late_seconds >= 60:
+            if self.catchup_policy == CATCHUP_SKIP:
+                logger.warning(f"Skipping missed run of program '{program.name}' scheduled at {scheduled_local}")
+                return
+            if self.catchup_policy == CATCHUP_SHORTEN:
+                # Steps that would already have finished are dropped, the current one cut short
+                skip_seconds = late_seconds
+                if skip_seconds >= program.duration_seconds:
+                    logger.warning(f"Missed run of program '{program.name}' scheduled at {scheduled_local} would already have ended")
+                    return
+            logger.warning(f"Running program '{program.name}' {late_seconds / 60:.0f} minutes late (scheduled at {scheduled_local})")
+        
+        logger.info(f"Schedule triggered for program '{program.name}'")
+        self.start_program(program.name, PRIORITY_SCHEDULED, skip_seconds)
+    
+    def _start_run_manager(self):
+        """Start the run manager on its own thread."""
+        self.run_manager.start()
+    
+    def _wake_scheduler(self):
+        """Interrupt the scheduler's sleep so it re-reads the schedule queue."""
+        self._wakeup.set()
+    
+    def _next_check_timeout(self) -> Optional[float]:
+        """Get how long the scheduler may sleep (None means until woken)."""
+        if not self.global_schedule_enabled:
+            return None
+        timeout = self.seconds_until_next_run()
+        if timeout is None or timeout > WALL_CLOCK_RESYNC_SECONDS:
+            timeout = WALL_CLOCK_RESYNC_SECONDS
+        return timeout
     
     def run_controller(self):
-        """Main control loop - checks schedule every minute."""
+        """
+        Main control loop - sleeps until the next scheduled fire time.
+        
+        Sleeps use the monotonic clock (threading.Event.wait) and end at the
+        next fire time, to the second. Each wakeup re-reads the wall
+        clock, so minutes lost to drift or clock steps are caught up by
+        check_and_run.
+        """
         self.is_running = True
         logger.info("Sprinkler controller started")
         
         try:
             while self.is_running:
-                self.check_and_run()
-                time.sleep(60)  # Check every minute
+                self._wakeup.clear()
+                try:
+                    self.check_and_run()
+                    # Schedule changes set the wakeup event, so sleeping until the
+                    # earliest fire time (or forever when disabled) is safe
+                    timeout = self._next_check_timeout()
+                except Exception as e:
+                    logger.error(f"Schedule check failed: {e}")
+                    timeout = CHECK_RETRY_SECONDS
+                self._wakeup.wait(timeout=timeout)
         except KeyboardInterrupt:
             logger.info("Controller stopped by user")
         finally:
@@ -352,11 +2105,15 @@ class SprinklerController:
     def cleanup(self):
         """Clean up GPIO and stop all zones."""
         self.is_running = False
-        for zone in self.zones:
-            self.stop_events[zone.name].set()
-            if zone.active:
-                self.stop_zone(zone)
-        GPIO.cleanup()
+        self._wake_scheduler()
+        self.run_manager.shutdown()
+        active = [zone for zone in self.zones if zone.active]
+        if self.master_valve is not None and self.master_valve.active:
+            active.append(self.master_valve)
+        if active:
+            self.switch_zones([], active)
+        self.gpio.cleanup()
+        self._pins = set()
         logger.info("Controller cleaned up")
 
 
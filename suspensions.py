@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Schedule Suspensions for Sprinkler Controller
+Rain delays and recurring blackout windows, looked up in sorted interval sets.
+"""
+
+import bisect
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+SUSPENSION_RAIN_DELAY = "rain_delay"
+SUSPENSION_BLACKOUT = "blackout"
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def _format_utc(moment: Optional[datetime]) -> Optional[str]:
+    """Format a naive UTC datetime for the schedule file."""
+    if moment is None:
+        return None
+    return moment.replace(tzinfo=timezone.utc).isoformat()
+
+
+def _parse_utc(text: Optional[str]) -> Optional[datetime]:
+    """Parse a datetime from the schedule file into naive UTC."""
+    if text is None:
+        return None
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+class IntervalSet:
+    """
+    Disjoint half-open intervals [start, end) kept merged and sorted.
+    
+    Membership tests are a single bisect. Works with any ordered values
+    (datetimes, minute numbers).
+    """
+    
+    def __init__(self, intervals=()):
+        """
+        Initialize the set.
+        
+        Args:
+            intervals: (start, end) pairs; overlapping or touching ones are merged
+        """
+        self._starts = []
+        self._ends = []
+        for start, end in sorted(intervals):
+            if start >= end:
+                continue
+            if self._ends and start <= self._ends[-1]:
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+    
+    def __len__(self) -> int:
+        return len(self._starts)
+    
+    def interval_at(self, point) -> Optional[Tuple]:
+        """Get the interval containing a point, or None."""
+        index = bisect.bisect_right(self._starts, point) - 1
+        if index >= 0 and point < self._ends[index]:
+            return self._starts[index], self._ends[index]
+        return None
+    
+    def __contains__(self, point) -> bool:
+        return self.interval_at(point) is not None
+
+
+class RainDelay:
+    """Suspends scheduled runs from start until end (UTC)."""
+    
+    def __init__(self, suspension_id: int, start: datetime, end: datetime):
+        """
+        Initialize a rain delay.
+        
+        Args:
+            suspension_id: Identifier used to cancel it
+            start: UTC time the delay begins
+            end: UTC time scheduled runs resume
+        """
+        self.id = suspension_id
+        self.start = start
+        self.end = end
+    
+    @property
+    def expires_at(self) -> datetime:
+        """UTC time after which the delay no longer matters."""
+        return self.end
+    
+    def is_active(self, utc_minute: datetime, week_minute: int) -> bool:
+        """Check whether the delay covers a time."""
+        return self.start <= utc_minute < self.end
+    
+    def to_dict(self) -> Dict:
+        """Convert rain delay to dictionary."""
+        return {
+            'id': self.id,
+            'type': SUSPENSION_RAIN_DELAY,
+            'start': _format_utc(self.start),
+            'end': _format_utc(self.end)
+        }
+
+
+class Blackout:
+    """Suspends scheduled runs every day (or on some weekdays) between two local times."""
+    
+    def __init__(self, suspension_id: int, start_time: str, end_time: str, days: Optional[List[int]] = None,
+                 expires_at: Optional[datetime] = None):
+        """
+        Initialize a blackout window.
+        
+        Args:
+            suspension_id: Identifier used to cancel it
+            start_time: Local time the window opens, "HH:MM"
+            end_time: Local time the window closes, "HH:MM" (earlier than start_time = next day)
+            days: Weekdays the window opens on (0=Monday, None = every day)
+            expires_at: UTC time the window stops applying (None = never)
+        """
+        self.id = suspension_id
+        self.start_time = datetime.strptime(start_time, "%H:%M").time()
+        self.end_time = datetime.strptime(end_time, "%H:%M").time()
+        if self.start_time == self.end_time:
+            raise ValueError("A blackout window must not start and end at the same time")
+        self.days = days
+        self.expires_at = expires_at
+    
+    def week_intervals(self) -> List[Tuple[int, int]]:
+        """Get the minute-of-week intervals the window covers (split at the week boundary)."""
+        start = self.start_time.hour * 60 + self.start_time.minute
+        end = self.end_time.hour * 60 + self.end_time.minute
+        if end <= start:
+            end += MINUTES_PER_DAY
+        intervals = []
+        for day in (self.days if self.days is not None else range(7)):
+            first = day * MINUTES_PER_DAY + start
+            last = day * MINUTES_PER_DAY + end
+            intervals.append((first, min(last, MINUTES_PER_WEEK)))
+            if last > MINUTES_PER_WEEK:
+                intervals.append((0, last - MINUTES_PER_WEEK))
+        return intervals
+    
+    def is_active(self, utc_minute: datetime, week_minute: int) -> bool:
+        """Check whether the window covers a time (given as its local minute-of-week)."""
+        return week_minute in IntervalSet(self.week_intervals())
+    
+    def to_dict(self) -> Dict:
+        """Convert blackout window to dictionary."""
+        return {
+            'id': self.id,
+            'type': SUSPENSION_BLACKOUT,
+            'start_time': self.start_time.strftime("%H:%M"),
+            'end_time': self.end_time.strftime("%H:%M"),
+            'days': self.days,
+            'expires_at': _format_utc(self.expires_at)
+        }
+
+
+def suspension_from_dict(data: Dict):
+    """Create a RainDelay or Blackout from its dictionary form."""
+    if data['type'] == SUSPENSION_RAIN_DELAY:
+        return RainDelay(data['id'], _parse_utc(data['start']), _parse_utc(data['end']))
+    if data['type'] == SUSPENSION_BLACKOUT:
+        return Blackout(data['id'], data['start_time'], data['end_time'], data.get('days'),
+                        _parse_utc(data.get('expires_at')))
+    raise ValueError(f"Unknown suspension type '{data['type']}'")
+
+
+class SuspensionSet:
+    """
+    All rain delays and blackout windows, compiled for O(log n) lookups.
+    
+    Rain delays are merged into one interval set over UTC time and blackouts
+    into one over local minute-of-week, so checking a minute costs two
+    bisects however many windows exist. Expired windows are pruned lazily.
+    """
+    
+    def __init__(self, suspensions: Optional[List] = None):
+        """
+        Initialize the set.
+        
+        Args:
+            suspensions: RainDelay and Blackout objects
+        """
+        self.suspensions = list(suspensions or [])
+        self._compile()
+    
+    def _compile(self):
+        """Rebuild the interval sets after a change."""
+        self._rain_delays = IntervalSet(
+            (item.start, item.end) for item in self.suspensions if isinstance(item, RainDelay)
+        )
+        self._blackouts = IntervalSet(
+            interval for item in self.suspensions if isinstance(item, Blackout) for interval in item.week_intervals()
+        )
+        expiries = [item.expires_at for item in self.suspensions if item.expires_at is not None]
+        self._next_expiry = min(expiries) if expiries else None
+    
+    def next_id(self) -> int:
+        """Get an unused identifier for a new window."""
+        return max((item.id for item in self.suspensions), default=0) + 1
+    
+    def add(self, suspension):
+        """Add a rain delay or blackout window."""
+        self.suspensions.append(suspension)
+        self._compile()
+    
+    def remove(self, suspension_id: int) -> bool:
+        """Remove a window by id; returns False if there is none."""
+        remaining = [item for item in self.suspensions if item.id != suspension_id]
+        if len(remaining) == len(self.suspensions):
+            return False
+        self.suspensions = remaining
+        self._compile()
+        return True
+    
+    def expire(self, now: datetime) -> List:
+        """
+        Drop windows whose expiry has passed.
+        
+        Args:
+            now: Current UTC time
+        
+        Returns:
+            The windows removed (usually none; checking costs one comparison)
+        """
+        if self._next_expiry is None or now < self._next_expiry:
+            return []
+        expired = [item for item in self.suspensions if item.expires_at is not None and item.expires_at <= now]
+        self.suspensions = [item for item in self.suspensions if item not in expired]
+        self._compile()
+        return expired
+    
+    def reason(self, utc_minute: datetime, week_minute: int) -> Optional[str]:
+        """
+        Get why scheduled runs are suspended at a minute, or None if they are not.
+        
+        Args:
+            utc_minute: UTC time being checked
+            week_minute: Local minute-of-week of the same time
+        """
+        if utc_minute in self._rain_delays:
+            return SUSPENSION_RAIN_DELAY
+        if week_minute in self._blackouts:
+            return SUSPENSION_BLACKOUT
+        return None
+    
+    def to_list(self) -> List[Dict]:
+        """Convert every window to dictionaries."""
+        return [item.to_dict() for item in self.suspensions]
+    
+    @classmethod
+    def from_list(cls, data: List[Dict]) -> "SuspensionSet":
+        """Create a set from its list-of-dictionaries form."""
+        return cls([suspension_from_dict(item) for item in data])
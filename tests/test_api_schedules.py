@@ -0,0 +1,84 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api_server
+from async_controller import AsyncSprinklerController
+from gpio_backend import SimulatedGPIOBackend
+
+WEEKLY = {"days": [0], "start_time": "06:00", "duration_minutes": 10}
+EVENING = {"days": [2], "start_time": "19:00", "duration_minutes": 5}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    schedule_file = tmp_path / "schedule.json"
+    schedule_file.write_text(json.dumps({
+        "zones": [
+            {"name": "Front", "gpio_pin": 17, "schedules": [WEEKLY]},
+            {"name": "Back", "gpio_pin": 27, "schedules": [WEEKLY, EVENING]}
+        ]
+    }))
+    monkeypatch.setattr(api_server, "controller", AsyncSprinklerController(str(schedule_file), gpio=SimulatedGPIOBackend()))
+    yield TestClient(api_server.app)
+    api_server.controller.cleanup()
+
+
+def test_deleting_the_only_schedule_is_rejected(client):
+    response = client.delete("/zones/Front/schedules/0")
+    assert response.status_code == 400
+    assert client.get("/zones/Front").json()["schedules"] == [{**WEEKLY, "enabled": True}]
+
+
+def test_deleting_one_of_several_schedules(client):
+    assert client.delete("/zones/Back/schedules/0").status_code == 200
+    assert client.get("/zones/Back").json()["schedule"]["start_time"] == "19:00"
+
+
+def test_replacing_the_first_schedule_keeps_the_others(client):
+    # What the dashboard's edit form sends: the edited schedule, then the rest as returned
+    zone = client.get("/zones/Back").json()
+    edited = {"days": [1], "start_time": "07:00", "duration_minutes": 20, "enabled": True}
+    response = client.put("/zones/Back/schedule", json={"schedules": [edited] + zone["schedules"][1:]})
+    assert response.status_code == 200
+    assert client.get("/zones/Back").json()["schedules"] == [edited, {**EVENING, "enabled": True}]
+
+
+def test_weekdays_outside_the_week_are_rejected(client):
+    schedule = {**WEEKLY, "days": [9]}
+    response = client.post("/zones", json={"name": "Side", "gpio_pin": 22, "schedule": schedule})
+    assert response.status_code == 422
+    assert [zone["name"] for zone in client.get("/zones").json()] == ["Front", "Back"]
+
+
+def test_cron_that_never_matches_is_rejected(client):
+    schedule = {"cron": "0 6 31 2 *", "duration_minutes": 10}
+    response = client.post("/zones/Front/schedules", json=schedule)
+    assert response.status_code == 422
+    assert client.get("/zones/Front").json()["schedules"] == [{**WEEKLY, "enabled": True}]
+
+
+def test_program_names_are_accepted_by_the_week_views(client):
+    program = {"name": "Morning", "steps": [{"zone": "Front", "duration_minutes": 5}],
+               "schedules": [{"days": [3], "start_time": "05:00"}]}
+    assert client.post("/programs", json=program).status_code == 201
+    
+    week = client.get("/schedule/week", params={"zone": "Morning"})
+    assert week.status_code == 200
+    assert [(run["zone"], run["program"]) for run in week.json()["runs"]] == [("Front", "Morning")]
+    assert client.get("/schedule/week", params={"zone": "Morning", "day": 3}).json()["count"] == 1
+    assert client.get("/schedule/conflicts", params={"zone": "Morning"}).status_code == 200
+    assert client.get("/schedule/conflicts", params={"zone": "Nowhere"}).status_code == 404
+
+
+def test_updating_a_program_reports_new_conflicts(client):
+    program = {"name": "Morning", "steps": [{"zone": "Front", "duration_minutes": 5}],
+               "schedules": [{"days": [3], "start_time": "05:00"}]}
+    assert client.post("/programs", json=program).json()["warnings"] == []
+    
+    # Now it waters Front while Back's Wednesday evening schedule runs
+    program["schedules"] = [{"days": [2], "start_time": "19:00"}]
+    response = client.put("/programs/Morning", json={"steps": program["steps"], "schedules": program["schedules"]})
+    assert response.status_code == 200
+    assert [warning["zones"] for warning in response.json()["warnings"]] == [["Back", "Front"]]
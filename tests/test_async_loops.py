@@ -0,0 +1,115 @@
+import asyncio
+
+import api_server
+import async_controller
+import run_manager
+from async_controller import AsyncSprinklerController
+from gpio_backend import SimulatedGPIOBackend
+from run_manager import RunManager, RUN_DONE
+
+
+class FakeZone:
+    def __init__(self, name):
+        self.name = name
+        self.flow_rate = 0.0
+
+
+def test_scheduler_task_survives_a_failed_check(tmp_path, monkeypatch):
+    monkeypatch.setattr(async_controller, "CHECK_RETRY_SECONDS", 0.01)
+    
+    async def scenario():
+        controller = AsyncSprinklerController(str(tmp_path / "schedule.json"), gpio=SimulatedGPIOBackend())
+        checks = []
+        
+        def check_and_run(now=None):
+            checks.append(now)
+            if len(checks) == 1:
+                raise RuntimeError("I2C bus error")
+        
+        controller.check_and_run = check_and_run
+        await controller.start()
+        await asyncio.sleep(0.1)
+        scheduler = controller._tasks[1]
+        assert not scheduler.done()
+        assert len(checks) >= 2
+        await controller.stop()
+    
+    asyncio.run(scenario())
+
+
+def test_run_manager_task_survives_a_failed_switch(monkeypatch):
+    monkeypatch.setattr(run_manager, "POLL_RETRY_SECONDS", 0.01)
+    
+    async def scenario():
+        switched = []
+        
+        def switch_zones(on, off):
+            if off and not switched:
+                switched.append("failed")
+                raise RuntimeError("I2C bus error")
+            switched.append(([zone.name for zone in on], [zone.name for zone in off]))
+        
+        manager = RunManager(switch_zones)
+        task = asyncio.create_task(manager.run_async())
+        first = manager.start_run(FakeZone("A"), 0.05)
+        await asyncio.sleep(0.2)
+        assert first.done.is_set()
+        assert not task.done()
+        second = manager.start_run(FakeZone("B"), 0.05)
+        await asyncio.sleep(0.2)
+        assert second.done.is_set()
+        assert switched[-1] == ([], ["B"])
+        manager.shutdown()
+        await asyncio.wait_for(task, timeout=1)
+    
+    asyncio.run(scenario())
+
+
+def test_run_zone_waits_for_the_run_to_finish(tmp_path):
+    async def scenario():
+        gpio = SimulatedGPIOBackend()
+        controller = AsyncSprinklerController(str(tmp_path / "schedule.json"), gpio=gpio)
+        await controller.start()
+        zone = controller.zones[0]
+        run = await asyncio.wait_for(controller.run_zone(zone, 0.2 / 60), timeout=2)
+        assert run.state == RUN_DONE
+        assert not gpio.is_on(zone.gpio_pin)
+        # Refused like start_run when the zone already runs at equal priority
+        controller.start_run(zone, 10)
+        assert await controller.run_zone(zone, 0.2 / 60) is None
+        await controller.stop()
+    
+    asyncio.run(scenario())
+
+
+def test_cancelling_run_zone_stops_the_zone(tmp_path):
+    async def scenario():
+        gpio = SimulatedGPIOBackend()
+        controller = AsyncSprinklerController(str(tmp_path / "schedule.json"), gpio=gpio)
+        await controller.start()
+        zone = controller.zones[0]
+        waiting = asyncio.create_task(controller.run_zone(zone, 10))
+        await asyncio.sleep(0.05)
+        assert gpio.is_on(zone.gpio_pin)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert not controller.run_manager.is_running(zone.name)
+        assert not gpio.is_on(zone.gpio_pin)
+        await controller.stop()
+    
+    asyncio.run(scenario())
+
+
+def test_run_endpoint_can_wait_for_the_run(tmp_path, monkeypatch):
+    async def scenario():
+        controller = AsyncSprinklerController(str(tmp_path / "schedule.json"), gpio=SimulatedGPIOBackend())
+        monkeypatch.setattr(api_server, "controller", controller)
+        await controller.start()
+        zone = controller.zones[0]
+        params = api_server.ManualRunModel(duration_seconds=1, wait=True)
+        response = await asyncio.wait_for(api_server.run_zone_manually(zone.name, params), timeout=3)
+        assert response["state"] == RUN_DONE
+        assert response["message"] == f"Zone '{zone.name}' finished"
+        await controller.stop()
+    
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+from datetime import date, datetime
+
+import pytest
+
+from cron import CronExpression
+
+
+def test_stepped_day_of_month_does_not_repeat_weekly():
+    expression = CronExpression("0 6 */3 * *")
+    assert expression.dom_restricted
+    assert not expression.repeats_weekly()
+    assert expression.matches_date(date(2026, 3, 1))
+    assert not expression.matches_date(date(2026, 3, 2))
+
+
+def test_full_day_of_month_range_repeats_weekly():
+    expression = CronExpression("0 6 1-31 * *")
+    assert not expression.dom_restricted
+    assert expression.repeats_weekly()
+
+
+def test_wildcard_day_of_month_repeats_weekly():
+    expression = CronExpression("0 6 * * MON")
+    assert not expression.dom_restricted
+    assert expression.repeats_weekly()
+    assert expression.matches_date(date(2026, 3, 2))
+    assert not expression.matches_date(date(2026, 3, 3))
+
+
+@pytest.mark.parametrize("expression", ["0 6 31 2 *", "0 6 30,31 FEB *", "0 6 31 4,6,9,11 *"])
+def test_expression_with_no_possible_day_is_rejected(expression):
+    with pytest.raises(ValueError, match="never matches"):
+        CronExpression(expression)
+
+
+@pytest.mark.parametrize("expression", ["0 6 29 2 *", "0 6 31 2 MON", "0 6 31 1-2 *"])
+def test_expression_with_a_rare_day_is_accepted(expression):
+    assert CronExpression(expression).next_match(datetime(2026, 1, 1)) is not None
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from gpio_backend import create_backend
+from sprinkler_controller import PinError, SprinklerController
+
+
+@pytest.mark.parametrize("backend", ["mcp23017", "74hc595"])
+def test_default_zones_fit_a_single_expander(tmp_path, backend):
+    schedule_file = tmp_path / "schedule.json"
+    gpio = create_backend(backend, chips=1, bus="simulated")
+    controller = SprinklerController(str(schedule_file), gpio=gpio)
+    try:
+        assert [zone.gpio_pin for zone in controller.zones] == [0, 1]
+        assert controller._pins == {0, 1}
+        saved = json.loads(schedule_file.read_text())
+        assert [zone["gpio_pin"] for zone in saved["zones"]] == [0, 1]
+    finally:
+        controller.cleanup()
+
+
+def test_file_pins_missing_from_the_backend_are_reported(tmp_path):
+    schedule_file = tmp_path / "schedule.json"
+    text = json.dumps({"zones": [
+        {"name": "Front", "gpio_pin": 17,
+         "schedule": {"days": [0], "start_time": "06:00", "duration_minutes": 10}}
+    ]})
+    schedule_file.write_text(text)
+    gpio = create_backend("mcp23017", chips=1, bus="simulated")
+    with pytest.raises(PinError, match="GPIO pin 17 of zone 'Front' does not exist"):
+        SprinklerController(str(schedule_file), gpio=gpio)
+    assert schedule_file.read_text() == text
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api_server
+from async_controller import AsyncSprinklerController
+from gpio_backend import SimulatedGPIOBackend, create_backend
+from sprinkler_controller import PinError, SprinklerController
+
+
+@pytest.fixture
+def controller(tmp_path):
+    gpio = create_backend("mcp23017", chips=1, bus="simulated")
+    controller = SprinklerController(str(tmp_path / "schedule.json"), gpio=gpio)
+    yield controller
+    controller.cleanup()
+
+
+@pytest.mark.parametrize("pin, message", [
+    (16, "GPIO pin 16 of zone 'Side' does not exist \\(pins 0-15 are available\\)"),
+    (-1, "GPIO pin -1 of zone 'Side' does not exist"),
+    (1, "GPIO pin 1 is used by both zone 'Back Yard' and zone 'Side'"),
+])
+def test_add_zone_checks_its_pin(controller, pin, message):
+    with pytest.raises(PinError, match=message):
+        controller.add_zone("Side", pin, days=[0], start_time="06:00", duration_minutes=10)
+    assert [zone.name for zone in controller.zones] == ["Front Yard", "Back Yard"]
+    assert controller._pins == {0, 1}
+
+
+@pytest.mark.parametrize("pin, message", [
+    (16, "GPIO pin 16 of the master valve does not exist"),
+    (0, "GPIO pin 0 is used by both zone 'Front Yard' and the master valve"),
+])
+def test_set_master_valve_checks_its_pin(controller, pin, message):
+    with pytest.raises(PinError, match=message):
+        controller.set_master_valve(pin)
+    assert controller.master_valve is None
+    assert controller._pins == {0, 1}
+
+
+@pytest.mark.parametrize("gpio_pin, number", [(5, 5), ({"chip": 0, "pin": 9}, 9), ("0.15", 15)])
+def test_resolve_pin_accepts_chip_addresses(controller, gpio_pin, number):
+    assert controller.resolve_pin(gpio_pin) == number
+
+
+@pytest.mark.parametrize("gpio_pin, message", [
+    ({"chip": 1, "pin": 0}, "There is no pin 0 on MCP23017 chip 1"),
+    ("0.16", "There is no pin 16 on MCP23017 chip 0"),
+    ("chip 0", "Invalid GPIO pin"),
+    ({"chip": "0", "pin": 1}, "Invalid GPIO pin"),
+])
+def test_resolve_pin_rejects_bad_addresses(controller, gpio_pin, message):
+    with pytest.raises(PinError, match=message):
+        controller.resolve_pin(gpio_pin)
+
+
+def test_chip_addresses_need_an_expander(tmp_path):
+    controller = SprinklerController(str(tmp_path / "schedule.json"), gpio=SimulatedGPIOBackend())
+    with pytest.raises(PinError, match="no expander chips"):
+        controller.resolve_pin("0.1")
+    controller.cleanup()
+
+
+def test_schedule_file_accepts_chip_addresses(tmp_path):
+    schedule_file = tmp_path / "schedule.json"
+    schedule = {"days": [0], "start_time": "06:00", "duration_minutes": 10}
+    schedule_file.write_text(json.dumps({
+        "master_valve": {"gpio_pin": "1.15"},
+        "zones": [
+            {"name": "Front", "gpio_pin": {"chip": 0, "pin": 3}, "schedule": schedule},
+            {"name": "Back", "gpio_pin": "1.2", "schedule": schedule}
+        ]
+    }))
+    gpio = create_backend("mcp23017", chips=2, bus="simulated")
+    controller = SprinklerController(str(schedule_file), gpio=gpio)
+    assert [zone.gpio_pin for zone in controller.zones] == [3, 18]
+    assert controller.master_valve.gpio_pin == 31
+    controller.cleanup()
+
+
+def test_api_accepts_chip_addresses(tmp_path, monkeypatch):
+    gpio = create_backend("74hc595", chips=2, bus="simulated")
+    monkeypatch.setattr(api_server, "controller", AsyncSprinklerController(str(tmp_path / "schedule.json"), gpio=gpio))
+    client = TestClient(api_server.app)
+    schedule = {"days": [0], "start_time": "06:00", "duration_minutes": 10}
+    
+    response = client.post("/zones", json={"name": "Side", "gpio_pin": {"chip": 1, "pin": 4}, "schedule": schedule})
+    assert response.status_code == 201
+    assert client.get("/zones/Side").json()["gpio_pin"] == 12
+    response = client.post("/zones", json={"name": "Bed", "gpio_pin": "1.4", "schedule": schedule})
+    assert response.status_code == 409
+    response = client.post("/zones", json={"name": "Bed", "gpio_pin": "2.0", "schedule": schedule})
+    assert response.status_code == 400
+    response = client.put("/master-valve", json={"gpio_pin": "1.7"})
+    assert response.json()["gpio_pin"] == 15
+    api_server.controller.cleanup()
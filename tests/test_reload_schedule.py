@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from gpio_backend import create_backend
+from sprinkler_controller import SprinklerController
+
+
+@pytest.fixture
+def controller(tmp_path):
+    schedule_file = tmp_path / "schedule.json"
+    schedule_file.write_text(json.dumps({
+        "master_valve": {"gpio_pin": 5},
+        "zones": [
+            {"name": "Front", "gpio_pin": 3,
+             "schedule": {"days": [0], "start_time": "06:00", "duration_minutes": 10}},
+            {"name": "Back", "gpio_pin": 4,
+             "schedule": {"days": [1], "start_time": "06:00", "duration_minutes": 10}}
+        ]
+    }))
+    gpio = create_backend("mcp23017", chips=1, bus="simulated")
+    controller = SprinklerController(str(schedule_file), gpio=gpio)
+    yield controller
+    controller.cleanup()
+
+
+@pytest.mark.parametrize("zone_pins, master_pin, message", [
+    ([3, 40], 5, "GPIO pin 40 of zone 'Back' does not exist"),
+    ([3, 3], 5, "GPIO pin 3 is used by both zone 'Front' and zone 'Back'"),
+    ([3, 4], 4, "GPIO pin 4 is used by both zone 'Back' and the master valve"),
+])
+def test_failed_reload_leaves_zones_and_pins_alone(controller, zone_pins, master_pin, message):
+    zones = list(controller.zones)
+    pins = set(controller._pins)
+    assert pins == {3, 4, 5}
+    
+    with open(controller.schedule_file) as f:
+        data = json.load(f)
+    for zone, pin in zip(data["zones"], zone_pins):
+        zone["gpio_pin"] = pin
+    data["master_valve"]["gpio_pin"] = master_pin
+    data["zones"].append({"name": "Side", "gpio_pin": 6,
+                          "schedule": {"days": [2], "start_time": "06:00", "duration_minutes": 10}})
+    with open(controller.schedule_file, "w") as f:
+        json.dump(data, f)
+    
+    with pytest.raises(ValueError, match=message):
+        controller.reload_schedule()
+    assert controller.zones == zones
+    assert [zone.gpio_pin for zone in controller.zones] == [3, 4]
+    assert controller.master_valve.gpio_pin == 5
+    assert controller._pins == pins
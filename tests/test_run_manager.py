@@ -0,0 +1,69 @@
+from run_manager import (RunManager, PRIORITY_MANUAL, PRIORITY_SCHEDULED, RUN_PREEMPTED, RUN_QUEUED,
+                         RUN_RUNNING, RUN_SOAKING)
+
+
+class FakeZone:
+    def __init__(self, name):
+        self.name = name
+        self.flow_rate = 0.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+def make_manager(**limits):
+    clock = FakeClock()
+    manager = RunManager(lambda on, off: None, clock=clock, **limits)
+    return manager, clock
+
+
+def test_displaced_queued_run_is_queued_once():
+    manager, clock = make_manager(max_concurrent=1)
+    manager.start_run(FakeZone("Front"), 60, PRIORITY_MANUAL)
+    back = FakeZone("Back")
+    scheduled = manager.start_run(back, 60, PRIORITY_SCHEDULED)
+    assert scheduled.state == RUN_QUEUED
+    
+    manual = manager.start_run(back, 30, PRIORITY_MANUAL)
+    manager.start_run(FakeZone("Side"), 60, PRIORITY_MANUAL)
+    assert scheduled.state == RUN_PREEMPTED
+    assert [run['zone'] for run in manager.queued_runs()] == ["Back", "Side"]
+    
+    clock.now += 60
+    manager.poll()
+    assert manual.state == RUN_RUNNING
+    clock.now += 30
+    manager.poll()
+    # The scheduled run is back in line, waiting for Side
+    assert scheduled.state == RUN_QUEUED
+    assert [run['zone'] for run in manager.queued_runs()] == ["Back"]
+    
+    clock.now += 60
+    manager.poll()
+    assert scheduled.state == RUN_RUNNING
+    assert manager.queued_runs() == []
+
+
+def test_zone_preempted_mid_soak_keeps_its_soak_deadline():
+    manager, clock = make_manager()
+    zone = FakeZone("Front")
+    scheduled = manager.start_run(zone, 120, PRIORITY_SCHEDULED, cycle_seconds=60, soak_seconds=300)
+    clock.now += 60
+    manager.poll()
+    assert scheduled.state == RUN_SOAKING
+    soak_ends_at = scheduled.resumes_at
+    
+    manager.start_run(zone, 10, PRIORITY_MANUAL)
+    clock.now += 10
+    manager.poll()
+    assert scheduled.state == RUN_SOAKING
+    assert scheduled.resumes_at == soak_ends_at
+    
+    clock.now = soak_ends_at
+    manager.poll()
+    assert scheduled.state == RUN_RUNNING
@@ -0,0 +1,34 @@
+import json
+from datetime import datetime, timedelta
+
+from simulator import SimulatedController
+
+# Sunday, so the week boundary comes up on the first night
+START = datetime(2026, 3, 1, 0, 0)
+
+
+def test_upcoming_runs_match_what_the_scheduler_fires(tmp_path):
+    schedule_file = tmp_path / "schedule.json"
+    schedule_file.write_text(json.dumps({
+        "timezone": "UTC",
+        "zones": [
+            # First and last weekday, at the first and last second of the week
+            {"name": "Late", "gpio_pin": 17,
+             "schedules": [{"days": [6], "start_time": "23:59:30", "duration_seconds": 20}]},
+            {"name": "Early", "gpio_pin": 27,
+             "schedules": [{"days": [0], "start_time": "00:00", "duration_seconds": 20}]},
+            {"name": "Odd", "gpio_pin": 22,
+             "schedules": [{"type": "odd", "start_time": "06:00", "duration_minutes": 1}]},
+            {"name": "Cron", "gpio_pin": 23,
+             "schedules": [{"cron": "30 5 */3 * SUN", "duration_minutes": 1}]}
+        ]
+    }))
+    controller = SimulatedController(str(schedule_file), START)
+    upcoming = [(run['zone'], run['start']) for run in controller.upcoming_runs(hours=24 * 15)]
+    # upcoming_runs() leaves out a run starting exactly at the end of the window
+    controller.run_until(START + timedelta(days=15, seconds=-1))
+    fired = [(run['zone'], run['start']) for run in controller.timeline]
+    
+    assert upcoming == fired
+    assert ("Late", datetime(2026, 3, 1, 23, 59, 30)) in fired
+    assert ("Early", datetime(2026, 3, 2, 0, 0)) in fired
@@ -0,0 +1,37 @@
+import pytest
+
+from sprinkler_controller import Program, ProgramStep, ScheduleOwner, SprinklerSchedule
+from week_timeline import SECONDS_PER_WEEK, WeekTimeline
+
+
+def test_schedule_rejects_weekdays_outside_the_week():
+    with pytest.raises(ValueError, match="Invalid weekday 9"):
+        SprinklerSchedule([0, 9], "06:00", 10)
+
+
+def test_set_runs_rejects_starts_outside_the_week():
+    timeline = WeekTimeline()
+    schedule = SprinklerSchedule([0], "06:00", 10)
+    timeline.set_runs("Front", [(6 * 3600, 600, schedule, "Front", 0)])
+    with pytest.raises(ValueError, match="outside the week"):
+        timeline.set_runs("Front", [(SECONDS_PER_WEEK + 6 * 3600, 600, schedule, "Front", 0)])
+    assert [run.start for run in timeline.owner_runs("Front")] == [6 * 3600]
+
+
+def test_program_steps_after_sunday_midnight_start_the_week():
+    schedule = SprinklerSchedule([6], "23:50", 20)
+    program = Program("Night", [ProgramStep("Front", 10), ProgramStep("Back", 10)], [schedule])
+    timeline = WeekTimeline()
+    timeline.set_runs(program.name, program.timeline_entries())
+    assert [(run.zone_name, run.start, run.end) for run in timeline.runs()] == [
+        ("Back", 0, 600),
+        ("Front", SECONDS_PER_WEEK - 600, SECONDS_PER_WEEK)
+    ]
+
+
+def test_schedule_owner_subclasses_must_lay_out_their_runs():
+    class Bare(ScheduleOwner):
+        pass
+    
+    with pytest.raises(TypeError):
+        Bare()
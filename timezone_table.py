@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Timezone Transition Table for Sprinkler Controller
+Precomputes a zone's UTC offset changes so the scheduler converts times with a bisect.
+"""
+
+import bisect
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    ZoneInfo = None
+
+logger = logging.getLogger(__name__)
+
+# Local times skipped by a spring-forward change
+NONEXISTENT_SHIFT = "shift"      # run when the gap ends (e.g. 02:30 runs at 03:00)
+NONEXISTENT_SKIP = "skip"        # don't run that day
+NONEXISTENT_POLICIES = (NONEXISTENT_SHIFT, NONEXISTENT_SKIP)
+
+# Local times repeated by a fall-back change
+AMBIGUOUS_FIRST = "first"        # run on the first occurrence only
+AMBIGUOUS_SECOND = "second"      # run on the second occurrence only
+AMBIGUOUS_POLICIES = (AMBIGUOUS_FIRST, AMBIGUOUS_SECOND)
+
+ONE_MINUTE = timedelta(minutes=1)
+# Offsets never change twice within this window, so it brackets any local time
+TRANSITION_MARGIN = timedelta(days=1)
+
+
+class TransitionTable:
+    """
+    UTC offset changes of one timezone, precomputed a calendar year at a time.
+    
+    All times are naive datetimes: UTC instants on one side and local wall
+    time on the other. Each year is built once (about 400 tz lookups) the
+    first time it is needed; after that every conversion is a bisect.
+    """
+    
+    def __init__(self, name: Optional[str] = None):
+        """
+        Initialize the table.
+        
+        Args:
+            name: IANA timezone name, e.g. "America/Chicago" (None = system local time)
+        
+        Raises:
+            ValueError: If the timezone is unknown
+        """
+        self.name = name
+        self._tz = None
+        if name is not None:
+            if ZoneInfo is None:
+                raise ValueError("Named timezones need Python 3.9+ (zoneinfo)")
+            try:
+                self._tz = ZoneInfo(name)
+            except Exception:
+                raise ValueError(f"Unknown timezone '{name}'")
+        self._instants: List[datetime] = []
+        self._offsets: List[timedelta] = []
+        self._first_year: Optional[int] = None
+        self._last_year: Optional[int] = None
+    
+    def _offset_from_tz(self, utc: datetime) -> timedelta:
+        """Ask the timezone database for the offset at a UTC instant (table building only)."""
+        aware = utc.replace(tzinfo=timezone.utc)
+        if self._tz is not None:
+            return aware.astimezone(self._tz).utcoffset()
+        return aware.astimezone().utcoffset()
+    
+    def _find_transition(self, low: datetime, high: datetime) -> datetime:
+        """Binary-search the first second in (low, high] with high's offset."""
+        target = self._offset_from_tz(high)
+        while high - low > timedelta(seconds=1):
+            middle = low + (high - low) / 2
+            middle = middle.replace(microsecond=0)
+            if self._offset_from_tz(middle) == target:
+                high = middle
+            else:
+                low = middle
+        return high
+    
+    def _build_years(self, first_year: int, last_year: int):
+        """Scan a range of years day by day and record every offset change."""
+        start = datetime(first_year, 1, 1)
+        end = datetime(last_year + 1, 1, 1)
+        instants = []
+        offsets = []
+        previous = start
+        previous_offset = self._offset_from_tz(start)
+        moment = start + timedelta(days=1)
+        while moment <= end:
+            offset = self._offset_from_tz(moment)
+            if offset != previous_offset:
+                instants.append(self._find_transition(previous, moment))
+                offsets.append(offset)
+            previous, previous_offset = moment, offset
+            moment += timedelta(days=1)
+        return instants, offsets, self._offset_from_tz(start)
+    
+    def ensure_year(self, year: int):
+        """Precompute transitions for every year from the current span up to year."""
+        if self._first_year is not None and self._first_year <= year <= self._last_year:
+            return
+        if self._first_year is None:
+            first, last = year, year
+        else:
+            first, last = min(year, self._first_year), max(year, self._last_year)
+        instants, offsets, base = self._build_years(first, last)
+        self._instants = instants
+        self._offsets = [base] + offsets
+        self._first_year, self._last_year = first, last
+        logger.debug(f"Timezone table for {self.name or 'local time'} covers {first}-{last}: {len(instants)} transitions")
+    
+    def offset_at(self, utc: datetime) -> timedelta:
+        """Get the UTC offset in effect at a UTC instant."""
+        self.ensure_year(utc.year)
+        return self._offsets[bisect.bisect_right(self._instants, utc)]
+    
+    def to_local(self, utc: datetime) -> datetime:
+        """Convert a naive UTC instant to naive local wall time."""
+        return utc + self.offset_at(utc)
+    
+    def near_transition(self, utc: datetime) -> bool:
+        """Check whether an offset change happens within a day of a UTC instant."""
+        self.ensure_year(utc.year)
+        index = bisect.bisect_left(self._instants, utc - TRANSITION_MARGIN)
+        return index < len(self._instants) and self._instants[index] <= utc + TRANSITION_MARGIN
+    
+    def candidates(self, local: datetime) -> List[datetime]:
+        """
+        Get every UTC instant whose local wall time is local, earliest first.
+        
+        Returns:
+            One instant normally, none for a skipped time, two for a repeated one
+        """
+        before = self.offset_at(local - TRANSITION_MARGIN)
+        after = self.offset_at(local + TRANSITION_MARGIN)
+        instants = []
+        for offset in sorted({before, after}, reverse=True):
+            utc = local - offset
+            if self.offset_at(utc) == offset:
+                instants.append(utc)
+        return instants
+    
+    def to_utc(self, local: datetime, nonexistent: str = NONEXISTENT_SHIFT,
+               ambiguous: str = AMBIGUOUS_FIRST) -> Optional[datetime]:
+        """
+        Convert naive local wall time to a naive UTC instant.
+        
+        Args:
+            local: Local wall time
+            nonexistent: Policy for times skipped by a spring-forward change
+            ambiguous: Policy for times repeated by a fall-back change
+        
+        Returns:
+            The UTC instant, or None if the time is skipped and the policy is "skip"
+        """
+        instants = self.candidates(local)
+        if len(instants) == 1:
+            return instants[0]
+        if len(instants) == 2:
+            return instants[0] if ambiguous == AMBIGUOUS_FIRST else instants[1]
+        if nonexistent == NONEXISTENT_SKIP:
+            return None
+        # The gap ends at the transition instant
+        index = bisect.bisect_right(self._instants, local - self.offset_at(local + TRANSITION_MARGIN))
+        return self._instants[index]
+    
+    def fire_minutes(self, utc_minute: datetime, nonexistent: str = NONEXISTENT_SHIFT,
+                     ambiguous: str = AMBIGUOUS_FIRST) -> List[datetime]:
+        """
+        Get the local minutes whose schedules fire in a UTC minute.
+        
+        Normally this is just the local time of the minute. The minute that
+        ends a spring-forward gap also carries the skipped minutes under the
+        "shift" policy, and a repeated minute fires only on the occurrence
+        the ambiguous policy picks.
+        
+        Args:
+            utc_minute: UTC minute being checked
+            nonexistent: Policy for times skipped by a spring-forward change
+            ambiguous: Policy for times repeated by a fall-back change
+        """
+        local = self.to_local(utc_minute)
+        if not self.near_transition(utc_minute):
+            return [local]
+        minutes = []
+        previous = self.to_local(utc_minute - ONE_MINUTE)
+        if nonexistent == NONEXISTENT_SHIFT:
+            skipped = previous + ONE_MINUTE
+            while skipped < local:
+                minutes.append(skipped)
+                skipped += ONE_MINUTE
+        instants = self.candidates(local)
+        chosen = instants[0] if ambiguous == AMBIGUOUS_FIRST else instants[-1]
+        if chosen == utc_minute:
+            minutes.append(local)
+        return minutes
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Weekly Run Timeline for Sprinkler Controller
+Compiles every zone's schedules into one sorted week of runs, patched a zone at a time.
+"""
+
+import bisect
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+SECONDS_PER_DAY = 24 * 60 * 60
+SECONDS_PER_WEEK = 7 * SECONDS_PER_DAY
+
+
+class TimelineRun:
+    """One planned run (or the part of it after Sunday midnight) on the weekly timeline."""
+    
+    __slots__ = ('owner', 'zone_name', 'schedule', 'start', 'end', 'duration', 'offset', 'continued')
+    
+    def __init__(self, owner: str, zone_name: str, schedule, start: float, end: float, duration: float,
+                 offset: float = 0.0, continued: bool = False):
+        """
+        Initialize a timeline run.
+        
+        Args:
+            owner: Zone or program whose schedule starts the run
+            zone_name: Zone the run waters
+            schedule: Schedule the run comes from
+            start: Second of the week the run starts (0 = Monday 00:00 local)
+            end: Second of the week the run ends (at most SECONDS_PER_WEEK)
+            duration: Length of the whole run in seconds
+            offset: Seconds between the schedule firing and the run starting (program steps)
+            continued: True for the part of a run that wrapped past Sunday midnight
+        """
+        self.owner = owner
+        self.zone_name = zone_name
+        self.schedule = schedule
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.offset = offset
+        self.continued = continued
+    
+    @property
+    def conditional(self) -> bool:
+        """Whether the run depends on the date (interval, odd/even or a date-restricted cron)."""
+        return not self.schedule.repeats_weekly()
+    
+    def __repr__(self) -> str:
+        return f"TimelineRun({self.zone_name!r}, {self.start}-{self.end})"
+
+
+class WeekTimeline:
+    """
+    Every enabled schedule's runs over one local week, kept in start order.
+    
+    Runs are stored in one sorted list for range queries and indexed by
+    owner (the zone or program whose schedule starts them) and by the zone
+    they water. Changing an owner's schedules removes and re-inserts only
+    that owner's runs (a bisect each), so edits never rebuild the week.
+    Runs crossing Sunday midnight are split in two, so every stored run
+    lies within [0, SECONDS_PER_WEEK].
+    """
+    
+    def __init__(self):
+        """Initialize an empty timeline."""
+        self._runs: List[Tuple[float, int, TimelineRun]] = []
+        self._owner_entries: Dict[str, List[Tuple[float, int, TimelineRun]]] = {}
+        self._zone_entries: Dict[str, List[Tuple[float, int, TimelineRun]]] = {}
+        self._counter = itertools.count()
+        # Upper bound on run length, so overlap queries know how far back to look
+        self._longest = 0.0
+    
+    def __len__(self) -> int:
+        return len(self._runs)
+    
+    def set_runs(self, owner: str, entries: List[Tuple[float, float, object, str, float]]):
+        """
+        Replace the runs of a zone or program.
+        
+        Args:
+            owner: Zone or program name
+            entries: (second-of-week start, duration in seconds, schedule, zone watered,
+                seconds after the schedule fires) of each run
+        
+        Raises:
+            ValueError: If a start is outside the week (nothing is changed then)
+        """
+        for start, _, _, _, _ in entries:
+            if not 0 <= start < SECONDS_PER_WEEK:
+                raise ValueError(f"Run start {start} is outside the week (0-{SECONDS_PER_WEEK - 1})")
+        self.remove(owner)
+        added = []
+        for start, duration, schedule, zone_name, offset in entries:
+            end = start + duration
+            pieces = [TimelineRun(owner, zone_name, schedule, start, min(end, SECONDS_PER_WEEK), duration, offset)]
+            if end > SECONDS_PER_WEEK:
+                pieces.append(TimelineRun(owner, zone_name, schedule, 0, end - SECONDS_PER_WEEK, duration, offset,
+                                          continued=True))
+            for run in pieces:
+                entry = (run.start, next(self._counter), run)
+                bisect.insort(self._runs, entry)
+                added.append(entry)
+                bisect.insort(self._zone_entries.setdefault(zone_name, []), entry)
+                self._longest = max(self._longest, run.end - run.start)
+        added.sort()
+        self._owner_entries[owner] = added
+    
+    def remove(self, owner: str):
+        """Remove every run of a zone or program."""
+        for entry in self._owner_entries.pop(owner, []):
+            # Sequence numbers are unique, so (start, seq) finds exactly this entry
+            del self._runs[bisect.bisect_left(self._runs, entry[:2])]
+            zone_entries = self._zone_entries[entry[2].zone_name]
+            del zone_entries[bisect.bisect_left(zone_entries, entry[:2])]
+            if not zone_entries:
+                del self._zone_entries[entry[2].zone_name]
+    
+    def clear(self):
+        """Remove every run."""
+        self._runs = []
+        self._owner_entries = {}
+        self._zone_entries = {}
+        self._longest = 0.0
+    
+    def runs(self) -> List[TimelineRun]:
+        """Get every run in start order."""
+        return [entry[2] for entry in self._runs]
+    
+    def owner_runs(self, owner: str) -> List[TimelineRun]:
+        """Get the runs started by a zone's or program's schedules, in start order."""
+        return [entry[2] for entry in self._owner_entries.get(owner, [])]
+    
+    def zone_runs(self, zone_name: str) -> List[TimelineRun]:
+        """Get every run that waters a zone (including program steps), in start order."""
+        return [entry[2] for entry in self._zone_entries.get(zone_name, [])]
+    
+    def overlapping(self, start: float, end: float, zone_name: Optional[str] = None) -> List[TimelineRun]:
+        """
+        Get the runs that are on at some point in [start, end), in start order.
+        
+        Args:
+            start: First second of the week
+            end: Last second of the week (exclusive)
+            zone_name: Only return runs watering this zone or started by this program
+        """
+        return [
+            entry[2] for entry in self._overlapping_entries(start, end)
+            if zone_name is None or zone_name in (entry[2].zone_name, entry[2].owner)
+        ]
+    
+    def overlaps_of(self, name: str) -> List[TimelineRun]:
+        """
+        Get the runs of a zone or program together with every run overlapping one of them.
+        
+        Args:
+            name: Zone name (runs that water it) or program name (runs it starts)
+        
+        Returns:
+            The runs in start order
+        """
+        found = {}
+        for start, _, run in self._zone_entries.get(name, []) + self._owner_entries.get(name, []):
+            for entry in self._overlapping_entries(start, run.end):
+                found[entry[1]] = entry
+        return [entry[2] for entry in sorted(found.values(), key=lambda entry: entry[:2])]
+    
+    def _overlapping_entries(self, start: float, end: float) -> List[Tuple[float, int, TimelineRun]]:
+        """Get the stored entries of runs that are on at some point in [start, end)."""
+        first = bisect.bisect_left(self._runs, (start - self._longest,))
+        last = bisect.bisect_left(self._runs, (end,))
+        return [entry for entry in self._runs[first:last] if entry[2].end > start]
+    
+    def starting(self, start: float, end: float) -> List[TimelineRun]:
+        """
+        Get the runs that start in [start, end), in start order.
+        
+        Args:
+            start: First second of the week
+            end: Last second of the week (exclusive)
+        """
+        first = bisect.bisect_left(self._runs, (start,))
+        last = bisect.bisect_left(self._runs, (end,))
+        return [run for _, _, run in self._runs[first:last] if not run.continued]